@@ -0,0 +1,106 @@
+# auth/hash_pool.py
+# Argon2 hashing/verification in a small dedicated process pool, so a login storm
+# queues here (bounded, with a timeout) instead of filling the shared threadpool
+# that every other route depends on.
+import asyncio
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+from fastapi.concurrency import run_in_threadpool
+
+from modules.metrics import HASH_LATENCY, HASH_PENDING, HASH_REJECTED
+from verify import hash_password, verify_and_update
+
+# HASH_WORKERS=0 falls back to the shared threadpool (no admission control)
+HASH_WORKERS = int(os.getenv("HASH_WORKERS", str(max(1, min(4, (os.cpu_count() or 2) // 2)))))
+HASH_QUEUE = int(os.getenv("HASH_QUEUE", "64"))
+HASH_TIMEOUT_S = float(os.getenv("HASH_TIMEOUT", "5"))
+HASH_RETRY_AFTER = int(os.getenv("HASH_RETRY_AFTER", "1"))
+
+
+class HashPoolBusy(RuntimeError):
+    """Raised when a hash job is refused (queue full) or did not finish within the timeout."""
+
+    def __init__(self, message="Authentication is busy, try again", retry_after=HASH_RETRY_AFTER):
+        super().__init__(message)
+        self.retry_after = max(1, int(retry_after))
+
+
+class PasswordHasher:
+    """Admits at most `workers + queue_size` jobs; the rest are refused with HashPoolBusy."""
+
+    def __init__(self, workers=HASH_WORKERS, queue_size=HASH_QUEUE, timeout=HASH_TIMEOUT_S):
+        self.workers = max(0, int(workers))
+        self.capacity = self.workers + max(0, int(queue_size))
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._pool = None
+        self._admitted = 0
+        self.rejected = 0
+        self.timeouts = 0
+
+    def _executor(self):
+        with self._lock:
+            if self._pool is None:
+                # spawn: never fork a process that already runs the event loop and inference threads
+                self._pool = ProcessPoolExecutor(max_workers=self.workers,
+                                                 mp_context=multiprocessing.get_context("spawn"))
+            return self._pool
+
+    def _release(self, _future=None):
+        with self._lock:
+            self._admitted -= 1
+
+    async def _run(self, op, fn, *args):
+        if self.workers == 0:
+            with HASH_LATENCY.time(op=op):
+                return await run_in_threadpool(fn, *args)
+
+        with self._lock:
+            if self._admitted >= self.capacity:
+                self.rejected += 1
+                HASH_REJECTED.inc(reason="queue_full")
+                raise HashPoolBusy()
+            self._admitted += 1
+        try:
+            future = self._executor().submit(fn, *args)
+        except BaseException:
+            self._release()
+            raise
+        # the slot is freed when the job really finishes, even if the caller timed out
+        future.add_done_callback(self._release)
+        try:
+            with HASH_LATENCY.time(op=op):
+                return await asyncio.wait_for(asyncio.wrap_future(future), self.timeout)
+        except asyncio.TimeoutError:
+            future.cancel()
+            with self._lock:
+                self.timeouts += 1
+            HASH_REJECTED.inc(reason="timeout")
+            raise HashPoolBusy("Authentication timed out, try again")
+
+    async def hash(self, password):
+        return await self._run("hash", hash_password, password)
+
+    async def verify_and_update(self, password, hashed):
+        return await self._run("verify", verify_and_update, password, hashed)
+
+    def pending(self):
+        return self._admitted
+
+    def stats(self):
+        with self._lock:
+            return {"workers": self.workers, "capacity": self.capacity, "pending": self._admitted,
+                    "timeout_s": self.timeout, "rejected": self.rejected, "timeouts": self.timeouts}
+
+    def shutdown(self):
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+
+password_hasher = PasswordHasher()
+HASH_PENDING.set_function(password_hasher.pending)
@@ -1,28 +1,69 @@
+import hashlib
 import os
-import sys
+import tempfile
 from fastapi import APIRouter, UploadFile, File, Form, Depends, HTTPException
 from sqlalchemy.orm import Session
+from fastapi.concurrency import run_in_threadpool
 
-
-from modules.database import SessionLocal
+from modules.database import get_db
 from modules.yolo_db import ModelInfo
-from ultralytics import YOLO
-
-sys.path.append(r"D:\WORK\Python\web\github_zone\vsl_web_new\backend\modules")
-sys.path.append(r"D:\WORK\Python\web\github_zone\vsl_web_new\backend\yolo\model")
+from yolo.registry import model_cache
 
 
 router = APIRouter(prefix="/models", tags=["models"])
 UPLOAD_DIR = "models"
+UPLOAD_CHUNK = int(os.getenv("MODEL_UPLOAD_CHUNK", str(1024 * 1024)))
 
 os.makedirs(UPLOAD_DIR, exist_ok=True)
 
-def get_db():
-    db = SessionLocal()
+
+def _consume_chunk(out, digest, chunk):
+    digest.update(chunk)
+    out.write(chunk)
+
+
+async def store_upload(file: UploadFile):
+    """Stream an upload to disk in chunks, hashing as we go.
+
+    Files are stored content-addressed as models/<sha256><ext>, so identical
+    weights uploaded under different names share one file on disk.
+    Returns (file_path, size_bytes, sha256, deduplicated).
+    """
+    ext = os.path.splitext(file.filename or "")[1].lower() or ".pt"
+    digest = hashlib.sha256()
+    size = 0
+    fd, tmp_path = tempfile.mkstemp(dir=UPLOAD_DIR, suffix=".part")
     try:
-        yield db
-    finally:
-        db.close()
+        with os.fdopen(fd, "wb") as out:
+            while True:
+                chunk = await file.read(UPLOAD_CHUNK)
+                if not chunk:
+                    break
+                size += len(chunk)
+                # hashing and the disk write both release the GIL; keep them off the event loop
+                await run_in_threadpool(_consume_chunk, out, digest, chunk)
+        sha = digest.hexdigest()
+        file_path = os.path.join(UPLOAD_DIR, sha + ext)
+        deduplicated = os.path.exists(file_path)
+        if deduplicated:
+            os.remove(tmp_path)
+        else:
+            os.replace(tmp_path, file_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return file_path, size, sha, deduplicated
+
+
+def _remove_unreferenced(db, file_path):
+    """Delete a stored upload whose row was never committed, unless a concurrent upload of the same bytes now uses it."""
+    try:
+        referenced = db.query(ModelInfo.id).filter(ModelInfo.file_path == file_path).first() is not None
+    except Exception:
+        referenced = False
+    if not referenced and os.path.exists(file_path):
+        os.remove(file_path)
 
 
 # 🔹 Upload model
@@ -34,21 +75,31 @@ async def upload_model(
     file: UploadFile = File(...),
     db: Session = Depends(get_db)
 ):
-    file_path = os.path.join(UPLOAD_DIR, file.filename)
-    with open(file_path, "wb") as f:
-        f.write(await file.read())
+    if not file.filename:
+        raise HTTPException(status_code=400, detail="No file uploaded")
+    file_path, size_bytes, sha256, deduplicated = await store_upload(file)
 
     model_entry = ModelInfo(
         name=name,
         version=version,
         description=description,
-        file_path=file_path
+        file_path=file_path,
+        size_bytes=size_bytes,
+        sha256=sha256
     )
     db.add(model_entry)
-    db.commit()
+    try:
+        db.commit()
+    except Exception:
+        db.rollback()
+        if not deduplicated:
+            _remove_unreferenced(db, file_path)
+        raise
     db.refresh(model_entry)
+    # the next request for `name` resolves it from the registry again instead of the cached weights
+    model_cache.invalidate(name)
 
-    return {"message": "Model uploaded successfully", "model": model_entry}
+    return {"message": "Model uploaded successfully", "deduplicated": deduplicated, "model": model_entry}
 
 # 🔹 List models
 @router.get("/")
@@ -58,9 +109,20 @@ def list_models(db: Session = Depends(get_db)):
 # 🔹 Load and test a model
 @router.get("/load/{name}")
 def load_model(name: str, db: Session = Depends(get_db)):
-    model_entry = db.query(ModelInfo).filter(ModelInfo.name == name).first()
+    model_entry = db.query(ModelInfo).filter(ModelInfo.name == name).order_by(ModelInfo.id.desc()).first()
     if not model_entry:
         raise HTTPException(status_code=404, detail="Model not found")
 
-    model = YOLO(model_entry.file_path)
+    # Loads (and warms up) once into the process-wide cache; later calls and
+    # /yolo/predict?model=<name> reuse the same instance
+    try:
+        model_cache.get((model_entry.name, model_entry.version), model_entry.file_path, current=True)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to load model: {e}")
     return {"message": f"Model '{name}' loaded successfully", "path": model_entry.file_path}
+
+
+# 🔹 Cache status
+@router.get("/cache")
+def cache_status():
+    return model_cache.stats()
@@ -1,57 +1,73 @@
-import sys
+import json
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from fastapi.concurrency import run_in_threadpool
 
-sys.path.append(r"D:\WORK\Python\web\github_zone\vsl_web_new\backend\modules")
-sys.path.append (r"D:\WORK\Python\web\github_zone\vsl_web_new\backend\monitor")
-
-from modules.database import SessionLocal
+from modules.database import engine, get_async_db
+from modules.principals import admins_table, check_admins_table
 from modules.create_table import User
 from utils import create_access_token
 from modules.schemas import UserCreate, UserLogin, UserResponse
-from verify import hash_password, verify_password
-from monitor.create_table import ActivityLog, LessonCompletion
+from hash_pool import HashPoolBusy, password_hasher
+from modules.activity_writer import activity_writer
 
-from sqlalchemy import func, text
+from sqlalchemy import func, select, text
 from datetime import datetime, timedelta
 
 
 
 router = APIRouter(prefix="", tags=["auth"])
 
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
+# DB calls go through get_async_db (async engine with DB_ASYNC=1, threadpool otherwise);
+# Argon2 runs in its own bounded process pool (hash_pool.py) and answers 503 when it is full
+def busy_response(e: HashPoolBusy):
+    return HTTPException(status_code=503, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+
 
 @router.post("/register", response_model=UserResponse)
-def register(user: UserCreate, db: Session = Depends(get_db)):
-    existing_user = db.query(User).filter(User.username == user.username).first() #auth
+async def register(user: UserCreate, db=Depends(get_async_db)):
+    existing_user = (await db.execute(select(User).where(User.username == user.username))).scalars().first() #auth
     if existing_user:
         raise HTTPException(status_code=400, detail="Username already exists")
 
-    hashed_pw = hash_password(user.password)
-    new_user = User(username=user.username, email=user.email, hashed_password=hashed_pw)
-    db.add(new_user)
-    db.commit()
-    db.refresh(new_user)
+    try:
+        hashed_pw = await password_hasher.hash(user.password)
+    except HashPoolBusy as e:
+        raise busy_response(e)
+    return await db.run_sync(_create_user, User(username=user.username, email=user.email, hashed_password=hashed_pw))
+
+
+def _create_user(session, new_user):
+    session.add(new_user)
+    session.commit()
+    session.refresh(new_user)
     return new_user
 
 
 @router.post("/login")
-def login(user: UserLogin, db: Session = Depends(get_db)):
-    db_user = db.query(User).filter(User.username == user.username).first() #auth
-    if not db_user or not verify_password(user.password, db_user.hashed_password):
+async def login(user: UserLogin, db=Depends(get_async_db)):
+    db_user = (await db.execute(select(User).where(User.username == user.username))).scalars().first() #auth
+    if not db_user:
         raise HTTPException(status_code=401, detail="Invalid username or password")
-
-    token = create_access_token({"sub": db_user.username})
+    try:
+        valid, new_hash = await password_hasher.verify_and_update(user.password, db_user.hashed_password)
+    except HashPoolBusy as e:
+        raise busy_response(e)
+    if not valid:
+        raise HTTPException(status_code=401, detail="Invalid username or password")
+    # read before the commit: with DB_ASYNC off the commit expires db_user, and reloading
+    # it afterwards would be a blocking SELECT on the event loop
+    username = db_user.username
+    if new_hash:
+        # stored hash predates the current ARGON2_* settings: upgrade it while we have the password
+        db_user.hashed_password = new_hash
+        await db.commit()
+
+    token = create_access_token({"sub": username})
     return {"access_token": token, "token_type": "bearer"}
 
 
 @router.post("/admin/login")
-def admin_login(payload: dict, db: Session = Depends(get_db)):
+async def admin_login(payload: dict, db=Depends(get_async_db)):
     """Authenticate an admin account stored in a separate `admins` table and return a JWT.
     Expected payload: { "username": "..." } or { "email": "..." }, and "password".
     """
@@ -60,8 +76,12 @@ def admin_login(payload: dict, db: Session = Depends(get_db)):
     if not identifier or not password:
         raise HTTPException(status_code=400, detail="username/email and password required")
 
+    if admins_table["exists"] is None:
+        await run_in_threadpool(check_admins_table, engine)
+    if not admins_table["exists"]:
+        raise HTTPException(status_code=401, detail="Invalid admin credentials")
     try:
-        row = db.execute(text("SELECT * FROM admins WHERE username = :u OR email = :u LIMIT 1"), {"u": identifier}).fetchone()
+        row = (await db.execute(text("SELECT * FROM admins WHERE username = :u OR email = :u LIMIT 1"), {"u": identifier})).fetchone()
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Admin lookup failed: {e}")
 
@@ -70,24 +90,68 @@ def admin_login(payload: dict, db: Session = Depends(get_db)):
 
     mapping = row._mapping if hasattr(row, "_mapping") else dict(row)
     hashed = mapping.get("hashed_password") or mapping.get("password")
-    if not hashed or not verify_password(password, hashed):
+    if not hashed:
         raise HTTPException(status_code=401, detail="Invalid admin credentials")
+    try:
+        valid, new_hash = await password_hasher.verify_and_update(password, hashed)
+    except HashPoolBusy as e:
+        raise busy_response(e)
+    if not valid:
+        raise HTTPException(status_code=401, detail="Invalid admin credentials")
+    if new_hash and mapping.get("hashed_password") and mapping.get("id") is not None:
+        await db.run_sync(_update_admin_hash, mapping["id"], new_hash)
 
     sub = mapping.get("username") or mapping.get("email") or identifier
     token = create_access_token({"sub": sub})
     return {"access_token": token, "token_type": "bearer"}
 
 
-# Lesson logging
+def _update_admin_hash(session, admin_id, new_hash):
+    session.execute(text("UPDATE admins SET hashed_password = :h WHERE id = :id"), {"h": new_hash, "id": admin_id})
+    session.commit()
+
+
+# Lesson logging: events are queued and written in batches by the activity writer,
+# so reject anything that would fail the INSERT before acknowledging it
+def _optional_int(event, key):
+    value = event.get(key)
+    if value is None:
+        return None
+    if isinstance(value, bool):
+        raise ValueError(f"{key} must be an integer")
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"{key} must be an integer")
+
+
 @router.post("/log")
-def log_event(event: dict, db: Session = Depends(get_db)):
+async def log_event(event: dict):
     # expected event: { "user_id": 1, "event_type": "view_lesson", "detail": "...", "lesson_id": 2 }
-    new = ActivityLog(user_id=event.get("user_id"), event_type=event["event_type"], detail=event.get("detail"))
-    db.add(new)
-    if event.get("event_type") == "complete_lesson" and event.get("lesson_id"):
-        comp = LessonCompletion(lesson_id=event["lesson_id"], user_id=event.get("user_id"), progress=100.0)
-        db.add(comp)
-    db.commit()
+    event_type = event.get("event_type")
+    if not event_type or not isinstance(event_type, str):
+        raise HTTPException(status_code=400, detail="event_type is required")
+    try:
+        user_id = _optional_int(event, "user_id")
+        lesson_id = _optional_int(event, "lesson_id")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    try:
+        progress = 100.0 if event.get("progress") is None else float(event["progress"])
+    except (TypeError, ValueError):
+        raise HTTPException(status_code=400, detail="progress must be a number")
+    detail = event.get("detail")
+    if detail is not None and not isinstance(detail, str):
+        detail = json.dumps(detail) if isinstance(detail, (dict, list)) else str(detail)
+    queued = activity_writer.submit(
+        user_id=user_id,
+        event_type=event_type,
+        detail=detail,
+        lesson_id=lesson_id,
+        progress=progress,
+    )
+    if not queued:
+        raise HTTPException(status_code=503, detail="Activity log is busy", headers={"Retry-After": "1"})
     return {"status":"ok"}
 
 
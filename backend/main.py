@@ -1,71 +1,249 @@
-from fastapi import FastAPI
-from fastapi.middleware.cors import CORSMiddleware
-import sys
+import time
+_import_started = time.perf_counter()
 
-# Add your module paths
-sys.path.append(r"D:\WORK\Python\web\github_zone\vsl_web_new\backend\auth")
-sys.path.append(r"D:\WORK\Python\web\github_zone\vsl_web_new\backend\modules")
-sys.path.append(r"D:\WORK\Python\web\github_zone\vsl_web_new\backend\yolo")
-sys.path.append(r"D:\WORK\Python\web\github_zone\vsl_web_new\backend\monitor")
+import asyncio
+import logging
+import os
+import sys
+from contextlib import contextmanager
 
+# auth/ modules import each other by bare name (`from verify import ...`); resolve them
+# relative to this file instead of a machine-specific path
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+for _path in (BACKEND_DIR, os.path.join(BACKEND_DIR, "auth")):
+    if _path not in sys.path:
+        sys.path.append(_path)
 
-#Import database and models
-from modules.database import Base, engine
+from fastapi import FastAPI, Request
+from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, Response
+from sqlalchemy import inspect, text
+
+#Import database and the light routers; the inference stack (yolo/, auth/models.py) is
+#imported by LazyRouters on first use, and schema creation is `python manage.py create-schema`
+from modules.database import dispose_engines, engine, pool_stats
+from modules.activity_writer import activity_writer
+from modules.activity_archive import retention_job
+from modules.principals import check_admins_table
+from modules.metrics import CONTENT_TYPE, MetricsMiddleware, render_metrics
+from modules.lazy_routes import LazyRouter, LazyRouters
 from auth import routes as auth_routes
-from modules import yolo_db 
-from yolo.routes import router as yolo_router
+from hash_pool import password_hasher  # same module instance auth/routes.py uses
 from monitor import routes as monitor_routes
-import modules.monitor_models  # register monitoring models with SQLAlchemy metadata
-
-
-
-#Check database connection
-try:
-    conn = engine.connect()
-    print("Database connected successfully!")
-    conn.close()
-except Exception as e:
-    print("Database connection failed:", e)
-
-
-# Create tables for any imported models (development convenience)
-try:
-    Base.metadata.create_all(engine)
-    print(" Database tables ensured (create_all).")
-except Exception as e:
-    print(" Failed to create tables automatically:", e)
-
-app = FastAPI(title="Sign Language Backend API")
-
-
-
-
-#CORS setup
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["*"],
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
-
-
-
-
-#Include authentication routes
-app.include_router(auth_routes.router, prefix="/auth", tags=["auth"])
-app.include_router(yolo_router)
-app.include_router(monitor_routes.router)
-
-
-
-
-# Root route
-@app.get("/")
-def root():
-    return {"message": "✅ Sign Language Backend is running!"}
-
-#Health check
-@app.get("/health")
-def health():
-    return {"status": "ok"}
+from modules.monitor_models import check_completion_index  # also registers the monitoring models
+
+
+# Startup is split into timed phases; nothing slow (DB, model weights) happens at import
+logger = logging.getLogger("uvicorn.error")
+startup_timings = {}
+db_state = {"status": "pending", "error": None}
+# /ready reports this until yolo.routes is imported, then the module's own model status
+model_init_state = {"status": "pending", "error": None}
+# LAZY_ROUTERS=0 imports and includes every router in create_app (full /docs without a first request)
+LAZY_ROUTERS = os.getenv("LAZY_ROUTERS", "1") == "1"
+
+
+@contextmanager
+def startup_phase(name):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        startup_timings[name] = round((time.perf_counter() - started) * 1000.0, 1)
+        logger.info("startup phase %s took %.1f ms", name, startup_timings[name])
+
+
+def init_database():
+    #Check database connection
+    with startup_phase("db_connect"):
+        try:
+            conn = engine.connect()
+            conn.close()
+            print("Database connected successfully!")
+        except Exception as e:
+            db_state.update(status="error", error=str(e))
+            print("Database connection failed:", e)
+            return
+
+    with startup_phase("db_schema"):
+        try:
+            has_schema = inspect(engine).has_table("users")
+        except Exception as e:
+            db_state.update(status="error", error=str(e))
+            print("Database schema check failed:", e)
+            return
+        if not has_schema:
+            db_state.update(status="schema_missing", error="run `python manage.py create-schema`")
+            print(" Database schema is missing; run `python manage.py create-schema`.")
+            return
+    # the optional admins table is looked up once here, not on every admin request
+    check_admins_table(engine)
+    check_completion_index(engine)
+    db_state.update(status="ok", error=None)
+
+
+def init_model(app, yolo):
+    with startup_phase("model_load"):
+        model_init_state.update(status="loading", error=None)
+        try:
+            yolo.load(app).warm_up_default_model()
+        except Exception as e:
+            # this runs in a fire-and-forget executor future: keep the error for /ready
+            model_init_state.update(status="error", error=repr(e))
+            print("Model warm-up failed:", e)
+            return
+        model_init_state.update(status="done", error=None)
+
+
+def create_app():
+    app = FastAPI(title="Sign Language Backend API")
+    yolo = LazyRouter("/yolo", "yolo.routes")
+    lazy_routers = [yolo, LazyRouter("/models", "auth.models")]
+    app.state.lazy_routers = lazy_routers
+
+    #CORS setup
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=["*"],
+        allow_credentials=True,
+        allow_methods=["*"],
+        allow_headers=["*"],
+    )
+
+    # Per-route latency / in-flight requests for /metrics
+    app.add_middleware(MetricsMiddleware)
+    app.add_middleware(LazyRouters, target=app, routers=lazy_routers)
+
+    # DB check and model warm-up run in the background so the worker starts serving
+    # (and answering /health) immediately; /ready tells when they are done.
+    @app.on_event("startup")
+    async def startup_background_init():
+        logger.info("startup phase import took %.1f ms", startup_timings["import"])
+        loop = asyncio.get_running_loop()
+        loop.run_in_executor(None, init_database)
+        loop.run_in_executor(None, init_model, app, yolo)
+        activity_writer.start()
+        retention_job.start()
+
+    # Stop inference workers (replica processes, worker threads) and hashing processes, flush queued
+    # activity events and close DB pools with the app
+    @app.on_event("shutdown")
+    async def shutdown_inference():
+        if yolo.module is not None:
+            yolo.module.shutdown()
+        retention_job.stop()
+        password_hasher.shutdown()
+        await asyncio.get_running_loop().run_in_executor(None, activity_writer.close)
+        await dispose_engines()
+
+    #Include authentication routes
+    app.include_router(auth_routes.router, prefix="/auth", tags=["auth"])
+    app.include_router(monitor_routes.router)
+    if not LAZY_ROUTERS:
+        for router in lazy_routers:
+            try:
+                router.load(app)
+            except Exception:
+                pass  # its prefix answers 503; /ready shows the error
+
+    # Root route
+    @app.get("/")
+    def root():
+        return {"message": "✅ Sign Language Backend is running!"}
+
+    #Health check (liveness only)
+    @app.get("/health")
+    def health():
+        return {"status": "ok"}
+
+    #Prometheus scrape endpoint
+    @app.get("/metrics")
+    def metrics():
+        return Response(render_metrics(), media_type=CONTENT_TYPE)
+
+    #Readiness: model loaded and database reachable
+    @app.get("/ready")
+    def ready(request: Request):
+        model = yolo.module.model_status() if yolo.module is not None else dict(model_init_state)
+        db = dict(db_state)
+        # a missing schema needs create-schema and a restart; SELECT 1 would not fix it
+        if db["status"] not in ("pending", "schema_missing"):
+            try:
+                with engine.connect() as conn:
+                    conn.execute(text("SELECT 1"))
+                db.update(status="ok", error=None)
+            except Exception as e:
+                db.update(status="error", error=str(e))
+
+        is_ready = model["status"] == "ready" and db["status"] == "ok"
+        db["pool"] = pool_stats()
+        body = {"ready": is_ready, "model": model, "database": db, "activity_writer": activity_writer.stats(),
+                "routers": {r.prefix: r.status() for r in request.app.state.lazy_routers},
+                "startup_ms": startup_timings}
+        return JSONResponse(body, status_code=200 if is_ready else 503)
+
+    return app
+
+
+def profile_startup(top=25):
+    """Import main and build the app in a fresh interpreter under -X importtime; print where the time goes."""
+    import subprocess
+
+    code = ("import time; t = time.perf_counter(); import main; main.create_app(); "
+            "print('__startup_ms__', round((time.perf_counter() - t) * 1000.0, 1))")
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", code],
+                          cwd=BACKEND_DIR, capture_output=True, text=True)
+    if proc.returncode:
+        print(proc.stderr[-4000:])
+        return proc.returncode
+
+    modules = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        modules.append((name.strip(), int(self_us), int(cumulative_us)))
+    total = sum(m[1] for m in modules) or 1
+    wall = [l.split()[1] for l in proc.stdout.splitlines() if l.startswith("__startup_ms__")]
+
+    packages = {}
+    for name, self_us, _ in modules:
+        packages[name.split(".")[0]] = packages.get(name.split(".")[0], 0) + self_us
+
+    print(f"import main + create_app(): {wall[0] if wall else '?'} ms wall, "
+          f"{total / 1000.0:.1f} ms in {len(modules)} module imports\n")
+    print(f"{'package':<32}{'self ms':>10}{'share':>8}")
+    for name, us in sorted(packages.items(), key=lambda p: -p[1])[:top]:
+        print(f"{name:<32}{us / 1000.0:>10.1f}{100.0 * us / total:>7.1f}%")
+    print(f"\n{'module':<48}{'self ms':>10}{'cumul ms':>10}")
+    for name, self_us, cumulative_us in sorted(modules, key=lambda m: -m[1])[:top]:
+        print(f"{name:<48}{self_us / 1000.0:>10.1f}{cumulative_us / 1000.0:>10.1f}")
+    return 0
+
+
+startup_timings["import"] = round((time.perf_counter() - _import_started) * 1000.0, 1)
+
+# `uvicorn main:app`, or `uvicorn main:create_app --factory`. `app` is only built when it
+# is looked up, so the factory path (and profile_startup) does not build a second one.
+def __getattr__(name):
+    if name == "app":
+        globals()["app"] = create_app()
+        return globals()["app"]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Sign Language Backend API")
+    parser.add_argument("--profile-startup", action="store_true",
+                        help="print a per-module import-time breakdown of app startup and exit")
+    parser.add_argument("--top", type=int, default=25, help="rows per table with --profile-startup")
+    parser.add_argument("--host", default=os.getenv("HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("PORT", "8000")))
+    args = parser.parse_args()
+    if args.profile_startup:
+        sys.exit(profile_startup(args.top))
+
+    import uvicorn
+    uvicorn.run("main:create_app", factory=True, host=args.host, port=args.port)
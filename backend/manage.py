@@ -0,0 +1,51 @@
+# backend/manage.py
+# Explicit setup steps that used to run on every app start.
+#
+#   cd backend
+#   python manage.py create-schema            # create missing tables, indexes and columns
+#   python manage.py create-schema --dry-run  # list what is missing
+import argparse
+
+from sqlalchemy import inspect
+
+from modules.database import Base, engine
+# every module that declares tables, so Base.metadata is complete
+from modules import create_table, monitor_models, rollups, yolo_db  # noqa: F401
+
+
+def create_schema(bind=engine, dry_run=False):
+    existing = set(inspect(bind).get_table_names())
+    missing = [t.name for t in Base.metadata.sorted_tables if t.name not in existing]
+    if dry_run:
+        return missing
+    Base.metadata.create_all(bind)
+    # create_all skips existing tables, so indexes added to a model later are created here.
+    # A unique index can fail on rows already in the table; those are left to the table's
+    # migration (`python -m monitor.migrate` deduplicates lesson_completions first).
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            if index.unique and table.name in existing:
+                if index.name not in {ix["name"] for ix in inspect(bind).get_indexes(table.name)}:
+                    print(f"Skipped unique index {index.name} on existing table {table.name}; run its migration")
+                continue
+            index.create(bind, checkfirst=True)
+    yolo_db.ensure_model_columns(bind)
+    monitor_models.check_completion_index(bind)
+    return missing
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Backend management commands")
+    sub = parser.add_subparsers(dest="command", required=True)
+    schema = sub.add_parser("create-schema", help="create missing tables, indexes and model columns")
+    schema.add_argument("--dry-run", action="store_true", help="only list the tables that would be created")
+    args = parser.parse_args(argv)
+
+    if args.command == "create-schema":
+        missing = create_schema(engine, dry_run=args.dry_run)
+        verb = "Would create" if args.dry_run else "Created"
+        print(f"{verb} {len(missing)} table(s)" + (": " + ", ".join(missing) if missing else ""))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,390 @@
+# modules/activity_archive.py
+# Keeps activity_logs small: rows older than ACTIVITY_RETENTION_DAYS are compacted
+# into zstd-compressed Parquet files under ACTIVITY_ARCHIVE_DIR and removed from the
+# database. `query_activity` reads the hot table and the archive as one.
+#
+# On Postgres, activity_logs can be converted to a table partitioned by month
+# (`partition` below); retention then exports and drops whole partitions. Other
+# backends keep a single rolling table and retention deletes one archived day at a time.
+#
+#   cd backend
+#   python -m modules.activity_archive partition            # Postgres only, once
+#   python -m modules.activity_archive retain [--days 90]   # from cron, or ACTIVITY_RETENTION_INTERVAL
+#   python -m modules.activity_archive query --from 2025-01-01 --to 2025-02-01 [--user 42]
+import argparse
+import glob
+import json
+import os
+import threading
+import time
+from datetime import date, datetime, timedelta, timezone
+
+from sqlalchemy import column, func, inspect, select, table, text
+
+from modules.database import engine
+from modules.monitor_models import ActivityLog
+
+RETENTION_DAYS = int(os.getenv("ACTIVITY_RETENTION_DAYS", "90"))
+ARCHIVE_DIR = os.getenv("ACTIVITY_ARCHIVE_DIR", os.path.join("archive", "activity_logs"))
+EXPORT_CHUNK = int(os.getenv("ACTIVITY_ARCHIVE_CHUNK", "50000"))
+# seconds between in-process retention runs; 0 leaves it to cron / the CLI
+RETENTION_INTERVAL_S = float(os.getenv("ACTIVITY_RETENTION_INTERVAL", "0"))
+PARTITIONS_AHEAD = int(os.getenv("ACTIVITY_PARTITIONS_AHEAD", "2"))
+
+TABLE = ActivityLog.__tablename__
+COLUMNS = ("id", "user_id", "event_type", "detail", "created_at")
+
+
+def _utc(ts):
+    if ts is None:
+        return None
+    if isinstance(ts, str):
+        ts = datetime.fromisoformat(ts)
+    if ts.tzinfo is None:
+        return ts.replace(tzinfo=timezone.utc)
+    return ts.astimezone(timezone.utc)
+
+
+def _db_time(bind, ts):
+    # SQLite stores naive UTC strings; everything else gets an aware timestamp
+    ts = _utc(ts)
+    return ts.replace(tzinfo=None) if bind.dialect.name == "sqlite" else ts
+
+
+def _month_start(d):
+    return date(d.year, d.month, 1)
+
+
+def _next_month(d):
+    return date(d.year + (d.month == 12), d.month % 12 + 1, 1)
+
+
+# ---------------------------------------------------------------- archive files
+
+def _schema():
+    import pyarrow as pa
+    return pa.schema([
+        ("id", pa.int64()),
+        ("user_id", pa.int64()),
+        ("event_type", pa.string()),
+        ("detail", pa.string()),
+        ("created_at", pa.timestamp("us", tz="UTC")),
+    ])
+
+
+def _archive_path(archive_dir, start, end):
+    # the covered range is in the name so queries can skip files without opening them
+    return os.path.join(archive_dir, f"{TABLE}_{start.isoformat()}_{end.isoformat()}_{time.time_ns()}.parquet")
+
+
+def _file_range(path):
+    parts = os.path.basename(path)[len(TABLE) + 1:].split("_")
+    return date.fromisoformat(parts[0]), date.fromisoformat(parts[1])
+
+
+def export_rows(bind, source, start, end, archive_dir=ARCHIVE_DIR, chunk=EXPORT_CHUNK):
+    """Write rows of `source` with start <= created_at < end to one Parquet file.
+
+    Reads in id-keyset chunks so memory stays bounded. Returns (path, rows, max_id); path is None if no rows.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    lo, hi = _db_time(bind, datetime.combine(start, datetime.min.time())), _db_time(bind, datetime.combine(end, datetime.min.time()))
+    os.makedirs(archive_dir, exist_ok=True)
+    path = _archive_path(archive_dir, start, end)
+    tmp = path + ".tmp"
+    writer = None
+    rows = 0
+    last_id = None
+    try:
+        with bind.connect() as conn:
+            while True:
+                sql = (f"SELECT id, user_id, event_type, detail, created_at FROM {source} "
+                       "WHERE created_at >= :lo AND created_at < :hi"
+                       + (" AND id > :after" if last_id is not None else "")
+                       + " ORDER BY id LIMIT :limit")
+                batch = conn.execute(text(sql), {"lo": lo, "hi": hi, "after": last_id, "limit": chunk}).all()
+                if not batch:
+                    break
+                columns = list(zip(*batch))
+                table = pa.table({
+                    "id": columns[0],
+                    "user_id": columns[1],
+                    "event_type": columns[2],
+                    "detail": columns[3],
+                    "created_at": [_utc(ts) for ts in columns[4]],
+                }, schema=_schema())
+                if writer is None:
+                    writer = pq.ParquetWriter(tmp, _schema(), compression="zstd")
+                writer.write_table(table)
+                rows += len(batch)
+                last_id = batch[-1][0]
+    except BaseException:
+        if writer is not None:
+            writer.close()
+            writer = None
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+    finally:
+        if writer is not None:
+            writer.close()
+    if rows == 0:
+        return None, 0, None
+    os.replace(tmp, path)
+    return path, rows, last_id
+
+
+# ---------------------------------------------------------------- Postgres partitions
+
+def is_partitioned(bind):
+    if bind.dialect.name != "postgresql":
+        return False
+    with bind.connect() as conn:
+        kind = conn.execute(text("SELECT relkind FROM pg_class WHERE relname = :t AND relkind IN ('r', 'p')"),
+                            {"t": TABLE}).scalar()
+    return kind == "p"
+
+
+def _partition_name(month):
+    return f"{TABLE}_y{month.year}m{month.month:02d}"
+
+
+def ensure_partitions(bind, months_ahead=PARTITIONS_AHEAD, since=None):
+    """Create monthly partitions from `since` (default: this month) to `months_ahead` months ahead."""
+    month = _month_start(since or datetime.now(timezone.utc).date())
+    last = _month_start(datetime.now(timezone.utc).date())
+    for _ in range(months_ahead):
+        last = _next_month(last)
+    created = []
+    with bind.begin() as conn:
+        while month <= last:
+            name = _partition_name(month)
+            conn.execute(text(
+                f"CREATE TABLE IF NOT EXISTS {name} PARTITION OF {TABLE} "
+                f"FOR VALUES FROM ('{month.isoformat()}') TO ('{_next_month(month).isoformat()}')"
+            ))
+            created.append(name)
+            month = _next_month(month)
+    return created
+
+
+def partition_table(bind):
+    """Convert an ordinary activity_logs table into one range-partitioned by month (Postgres).
+
+    Copies every row inside one transaction, so run it in a quiet period.
+    """
+    if bind.dialect.name != "postgresql":
+        raise RuntimeError("Native partitioning needs Postgres; other backends use the rolling table")
+    if is_partitioned(bind):
+        return False
+    legacy = f"{TABLE}_unpartitioned"
+    with bind.begin() as conn:
+        first = conn.execute(text(f"SELECT min(created_at) FROM {TABLE}")).scalar()
+        conn.execute(text(f"ALTER TABLE {TABLE} RENAME TO {legacy}"))
+        # LIKE ... INCLUDING DEFAULTS keeps the id sequence; the partition key must be part of the PK
+        conn.execute(text(f"CREATE TABLE {TABLE} (LIKE {legacy} INCLUDING DEFAULTS) PARTITION BY RANGE (created_at)"))
+        conn.execute(text(f"ALTER TABLE {TABLE} ALTER COLUMN created_at SET NOT NULL"))
+        conn.execute(text(f"ALTER TABLE {TABLE} ADD PRIMARY KEY (id, created_at)"))
+        conn.execute(text(f"CREATE TABLE {TABLE}_default PARTITION OF {TABLE} DEFAULT"))
+    ensure_partitions(bind, since=_utc(first).date() if first else None)
+    with bind.begin() as conn:
+        conn.execute(text(
+            f"INSERT INTO {TABLE} (id, user_id, event_type, detail, created_at) "
+            f"SELECT id, user_id, event_type, detail, COALESCE(created_at, now()) FROM {legacy}"
+        ))
+        conn.execute(text(f"ALTER SEQUENCE IF EXISTS {TABLE}_id_seq OWNED BY {TABLE}.id"))
+        conn.execute(text(f"DROP TABLE {legacy}"))
+        # indexes declared on the parent are created on every partition
+        for index in ActivityLog.__table__.indexes:
+            cols = ", ".join(c.name for c in index.columns)
+            conn.execute(text(f"CREATE INDEX IF NOT EXISTS {index.name} ON {TABLE} ({cols})"))
+    return True
+
+
+def _expired_partitions(bind, cutoff):
+    with bind.connect() as conn:
+        names = conn.execute(text(
+            "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+            "JOIN pg_class p ON p.oid = i.inhparent WHERE p.relname = :t"
+        ), {"t": TABLE}).scalars().all()
+    expired = []
+    for name in names:
+        suffix = name[len(TABLE) + 1:]
+        if not (suffix.startswith("y") and "m" in suffix):
+            continue
+        month = date(int(suffix[1:5]), int(suffix[6:8]), 1)
+        if _next_month(month) <= cutoff:
+            expired.append((name, month))
+    return sorted(expired, key=lambda item: item[1])
+
+
+# ---------------------------------------------------------------- retention
+
+def _retain_days(bind, source, cutoff, archive_dir):
+    """Archive and delete rows of `source` older than `cutoff`: one day per file and per DELETE, oldest first."""
+    rows_table = table(source, *(column(c.name, c.type) for c in ActivityLog.__table__.columns))
+    created_at = rows_table.c.created_at
+    cutoff_ts = _db_time(bind, datetime.combine(cutoff, datetime.min.time()))
+    archived = []
+    while True:
+        with bind.connect() as conn:
+            oldest = conn.execute(select(func.min(created_at)).where(created_at < cutoff_ts)).scalar()
+        if oldest is None:
+            break
+        day = _utc(oldest).date()
+        path, rows, max_id = export_rows(bind, source, day, day + timedelta(days=1), archive_dir)
+        if rows == 0:
+            # the stored timestamp does not fall in the UTC day it was read as (e.g. a
+            # non-UTC offset in a SQLite string); deleting nothing would loop forever
+            print(f"Activity retention: oldest row {oldest!r} in {source} is not in {day}; stopping")
+            break
+        lo = _db_time(bind, datetime.combine(day, datetime.min.time()))
+        hi = _db_time(bind, datetime.combine(day + timedelta(days=1), datetime.min.time()))
+        with bind.begin() as conn:
+            conn.execute(rows_table.delete().where(created_at >= lo, created_at < hi, rows_table.c.id <= max_id))
+        archived.append({"range": day.isoformat(), "rows": rows, "file": path})
+    return archived
+
+
+def run_retention(bind=engine, days=RETENTION_DAYS, archive_dir=ARCHIVE_DIR):
+    """Archive and remove activity older than `days`; returns a summary per archived range."""
+    cutoff = datetime.now(timezone.utc).date() - timedelta(days=days)
+    archived = []
+
+    if is_partitioned(bind):
+        ensure_partitions(bind)
+        for name, month in _expired_partitions(bind, cutoff):
+            path, rows, _ = export_rows(bind, name, month, _next_month(month), archive_dir)
+            with bind.begin() as conn:
+                conn.execute(text(f"ALTER TABLE {TABLE} DETACH PARTITION {name}"))
+                conn.execute(text(f"DROP TABLE {name}"))
+            archived.append({"range": month.isoformat()[:7], "rows": rows, "file": path})
+        # rows that landed in the default partition (no monthly partition existed for
+        # them yet) are never dropped with a month; archive them day by day instead
+        if inspect(bind).has_table(f"{TABLE}_default"):
+            archived.extend(_retain_days(bind, f"{TABLE}_default", cutoff, archive_dir))
+        return {"cutoff": cutoff.isoformat(), "partitioned": True, "archived": archived}
+
+    # rolling table: one day per file and per DELETE, oldest first, skipping empty days
+    archived = _retain_days(bind, TABLE, cutoff, archive_dir)
+    return {"cutoff": cutoff.isoformat(), "partitioned": False, "archived": archived}
+
+
+class RetentionJob:
+    """Runs `run_retention` every `interval` seconds in a daemon thread."""
+
+    def __init__(self, interval=RETENTION_INTERVAL_S):
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = None
+        self.last_result = None
+
+    def start(self):
+        if self.interval <= 0 or self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._loop, name="activity-retention", daemon=True)
+        self._thread.start()
+
+    def _loop(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.last_result = run_retention()
+            except Exception as e:
+                print("Activity retention failed:", e)
+
+    def stop(self):
+        self._stop.set()
+
+
+retention_job = RetentionJob()
+
+
+# ---------------------------------------------------------------- hot + archive reads
+
+def _archive_rows(files, condition, limit):
+    """Matching archived rows, oldest first; with `limit`, stops opening files once they cannot contribute."""
+    import pyarrow.dataset as ds
+
+    order = [("created_at", "ascending"), ("id", "ascending")]
+    rows = []
+    for path in sorted(files, key=_file_range):
+        if limit and len(rows) >= limit and _file_range(path)[0] > rows[limit - 1]["created_at"].date():
+            break
+        # one file is one day (rolling table) or one month (partition), read with the filter pushed down
+        table = ds.dataset(path, format="parquet", schema=_schema()).to_table(filter=condition).sort_by(order)
+        if limit:
+            table = table.slice(0, limit)
+        rows.extend(table.to_pylist())
+        rows.sort(key=lambda row: (row["created_at"], row["id"]))
+        if limit:
+            del rows[limit:]
+    return rows
+
+
+def query_activity(start, end, user_id=None, event_type=None, bind=engine, archive_dir=ARCHIVE_DIR, limit=None):
+    """Activity rows with start <= created_at < end from the database and the archive, oldest first."""
+    start, end = _utc(start), _utc(end)
+    rows = {}
+
+    files = [p for p in glob.glob(os.path.join(archive_dir, f"{TABLE}_*.parquet"))
+             if _file_range(p)[0] < end.date() + timedelta(days=1) and _file_range(p)[1] > start.date()]
+    if files:
+        import pyarrow.dataset as ds
+        field = ds.field
+        condition = (field("created_at") >= start) & (field("created_at") < end)
+        if user_id is not None:
+            condition &= field("user_id") == user_id
+        if event_type is not None:
+            condition &= field("event_type") == event_type
+        for row in _archive_rows(files, condition, limit):
+            row["created_at"] = _utc(row["created_at"])
+            rows[row["id"]] = row
+
+    query = select(*(getattr(ActivityLog, c) for c in COLUMNS)).where(
+        ActivityLog.created_at >= _db_time(bind, start), ActivityLog.created_at < _db_time(bind, end)
+    ).order_by(ActivityLog.created_at, ActivityLog.id)
+    if user_id is not None:
+        query = query.where(ActivityLog.user_id == user_id)
+    if event_type is not None:
+        query = query.where(ActivityLog.event_type == event_type)
+    if limit:
+        query = query.limit(limit)
+    with bind.connect() as conn:
+        for r in conn.execute(query):
+            # a row can be in both only if retention stopped between writing a file and deleting
+            rows[r.id] = {"id": r.id, "user_id": r.user_id, "event_type": r.event_type,
+                          "detail": r.detail, "created_at": _utc(r.created_at)}
+
+    result = sorted(rows.values(), key=lambda row: (row["created_at"], row["id"]))
+    return result[:limit] if limit else result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Activity log partitioning, retention and archive queries")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("partition", help="convert activity_logs to monthly partitions (Postgres)")
+    retain = sub.add_parser("retain", help="archive and remove rows older than --days")
+    retain.add_argument("--days", type=int, default=RETENTION_DAYS)
+    query = sub.add_parser("query", help="print rows from the hot table and the archive as JSON lines")
+    query.add_argument("--from", dest="start", required=True, type=date.fromisoformat)
+    query.add_argument("--to", dest="end", required=True, type=date.fromisoformat)
+    query.add_argument("--user", type=int)
+    query.add_argument("--event-type")
+    query.add_argument("--limit", type=int)
+    args = parser.parse_args(argv)
+
+    if args.command == "partition":
+        print("Partitioned" if partition_table(engine) else "Already partitioned")
+    elif args.command == "retain":
+        print(json.dumps(run_retention(engine, args.days), indent=2))
+    else:
+        start = datetime.combine(args.start, datetime.min.time(), tzinfo=timezone.utc)
+        end = datetime.combine(args.end, datetime.min.time(), tzinfo=timezone.utc)
+        for row in query_activity(start, end, args.user, args.event_type, limit=args.limit):
+            print(json.dumps(row, default=str))
+
+
+if __name__ == "__main__":
+    main()
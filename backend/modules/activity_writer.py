@@ -0,0 +1,192 @@
+# modules/activity_writer.py
+# Buffered writer for /auth/log: events are queued in memory and written by one
+# background thread as multi-row INSERTs, one transaction per batch, instead of
+# one commit per event. The same transaction updates the analytics rollups. A batch
+# that fails twice is retried row by row, so one bad event cannot sink the others.
+import os
+import queue
+import threading
+import time
+from datetime import datetime, timezone
+
+from sqlalchemy import insert
+
+from modules.database import engine
+from modules.metrics import ACTIVITY_BATCH, ACTIVITY_EVENTS, ACTIVITY_FLUSH_LATENCY, ACTIVITY_QUEUE
+from modules.rollups import apply_rollups
+from modules.monitor_models import ActivityLog, upsert_completions
+
+BATCH_SIZE = int(os.getenv("ACTIVITY_BATCH_SIZE", "200"))
+FLUSH_MS = float(os.getenv("ACTIVITY_FLUSH_MS", "500"))
+QUEUE_SIZE = int(os.getenv("ACTIVITY_QUEUE_SIZE", "10000"))
+DRAIN_TIMEOUT_S = float(os.getenv("ACTIVITY_DRAIN_TIMEOUT", "10"))
+# pause before retrying a failed batch (transient DB errors)
+RETRY_DELAY_S = float(os.getenv("ACTIVITY_RETRY_DELAY_MS", "200")) / 1000.0
+
+_STOP = object()
+
+
+class ActivityWriter:
+    """Bounded in-memory queue of activity rows flushed every `batch_size` events or `flush_ms`.
+
+    `submit` never blocks: when the queue is full the event is dropped and counted.
+    """
+
+    def __init__(self, bind=engine, batch_size=BATCH_SIZE, flush_ms=FLUSH_MS, queue_size=QUEUE_SIZE):
+        self.bind = bind
+        self.batch_size = max(1, int(batch_size))
+        self.flush_s = max(0.0, flush_ms / 1000.0)
+        self._queue = queue.Queue(maxsize=max(1, int(queue_size)))
+        self._lock = threading.Lock()
+        self._thread = None
+        self._closed = False
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+        self.flushes = 0
+
+    def start(self):
+        with self._lock:
+            if self._thread is None and not self._closed:
+                self._thread = threading.Thread(target=self._loop, name="activity-writer", daemon=True)
+                self._thread.start()
+
+    def submit(self, user_id, event_type, detail=None, lesson_id=None, progress=100.0):
+        """Queue one event (plus a lesson completion for `complete_lesson`); False if it was dropped."""
+        if self._thread is None:
+            self.start()
+        now = datetime.now(timezone.utc)
+        # timestamps are taken here, not at flush time
+        activity = {"user_id": user_id, "event_type": event_type, "detail": detail, "created_at": now}
+        completion = None
+        if event_type == "complete_lesson" and lesson_id and user_id is not None:
+            completion = {"lesson_id": lesson_id, "user_id": user_id, "progress": progress, "completed_at": now}
+        if self._closed:
+            return self._drop()
+        try:
+            self._queue.put_nowait((activity, completion))
+        except queue.Full:
+            return self._drop()
+        return True
+
+    def _drop(self):
+        with self._lock:
+            self.dropped += 1
+        ACTIVITY_EVENTS.inc(result="dropped")
+        return False
+
+    def _loop(self):
+        stopping = False
+        while not stopping:
+            item = self._queue.get()
+            if item is _STOP:
+                break
+            batch = [item]
+            deadline = time.monotonic() + self.flush_s
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                try:
+                    item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+            self._flush(batch)
+
+        # drain whatever is still queued on shutdown
+        batch = []
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is not _STOP:
+                batch.append(item)
+            if len(batch) >= self.batch_size:
+                self._flush(batch)
+                batch = []
+        if batch:
+            self._flush(batch)
+
+    def _write(self, batch):
+        activities = [a for a, _ in batch]
+        completions = [c for _, c in batch if c is not None]
+        with self.bind.begin() as conn:
+            conn.execute(insert(ActivityLog.__table__), activities)
+            new_completions = []
+            if completions:
+                # one row per (user, lesson), keeping the highest progress; only first
+                # completions of a lesson are counted, as rollups.rebuild does
+                new_completions = upsert_completions(conn, completions)
+            # rollups move with the raw rows: both land or neither does
+            apply_rollups(conn, activities, new_completions)
+
+    def _flush(self, batch):
+        started = time.perf_counter()
+        for attempt in range(2):
+            try:
+                self._write(batch)
+                break
+            except Exception as e:
+                print(f"Activity writer: batch of {len(batch)} events failed (attempt {attempt + 1}): {e}")
+                if attempt == 0:
+                    time.sleep(RETRY_DELAY_S)
+        else:
+            # the batch still fails: write rows one at a time so a bad row only loses itself
+            written = 0
+            for item in batch:
+                try:
+                    self._write([item])
+                    written += 1
+                except Exception as e:
+                    print(f"Activity writer: dropped event {item[0].get('event_type')!r}: {e}")
+            self._record(written, len(batch) - written)
+            return
+        ACTIVITY_FLUSH_LATENCY.observe(time.perf_counter() - started)
+        ACTIVITY_BATCH.observe(len(batch))
+        self._record(len(batch), 0)
+
+    def _record(self, written, failed):
+        if written:
+            ACTIVITY_EVENTS.inc(written, result="written")
+        if failed:
+            ACTIVITY_EVENTS.inc(failed, result="failed")
+        with self._lock:
+            self.written += written
+            self.failed += failed
+            self.flushes += 1
+
+    def close(self, timeout=DRAIN_TIMEOUT_S):
+        """Stop accepting events and flush everything already queued."""
+        with self._lock:
+            self._closed = True
+            thread = self._thread
+        if thread is None:
+            return
+        try:
+            self._queue.put(_STOP, timeout=timeout)
+        except queue.Full:
+            pass
+        thread.join(timeout)
+
+    def pending(self):
+        return self._queue.qsize()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "pending": self._queue.qsize(),
+                "capacity": self._queue.maxsize,
+                "batch_size": self.batch_size,
+                "flush_ms": self.flush_s * 1000.0,
+                "written": self.written,
+                "dropped": self.dropped,
+                "failed": self.failed,
+                "flushes": self.flushes,
+            }
+
+
+activity_writer = ActivityWriter()
+ACTIVITY_QUEUE.set_function(activity_writer.pending)
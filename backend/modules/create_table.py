@@ -1,5 +1,5 @@
-from sqlalchemy import Column, Integer, String, Boolean
-from database import Base
+from sqlalchemy import Column, Integer, String, Boolean, Index
+from modules.database import Base
 
 class User(Base):
     __tablename__ = "users"
@@ -10,4 +10,13 @@ class User(Base):
     hashed_password = Column(String, nullable=False)
     is_admin = Column(Boolean, default=False)
 
+    __table_args__ = (
+        # /admin/users?q= is a LIKE 'prefix%' search; under a non-C collation Postgres can
+        # only use a btree index for that with the pattern operator class
+        Index("ix_users_username_pattern", "username", postgresql_ops={"username": "text_pattern_ops"})
+        .ddl_if(dialect="postgresql"),
+        Index("ix_users_email_pattern", "email", postgresql_ops={"email": "text_pattern_ops"})
+        .ddl_if(dialect="postgresql"),
+    )
+
 
@@ -1,8 +1,13 @@
 import os
+import time
 from dotenv import load_dotenv
 from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from starlette.concurrency import run_in_threadpool
+
+from modules.metrics import DB_POOL, DB_SESSION_LATENCY
 
 
 
@@ -16,7 +21,159 @@ DATABASE_URL = os.getenv("DB_URL")
 if not DATABASE_URL:
     raise ValueError("DATABASE_URL not found in .env file")
 
+# Connection pool settings; SQLite keeps SQLAlchemy's defaults
+POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "1").lower() not in ("0", "false", "no")
+# DB_ASYNC=1 serves auth/monitor routes from an async engine (asyncpg / aiomysql / aiosqlite,
+# all listed in requirement.txt)
+DB_ASYNC = os.getenv("DB_ASYNC", "0").lower() in ("1", "true", "yes")
+
+# sync driver -> async driver for the same database
+ASYNC_DRIVERS = {"postgresql": "asyncpg", "mysql": "aiomysql", "sqlite": "aiosqlite"}
+
+
+def pool_options(url):
+    if make_url(url).get_backend_name() == "sqlite":
+        return {}
+    return {
+        "pool_size": POOL_SIZE,
+        "max_overflow": MAX_OVERFLOW,
+        "pool_timeout": POOL_TIMEOUT,
+        "pool_recycle": POOL_RECYCLE,
+        "pool_pre_ping": POOL_PRE_PING,
+    }
+
+
+def async_url(url):
+    url = make_url(url)
+    backend = url.get_backend_name()
+    if backend not in ASYNC_DRIVERS:
+        raise ValueError(f"No async driver configured for '{backend}'")
+    return url.set(drivername=f"{backend}+{ASYNC_DRIVERS[backend]}")
+
+
 # Create engine
-engine = create_engine(DATABASE_URL)
+engine = create_engine(DATABASE_URL, **pool_options(DATABASE_URL))
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
+
+async_engine = None
+AsyncSessionLocal = None
+if DB_ASYNC:
+    from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+    async_engine = create_async_engine(async_url(DATABASE_URL), **pool_options(DATABASE_URL))
+    AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
+
+# Request-scoped session dependency shared by all routers
+def get_db():
+    db = SessionLocal()
+    started = time.perf_counter()
+    try:
+        yield db
+    finally:
+        db.close()
+        DB_SESSION_LATENCY.observe(time.perf_counter() - started)
+
+
+class ThreadedSession:
+    """The AsyncSession calls the routes use, backed by a sync Session.
+
+    With DB_ASYNC off, each call runs in the threadpool, so async routes can be
+    written once and work against either engine. A handler that needs several
+    statements passes them to `run_sync` as one function: one threadpool hop here,
+    one greenlet switch on a native AsyncSession.
+    """
+
+    def __init__(self, session):
+        self.sync_session = session
+
+    def add(self, instance):
+        self.sync_session.add(instance)
+
+    def add_all(self, instances):
+        self.sync_session.add_all(instances)
+
+    async def run_sync(self, fn, *args, **kwargs):
+        return await run_in_threadpool(fn, self.sync_session, *args, **kwargs)
+
+    async def execute(self, statement, params=None):
+        def run():
+            result = self.sync_session.execute(statement, params)
+            # fetch rows in the worker thread, like AsyncSession's buffered results
+            return result.freeze()() if getattr(result, "returns_rows", True) else result
+        return await run_in_threadpool(run)
+
+    async def scalar(self, statement, params=None):
+        return await run_in_threadpool(self.sync_session.scalar, statement, params)
+
+    async def get(self, entity, ident):
+        return await run_in_threadpool(self.sync_session.get, entity, ident)
+
+    async def flush(self):
+        await run_in_threadpool(self.sync_session.flush)
+
+    async def commit(self):
+        await run_in_threadpool(self.sync_session.commit)
+
+    async def rollback(self):
+        await run_in_threadpool(self.sync_session.rollback)
+
+    async def refresh(self, instance):
+        await run_in_threadpool(self.sync_session.refresh, instance)
+
+    async def close(self):
+        await run_in_threadpool(self.sync_session.close)
+
+
+def new_async_session():
+    """A native AsyncSession with DB_ASYNC=1, otherwise a ThreadedSession; the caller closes it."""
+    return AsyncSessionLocal() if DB_ASYNC else ThreadedSession(SessionLocal())
+
+
+# Async session dependency for the auth/monitor routes
+async def get_async_db():
+    db = new_async_session()
+    started = time.perf_counter()
+    try:
+        yield db
+    finally:
+        await db.close()
+        DB_SESSION_LATENCY.observe(time.perf_counter() - started)
+
+
+def _pool_snapshot(pool):
+    stats = {"class": type(pool).__name__}
+    for key in ("size", "checkedin", "checkedout", "overflow"):
+        fn = getattr(pool, key, None)
+        if callable(fn):
+            stats[key] = fn()
+    return stats
+
+
+def pool_stats():
+    stats = {"sync": _pool_snapshot(engine.pool)}
+    if async_engine is not None:
+        stats["async"] = _pool_snapshot(async_engine.sync_engine.pool)
+    return stats
+
+
+async def dispose_engines():
+    if async_engine is not None:
+        await async_engine.dispose()
+    engine.dispose()
+
+
+def _register_pool_gauges(name, eng):
+    for state in ("size", "checkedin", "checkedout", "overflow"):
+        fn = getattr(eng.pool, state, None)
+        if callable(fn):
+            DB_POOL.set_function(fn, engine=name, state=state)
+
+
+_register_pool_gauges("sync", engine)
+if async_engine is not None:
+    _register_pool_gauges("async", async_engine.sync_engine)
@@ -0,0 +1,93 @@
+# modules/lazy_routes.py
+# Routers whose modules are only imported on the first request under their prefix
+# (or when the OpenAPI schema is requested), so a cold start does not pay for the
+# inference stack (numpy, OpenCV, onnxruntime / ultralytics) before serving /health.
+import asyncio
+import importlib
+import json
+import threading
+import time
+
+DOCS_PATHS = ("/openapi.json", "/docs", "/redoc")
+
+
+class LazyRouter:
+    def __init__(self, prefix, module, attr="router", **include_kwargs):
+        self.prefix = prefix
+        self.module_name = module
+        self.attr = attr
+        self.include_kwargs = include_kwargs
+        self.module = None
+        self.load_ms = None
+        self.error = None
+        self._lock = threading.Lock()
+
+    def matches(self, path):
+        return path == self.prefix or path.startswith(self.prefix + "/")
+
+    def load(self, app):
+        """Import the module and add its router to `app` (once; safe from any thread).
+
+        A failed import is remembered and re-raised without importing again; the
+        prefix then answers 503 until the process is restarted.
+        """
+        if self.module is not None:
+            return self.module
+        with self._lock:
+            if self.module is None:
+                if self.error is not None:
+                    raise RuntimeError(self.error)
+                started = time.perf_counter()
+                try:
+                    module = importlib.import_module(self.module_name)
+                    app.include_router(getattr(module, self.attr), **self.include_kwargs)
+                except Exception as e:
+                    self.error = f"{self.module_name} failed to import: {e!r}"
+                    print(self.error)
+                    raise
+                app.openapi_schema = None  # rebuilt with the new routes on next /openapi.json
+                self.load_ms = round((time.perf_counter() - started) * 1000.0, 1)
+                print(f"Loaded {self.module_name} for {self.prefix} in {self.load_ms} ms")
+                self.module = module
+        return self.module
+
+    def status(self):
+        return {"module": self.module_name, "loaded": self.module is not None, "load_ms": self.load_ms,
+                "error": self.error}
+
+
+class LazyRouters:
+    """ASGI middleware that loads a LazyRouter before the request that needs it is routed."""
+
+    def __init__(self, app, target, routers):
+        self.app = app
+        self.target = target
+        self.routers = routers
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] in ("http", "websocket"):
+            path = scope["path"]
+            loop = asyncio.get_running_loop()
+            for router in self.routers:
+                wanted = router.matches(path)
+                # docs are built from whichever routers load; a broken one is left out
+                if router.module is not None or not (wanted or path in DOCS_PATHS):
+                    continue
+                if router.error is None:
+                    try:
+                        # the import is slow and blocking; keep it off the event loop
+                        await loop.run_in_executor(None, router.load, self.target)
+                    except Exception:
+                        pass  # kept in router.error
+                if wanted and router.module is None:
+                    return await self._unavailable(scope, send, router.error)
+        await self.app(scope, receive, send)
+
+    async def _unavailable(self, scope, send, error):
+        if scope["type"] == "websocket":
+            await send({"type": "websocket.close", "code": 1011})
+            return
+        body = json.dumps({"error": error}).encode()
+        await send({"type": "http.response.start", "status": 503,
+                    "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())]})
+        await send({"type": "http.response.body", "body": body})
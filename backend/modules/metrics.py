@@ -0,0 +1,233 @@
+# modules/metrics.py
+# Minimal in-process metrics (counters, gauges, histograms) rendered in the
+# Prometheus text format at /metrics. Each observation is a lock plus a bisect,
+# so instrumentation can stay on in production.
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+# seconds; covers sub-millisecond stages up to slow requests
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_registry = []
+
+
+def _label_key(labelnames, labels):
+    return tuple(str(labels.get(name, "")) for name in labelnames)
+
+
+def _format_labels(labelnames, key, extra=None):
+    pairs = [(n, v) for n, v in zip(labelnames, key)]
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ""
+    escaped = (v.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, v in pairs)
+    return "{" + ",".join(f'{n}="{v}"' for (n, _), v in zip(pairs, escaped)) + "}"
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self._samples())
+        return lines
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name, documentation, labelnames=()):
+        super().__init__(name, documentation, labelnames)
+        self._values = {}
+
+    def inc(self, amount=1.0, **labels):
+        key = _label_key(self.labelnames, labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def _samples(self):
+        with self._lock:
+            items = list(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, k)} {v}" for k, v in items]
+
+
+class Gauge(_Metric):
+    """A gauge that is either set directly or read from a callback at scrape time."""
+
+    kind = "gauge"
+
+    def __init__(self, name, documentation, labelnames=()):
+        super().__init__(name, documentation, labelnames)
+        self._values = {}
+        self._functions = {}
+
+    def set(self, value, **labels):
+        key = _label_key(self.labelnames, labels)
+        with self._lock:
+            self._values[key] = float(value)
+
+    def inc(self, amount=1.0, **labels):
+        key = _label_key(self.labelnames, labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def dec(self, amount=1.0, **labels):
+        self.inc(-amount, **labels)
+
+    def set_function(self, fn, **labels):
+        with self._lock:
+            self._functions[_label_key(self.labelnames, labels)] = fn
+
+    def _samples(self):
+        with self._lock:
+            values = dict(self._values)
+            functions = list(self._functions.items())
+        for key, fn in functions:
+            try:
+                values[key] = float(fn())
+            except Exception:
+                continue
+        return [f"{self.name}{_format_labels(self.labelnames, k)} {v}" for k, v in values.items()]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}  # key -> [bucket counts..., sum, count]
+
+    def observe(self, value, **labels):
+        key = _label_key(self.labelnames, labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0] * (len(self.buckets) + 1) + [0.0, 0]
+            series[index] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def _samples(self):
+        with self._lock:
+            items = [(k, list(v)) for k, v in self._series.items()]
+        lines = []
+        for key, series in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), series):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, ('le', le))} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {series[-2]}")
+            lines.append(f"{self.name}_count{labels} {series[-1]}")
+        return lines
+
+
+def render_metrics():
+    lines = []
+    for metric in list(_registry):
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# HTTP
+HTTP_REQUESTS = Counter("http_requests_total", "HTTP requests by route and status", ("method", "route", "status"))
+HTTP_LATENCY = Histogram("http_request_duration_seconds", "HTTP request latency by route", ("method", "route"))
+HTTP_IN_FLIGHT = Gauge("http_requests_in_flight", "HTTP requests currently being served")
+
+# Inference path
+STAGE_LATENCY = Histogram("yolo_stage_duration_seconds", "Time spent in each /yolo/predict stage", ("stage",))
+BATCH_SIZE = Histogram("yolo_batch_size", "Images per batched forward pass", buckets=(1, 2, 4, 8, 16, 32, 64))
+QUEUE_DEPTH = Gauge("yolo_queue_depth", "Frames waiting in a batch scheduler", ("scheduler",))
+POOL_PENDING = Gauge("yolo_pool_pending", "Jobs admitted to the inference worker pool")
+REJECTED = Counter("yolo_rejected_total", "Frames refused because of backpressure", ("reason",))
+
+# Password hashing
+HASH_LATENCY = Histogram("auth_hash_duration_seconds", "Argon2 hash/verify time including queueing", ("op",))
+HASH_PENDING = Gauge("auth_hash_pending", "Hash jobs admitted to the password hashing pool")
+HASH_REJECTED = Counter("auth_hash_rejected_total", "Hash jobs refused or timed out", ("reason",))
+
+# Database
+DB_SESSION_LATENCY = Histogram("db_session_duration_seconds", "Lifetime of a request-scoped DB session")
+ACTIVITY_EVENTS = Counter("activity_events_total", "Activity events by outcome (written, dropped, failed)", ("result",))
+ACTIVITY_QUEUE = Gauge("activity_queue_depth", "Activity events waiting to be written")
+ACTIVITY_BATCH = Histogram("activity_flush_rows", "Events written per activity flush", buckets=(1, 10, 50, 100, 200, 500, 1000))
+ACTIVITY_FLUSH_LATENCY = Histogram("activity_flush_duration_seconds", "Time to write one batch of activity events")
+DB_POOL = Gauge("db_pool_connections", "Connection pool state (size, checkedin, checkedout, overflow)", ("engine", "state"))
+
+
+def route_template(scope):
+    """Full path template of the matched route, e.g. /auth/login or /admin/users/{user_id}.
+
+    Newer FastAPI versions keep included routers nested, so route.path lacks the prefix
+    given to include_router (and any mount prefix); it is recovered from the request
+    path by rendering the route's own template with the matched path params.
+    """
+    route = scope.get("route")
+    template = getattr(route, "path_format", None) or getattr(route, "path", None)
+    if not template:
+        return "unmatched"
+    try:
+        rendered = template.format(**scope.get("path_params", {}))
+    except (KeyError, IndexError, ValueError):
+        return template
+    path = scope.get("path", "")
+    if path.endswith(rendered) and len(path) > len(rendered):
+        return path[:len(path) - len(rendered)] + template
+    return template
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording in-flight requests and per-route latency.
+
+    Routes are labelled by their path template (e.g. /models/load/{name}) so
+    label cardinality stays bounded.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = {"code": 500}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        HTTP_IN_FLIGHT.inc()
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            HTTP_IN_FLIGHT.dec()
+            path = route_template(scope)
+            method = scope.get("method", "")
+            HTTP_LATENCY.observe(time.perf_counter() - started, method=method, route=path)
+            HTTP_REQUESTS.inc(method=method, route=path, status=status["code"])
@@ -1,6 +1,10 @@
-from sqlalchemy import Column, Integer, String, DateTime, Float
+# modules/monitor_models.py
+# Activity / lesson progress tables (the single definition; monitor/create_table.py re-exports these).
+from sqlalchemy import Column, Integer, String, DateTime, Float, Index
+from sqlalchemy.dialects import mysql, postgresql, sqlite
 from sqlalchemy.sql import func
-from database import Base
+
+from modules.database import Base
 
 
 class ActivityLog(Base):
@@ -11,6 +15,13 @@ class ActivityLog(Base):
     detail = Column(String, nullable=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
+    __table_args__ = (
+        # a user's recent activity; time-window scans (rollup rebuild, retention)
+        Index("ix_activity_logs_user_created", "user_id", "created_at"),
+        Index("ix_activity_logs_type_created", "event_type", "created_at"),
+        Index("ix_activity_logs_created", "created_at"),
+    )
+
 
 class LessonCompletion(Base):
     __tablename__ = "lesson_completions"
@@ -19,3 +30,102 @@ class LessonCompletion(Base):
     user_id = Column(Integer, nullable=False)
     progress = Column(Float, default=100.0)
     completed_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    __table_args__ = (
+        # one row per (user, lesson); on Postgres the index also carries progress/completed_at
+        # so "progress of user X" is answered from the index alone
+        Index("uq_lesson_completions_user_lesson", "user_id", "lesson_id", unique=True,
+              postgresql_include=["progress", "completed_at"]),
+        Index("ix_lesson_completions_lesson_completed", "lesson_id", "completed_at"),
+        Index("ix_lesson_completions_completed", "completed_at"),
+    )
+
+
+def merge_completions(rows):
+    """Collapse rows for the same (user_id, lesson_id): max progress, earliest completed_at."""
+    merged = {}
+    for row in rows:
+        key = (row["user_id"], row["lesson_id"])
+        current = merged.get(key)
+        if current is None:
+            merged[key] = dict(row)
+            continue
+        current["progress"] = max(current.get("progress") or 0.0, row.get("progress") or 0.0)
+        if row.get("completed_at") is not None and (
+            current.get("completed_at") is None or row["completed_at"] < current["completed_at"]
+        ):
+            current["completed_at"] = row["completed_at"]
+    return list(merged.values())
+
+
+# ON CONFLICT needs the unique index; tables created before it existed get it from
+# `python -m monitor.migrate` and use the row-by-row path until then. None means not
+# checked yet (e.g. the DB was down at startup): the first upsert checks, and keeps
+# the row-by-row path until the index is known to exist.
+completion_index = {"unique": None}
+
+
+def check_completion_index(bind):
+    from sqlalchemy import inspect
+    try:
+        indexes = inspect(bind).get_indexes(LessonCompletion.__tablename__)
+    except Exception:
+        return None
+    completion_index["unique"] = any(
+        ix.get("unique") and list(ix["column_names"]) == ["user_id", "lesson_id"] for ix in indexes
+    )
+    if not completion_index["unique"]:
+        print("lesson_completions has no unique (user_id, lesson_id) index; run `python -m monitor.migrate`")
+    return completion_index["unique"]
+
+
+def _existing_pairs(conn, rows):
+    from sqlalchemy import select, tuple_
+    table = LessonCompletion.__table__
+    keys = [(row["user_id"], row["lesson_id"]) for row in rows]
+    return set(conn.execute(
+        select(table.c.user_id, table.c.lesson_id).where(tuple_(table.c.user_id, table.c.lesson_id).in_(keys))
+    ).all())
+
+
+def upsert_completions(conn, rows):
+    """Insert lesson completions; an existing (user_id, lesson_id) row keeps the higher progress.
+
+    Returns the rows that created a new (user_id, lesson_id) pair, which is what the
+    lesson completion rollup counts (the same rows `rollups.rebuild` finds later).
+    """
+    rows = merge_completions(rows)
+    if not rows:
+        return []
+    table = LessonCompletion.__table__
+    # read inside the writer's transaction, right before the upsert
+    existing = _existing_pairs(conn, rows)
+    new_rows = [row for row in rows if (row["user_id"], row["lesson_id"]) not in existing]
+    dialect = conn.dialect.name
+    if completion_index["unique"] is None:
+        check_completion_index(conn)
+    if not completion_index["unique"]:
+        dialect = "generic"
+    if dialect in ("postgresql", "sqlite"):
+        insert = postgresql.insert if dialect == "postgresql" else sqlite.insert
+        stmt = insert(table)
+        # SQLite's two-argument max() is the scalar greatest()
+        greatest = func.greatest if dialect == "postgresql" else func.max
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["user_id", "lesson_id"],
+            set_={"progress": greatest(table.c.progress, stmt.excluded.progress)},
+        )
+        conn.execute(stmt, rows)
+    elif dialect in ("mysql", "mariadb"):
+        stmt = mysql.insert(table)
+        conn.execute(stmt.on_duplicate_key_update(progress=func.greatest(table.c.progress, stmt.inserted.progress)), rows)
+    else:
+        for row in rows:
+            where = (table.c.user_id == row["user_id"], table.c.lesson_id == row["lesson_id"])
+            updated = conn.execute(
+                table.update().where(*where, table.c.progress < row["progress"]).values(progress=row["progress"])
+            ).rowcount
+            exists = updated or conn.execute(table.select().where(*where)).first() is not None
+            if not exists:
+                conn.execute(table.insert(), [row])
+    return new_rows
@@ -0,0 +1,199 @@
+# modules/presence.py
+# Who is online, from client heartbeats. A user is online until PRESENCE_TTL seconds
+# after their last heartbeat. Heartbeats are grouped into PRESENCE_BUCKET-second
+# buckets so expiry drops whole buckets instead of scanning every user.
+#
+# Backends (PRESENCE_BACKEND):
+#   memory - this process only (default; fine for a single worker)
+#   sqlite - a shared SQLite file (PRESENCE_SQLITE_PATH), for several workers on one host
+#   redis  - a sorted set in Redis (PRESENCE_REDIS_URL), for several hosts
+import os
+import sqlite3
+import threading
+import time
+
+PRESENCE_BACKEND = os.getenv("PRESENCE_BACKEND", "memory")
+PRESENCE_TTL = float(os.getenv("PRESENCE_TTL", "60"))
+PRESENCE_BUCKET = float(os.getenv("PRESENCE_BUCKET", "5"))
+PRESENCE_SQLITE_PATH = os.getenv("PRESENCE_SQLITE_PATH", "presence.db")
+PRESENCE_REDIS_URL = os.getenv("PRESENCE_REDIS_URL", "redis://localhost:6379/0")
+
+
+class MemoryPresence:
+    """Bucketed expiry wheel: bucket -> {user_id}, plus user_id -> (bucket, last_seen, status)."""
+
+    blocking = False
+
+    def __init__(self, ttl=PRESENCE_TTL, bucket_s=PRESENCE_BUCKET, clock=time.time):
+        self.ttl = ttl
+        self.bucket_s = max(0.001, bucket_s)
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._buckets = {}
+        self._users = {}
+
+    def _bucket(self, ts):
+        return int(ts // self.bucket_s)
+
+    def _expire(self, now):
+        # a bucket is dropped once even its newest heartbeat is older than the ttl;
+        # there are at most ttl / bucket_s + 1 live buckets to look at
+        cutoff = self._bucket(now - self.ttl)
+        for bucket in [b for b in self._buckets if b < cutoff]:
+            for user_id in self._buckets.pop(bucket):
+                self._users.pop(user_id, None)
+
+    def heartbeat(self, user_id, status=None):
+        now = self.clock()
+        bucket = self._bucket(now)
+        with self._lock:
+            self._expire(now)
+            previous = self._users.get(user_id)
+            if previous is not None:
+                if previous[0] != bucket:
+                    self._buckets[previous[0]].discard(user_id)
+                status = status or previous[2]
+            self._buckets.setdefault(bucket, set()).add(user_id)
+            self._users[user_id] = (bucket, now, status or "online")
+
+    def leave(self, user_id):
+        with self._lock:
+            previous = self._users.pop(user_id, None)
+            if previous is not None:
+                self._buckets.get(previous[0], set()).discard(user_id)
+
+    def count(self):
+        with self._lock:
+            self._expire(self.clock())
+            return len(self._users)
+
+    def online(self, limit=None):
+        with self._lock:
+            self._expire(self.clock())
+            items = list(self._users.items())
+        items.sort(key=lambda item: item[1][1], reverse=True)
+        return [{"user_id": u, "last_seen": seen, "status": status} for u, (_, seen, status) in items[:limit]]
+
+
+class SqlitePresence:
+    """Presence shared by worker processes through one SQLite file (WAL mode)."""
+
+    blocking = True
+
+    def __init__(self, path=PRESENCE_SQLITE_PATH, ttl=PRESENCE_TTL, bucket_s=PRESENCE_BUCKET, clock=time.time):
+        self.ttl = ttl
+        self.bucket_s = max(0.001, bucket_s)
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=5, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS presence ("
+            "user_id INTEGER PRIMARY KEY, bucket INTEGER NOT NULL, last_seen REAL NOT NULL, status TEXT NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS ix_presence_bucket ON presence (bucket)")
+        self._last_expire = None
+
+    def _bucket(self, ts):
+        return int(ts // self.bucket_s)
+
+    def _expire(self, now):
+        # at most one DELETE per bucket interval per process; it only touches expired rows
+        cutoff = self._bucket(now - self.ttl)
+        if self._last_expire != cutoff:
+            self._conn.execute("DELETE FROM presence WHERE bucket < ?", (cutoff,))
+            self._last_expire = cutoff
+        return cutoff
+
+    def heartbeat(self, user_id, status=None):
+        now = self.clock()
+        with self._lock:
+            self._expire(now)
+            self._conn.execute(
+                "INSERT INTO presence (user_id, bucket, last_seen, status) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(user_id) DO UPDATE SET bucket = excluded.bucket, last_seen = excluded.last_seen, "
+                "status = COALESCE(?, presence.status)",
+                (user_id, self._bucket(now), now, status or "online", status),
+            )
+
+    def leave(self, user_id):
+        with self._lock:
+            self._conn.execute("DELETE FROM presence WHERE user_id = ?", (user_id,))
+
+    def count(self):
+        with self._lock:
+            cutoff = self._expire(self.clock())
+            return self._conn.execute("SELECT COUNT(*) FROM presence WHERE bucket >= ?", (cutoff,)).fetchone()[0]
+
+    def online(self, limit=None):
+        with self._lock:
+            cutoff = self._expire(self.clock())
+            rows = self._conn.execute(
+                "SELECT user_id, last_seen, status FROM presence WHERE bucket >= ? ORDER BY last_seen DESC LIMIT ?",
+                (cutoff, -1 if limit is None else limit),
+            ).fetchall()
+        return [{"user_id": u, "last_seen": seen, "status": status} for u, seen, status in rows]
+
+
+class RedisPresence:
+    """Sorted set of user_id scored by last heartbeat; statuses in a hash."""
+
+    blocking = True
+
+    def __init__(self, url=PRESENCE_REDIS_URL, ttl=PRESENCE_TTL, key="presence", clock=time.time):
+        import redis
+        self.ttl = ttl
+        self.clock = clock
+        self._redis = redis.Redis.from_url(url)
+        self._online = f"{key}:online"
+        self._status = f"{key}:status"
+
+    def _expire(self, now):
+        expired = self._redis.zrangebyscore(self._online, "-inf", now - self.ttl)
+        if expired:
+            pipe = self._redis.pipeline()
+            pipe.zrem(self._online, *expired)
+            pipe.hdel(self._status, *expired)
+            pipe.execute()
+
+    def heartbeat(self, user_id, status=None):
+        pipe = self._redis.pipeline()
+        pipe.zadd(self._online, {user_id: self.clock()})
+        if status:
+            pipe.hset(self._status, user_id, status)
+        pipe.execute()
+
+    def leave(self, user_id):
+        pipe = self._redis.pipeline()
+        pipe.zrem(self._online, user_id)
+        pipe.hdel(self._status, user_id)
+        pipe.execute()
+
+    def count(self):
+        self._expire(self.clock())
+        return self._redis.zcard(self._online)
+
+    def online(self, limit=None):
+        self._expire(self.clock())
+        end = -1 if limit is None else limit - 1
+        members = self._redis.zrevrange(self._online, 0, end, withscores=True)
+        ids = [m.decode() if isinstance(m, bytes) else m for m, _ in members]
+        statuses = self._redis.hmget(self._status, ids) if ids else []
+        return [
+            {"user_id": int(u), "last_seen": seen, "status": (s.decode() if s else "online")}
+            for u, (_, seen), s in zip(ids, members, statuses)
+        ]
+
+
+def create_presence_store(backend=PRESENCE_BACKEND):
+    if backend == "memory":
+        return MemoryPresence()
+    if backend == "sqlite":
+        return SqlitePresence()
+    if backend == "redis":
+        return RedisPresence()
+    raise ValueError(f"Unknown PRESENCE_BACKEND '{backend}' (expected memory, sqlite or redis)")
+
+
+presence = create_presence_store()
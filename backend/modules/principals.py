@@ -0,0 +1,92 @@
+# modules/principals.py
+# In-process cache of resolved principals (who a bearer token belongs to and whether
+# they are an admin), keyed by a digest of the token. Entries live until the token's
+# `exp` or PRINCIPAL_CACHE_TTL, whichever comes first, so a cache hit skips both the
+# JWT signature check and the DB lookups.
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+
+PRINCIPAL_CACHE_SIZE = int(os.getenv("PRINCIPAL_CACHE_SIZE", "10000"))
+# bounds how long a deleted user / revoked admin keeps working without an explicit invalidate
+PRINCIPAL_CACHE_TTL = float(os.getenv("PRINCIPAL_CACHE_TTL", "60"))
+
+
+def token_digest(token):
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+class PrincipalCache:
+    """LRU + TTL map of (kind, token digest) -> principal."""
+
+    def __init__(self, max_entries=PRINCIPAL_CACHE_SIZE, ttl=PRINCIPAL_CACHE_TTL, clock=time.time):
+        self.max_entries = max(1, int(max_entries))
+        self.ttl = ttl
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # (kind, digest) -> (expires_at, subject, principal)
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, kind, token):
+        key = (kind, token_digest(token))
+        now = self.clock()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > now:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[2]
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+        return None
+
+    def put(self, kind, token, subject, principal, exp=None):
+        expires_at = self.clock() + self.ttl
+        if exp is not None:
+            expires_at = min(expires_at, float(exp))
+        with self._lock:
+            self._entries[(kind, token_digest(token))] = (expires_at, subject, principal)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate_token(self, token):
+        digest = token_digest(token)
+        with self._lock:
+            for key in [k for k in self._entries if k[1] == digest]:
+                del self._entries[key]
+
+    def invalidate_subject(self, subject):
+        """Drop every cached token of a user (e.g. after deleting them or changing their role)."""
+        with self._lock:
+            for key in [k for k, entry in self._entries.items() if entry[1] == subject]:
+                del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            return {"entries": len(self._entries), "max_entries": self.max_entries, "ttl": self.ttl,
+                    "hits": self.hits, "misses": self.misses}
+
+
+principal_cache = PrincipalCache()
+
+# Whether the optional `admins` table exists; set by check_admins_table (at startup).
+# None means unknown (e.g. the DB was not up yet): the next admin request checks again.
+admins_table = {"exists": None}
+
+
+def check_admins_table(bind):
+    from sqlalchemy import inspect
+    try:
+        admins_table["exists"] = inspect(bind).has_table("admins")
+    except Exception as e:
+        print("Could not check for the admins table:", e)
+        admins_table["exists"] = None
+    return admins_table["exists"]
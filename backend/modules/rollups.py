@@ -0,0 +1,163 @@
+# modules/rollups.py
+# Per-day rollups of activity_logs / lesson_completions for the admin dashboard.
+# The activity writer updates them in the same transaction as each batch of raw
+# rows, so admin stats read a few rows per day instead of scanning the history.
+#
+# Backfill / repair from the raw tables:
+#   cd backend && python -m modules.rollups rebuild [--since 2025-01-01]
+import argparse
+from collections import Counter
+from datetime import date, datetime, timedelta, timezone
+
+from sqlalchemy import Column, Date, Integer, String, delete, func, select
+from sqlalchemy.dialects import mysql, postgresql, sqlite
+
+from modules.database import Base
+
+
+class DailyActiveUser(Base):
+    __tablename__ = "rollup_daily_active_users"
+    day = Column(Date, primary_key=True)
+    user_id = Column(Integer, primary_key=True)
+
+
+class DailyEventCount(Base):
+    __tablename__ = "rollup_daily_events"
+    day = Column(Date, primary_key=True)
+    event_type = Column(String(64), primary_key=True)
+    count = Column(Integer, nullable=False, default=0)
+
+
+class DailyLessonCompletion(Base):
+    __tablename__ = "rollup_daily_lesson_completions"
+    day = Column(Date, primary_key=True)
+    lesson_id = Column(Integer, primary_key=True)
+    count = Column(Integer, nullable=False, default=0)
+
+
+def _day(ts):
+    if ts is None:
+        return datetime.now(timezone.utc).date()
+    if ts.tzinfo is not None:
+        ts = ts.astimezone(timezone.utc)
+    return ts.date()
+
+
+def _upsert(conn, table, rows, keys, increment=None):
+    """Insert `rows`; on a key conflict add `increment` to the existing row (or ignore it)."""
+    if not rows:
+        return
+    dialect = conn.dialect.name
+    if dialect in ("postgresql", "sqlite"):
+        insert = postgresql.insert if dialect == "postgresql" else sqlite.insert
+        stmt = insert(table)
+        if increment:
+            stmt = stmt.on_conflict_do_update(
+                index_elements=keys, set_={increment: table.c[increment] + stmt.excluded[increment]}
+            )
+        else:
+            stmt = stmt.on_conflict_do_nothing(index_elements=keys)
+        conn.execute(stmt, rows)
+    elif dialect in ("mysql", "mariadb"):
+        stmt = mysql.insert(table)
+        column = increment or keys[0]
+        value = table.c[column] + stmt.inserted[column] if increment else table.c[column]
+        conn.execute(stmt.on_duplicate_key_update({column: value}), rows)
+    else:
+        # generic fallback: one row at a time
+        for row in rows:
+            where = [table.c[k] == row[k] for k in keys]
+            if increment:
+                updated = conn.execute(
+                    table.update().where(*where).values({increment: table.c[increment] + row[increment]})
+                ).rowcount
+            else:
+                updated = conn.execute(select(func.count()).select_from(table).where(*where)).scalar()
+            if not updated:
+                conn.execute(table.insert(), [row])
+
+
+def apply_rollups(conn, activities, completions):
+    """Fold one batch of raw rows (the dicts the activity writer inserts) into the rollups."""
+    active = set()
+    events = Counter()
+    lessons = Counter()
+    for row in activities:
+        day = _day(row.get("created_at"))
+        events[(day, row["event_type"])] += 1
+        if row.get("user_id") is not None:
+            active.add((day, row["user_id"]))
+    for row in completions:
+        lessons[(_day(row.get("completed_at")), row["lesson_id"])] += 1
+
+    _upsert(conn, DailyActiveUser.__table__, [{"day": d, "user_id": u} for d, u in sorted(active)], ["day", "user_id"])
+    _upsert(conn, DailyEventCount.__table__,
+            [{"day": d, "event_type": t, "count": n} for (d, t), n in sorted(events.items())],
+            ["day", "event_type"], increment="count")
+    _upsert(conn, DailyLessonCompletion.__table__,
+            [{"day": d, "lesson_id": l, "count": n} for (d, l), n in sorted(lessons.items())],
+            ["day", "lesson_id"], increment="count")
+
+
+def rebuild(bind, since=None, chunk_days=7):
+    """Recompute rollups from the raw tables, a few days per transaction."""
+    from modules.monitor_models import ActivityLog, LessonCompletion
+
+    with bind.connect() as conn:
+        first = conn.execute(select(func.min(ActivityLog.created_at))).scalar()
+        first_completion = conn.execute(select(func.min(LessonCompletion.completed_at))).scalar()
+    starts = [_day(ts) for ts in (first, first_completion) if ts is not None]
+    if not starts:
+        return 0
+    start = max(min(starts), since) if since else min(starts)
+    end = datetime.now(timezone.utc).date() + timedelta(days=1)
+    # activity older than the oldest hot row has been moved to the archive by retention
+    # (modules/activity_archive.py); its rollups cannot be recomputed here, so keep them
+    activity_start = _day(first) if first is not None else end
+
+    days = 0
+    while start < end:
+        stop = min(start + timedelta(days=chunk_days), end)
+        lo = datetime.combine(start, datetime.min.time())
+        hi = datetime.combine(stop, datetime.min.time())
+        with bind.begin() as conn:
+            for model in (DailyActiveUser, DailyEventCount):
+                conn.execute(delete(model).where(model.day >= max(start, activity_start), model.day < stop))
+            conn.execute(delete(DailyLessonCompletion).where(DailyLessonCompletion.day >= start,
+                                                             DailyLessonCompletion.day < stop))
+            activities = [
+                {"user_id": r.user_id, "event_type": r.event_type, "created_at": r.created_at}
+                for r in conn.execute(
+                    select(ActivityLog.user_id, ActivityLog.event_type, ActivityLog.created_at)
+                    .where(ActivityLog.created_at >= lo, ActivityLog.created_at < hi)
+                )
+            ]
+            completions = [
+                {"lesson_id": r.lesson_id, "completed_at": r.completed_at}
+                for r in conn.execute(
+                    select(LessonCompletion.lesson_id, LessonCompletion.completed_at)
+                    .where(LessonCompletion.completed_at >= lo, LessonCompletion.completed_at < hi)
+                )
+            ]
+            apply_rollups(conn, activities, completions)
+        days += (stop - start).days
+        start = stop
+    return days
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Maintain admin analytics rollups")
+    sub = parser.add_subparsers(dest="command", required=True)
+    rebuild_cmd = sub.add_parser("rebuild", help="recompute rollups from activity_logs / lesson_completions")
+    rebuild_cmd.add_argument("--since", type=date.fromisoformat, help="only rebuild days from this date (YYYY-MM-DD)")
+    args = parser.parse_args(argv)
+
+    from modules.database import engine
+    Base.metadata.create_all(engine, tables=[DailyActiveUser.__table__, DailyEventCount.__table__,
+                                             DailyLessonCompletion.__table__])
+    days = rebuild(engine, since=args.since)
+    print(f"Rebuilt rollups for {days} day(s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,5 @@
 # modules/yolo_db.py
-from sqlalchemy import Column, Integer, String
+from sqlalchemy import BigInteger, Column, Integer, String, inspect, text
 from modules.database import Base
 
 class ModelInfo(Base):
@@ -10,5 +10,15 @@ class ModelInfo(Base):
     version = Column(String)
     description = Column(String)
     file_path = Column(String)
+    size_bytes = Column(BigInteger)
+    sha256 = Column(String(64), index=True)
 
 
+def ensure_model_columns(engine):
+    """Add columns introduced after the `models` table was first created (create_all won't)."""
+    existing = {c["name"] for c in inspect(engine).get_columns(ModelInfo.__tablename__)}
+    added = {"size_bytes": "BIGINT", "sha256": "VARCHAR(64)"}
+    with engine.begin() as conn:
+        for name, sql_type in added.items():
+            if name not in existing:
+                conn.execute(text(f"ALTER TABLE {ModelInfo.__tablename__} ADD COLUMN {name} {sql_type}"))
@@ -0,0 +1,94 @@
+# monitor/migrate.py
+# One-off migration for the activity / lesson completion tables:
+#   1. backfill NULL progress / completed_at on lesson_completions
+#   2. collapse duplicate (user_id, lesson_id) rows into one (max progress, earliest completed_at)
+#   3. create the composite indexes and the unique (user_id, lesson_id) index
+# Safe to re-run.
+#
+#   cd backend && python -m monitor.migrate [--dry-run] [--batch 500]
+import argparse
+
+from sqlalchemy import func, select, text, update
+
+from modules.database import Base, engine
+from modules.monitor_models import ActivityLog, LessonCompletion
+
+
+def backfill(conn):
+    t = LessonCompletion.__table__
+    progress = conn.execute(update(t).where(t.c.progress.is_(None)).values(progress=100.0)).rowcount
+    completed = conn.execute(update(t).where(t.c.completed_at.is_(None)).values(completed_at=func.now())).rowcount
+    return progress, completed
+
+
+def duplicate_groups(conn, limit):
+    t = LessonCompletion.__table__
+    return conn.execute(
+        select(t.c.user_id, t.c.lesson_id, func.min(t.c.id), func.max(t.c.progress), func.min(t.c.completed_at))
+        .group_by(t.c.user_id, t.c.lesson_id)
+        .having(func.count() > 1)
+        .limit(limit)
+    ).all()
+
+
+def deduplicate(bind, batch=500, dry_run=False):
+    """Keep the lowest id per (user_id, lesson_id), carrying over the best progress; a batch per transaction."""
+    t = LessonCompletion.__table__
+    groups_done = rows_deleted = 0
+    while True:
+        with bind.begin() as conn:
+            groups = duplicate_groups(conn, batch)
+            if not groups:
+                break
+            if dry_run:
+                rows_deleted += sum(
+                    conn.execute(select(func.count()).select_from(t)
+                                 .where(t.c.user_id == u, t.c.lesson_id == l)).scalar() - 1
+                    for u, l, *_ in groups
+                )
+                groups_done += len(groups)
+                break
+            for user_id, lesson_id, keep_id, progress, completed_at in groups:
+                conn.execute(update(t).where(t.c.id == keep_id).values(progress=progress, completed_at=completed_at))
+                rows_deleted += conn.execute(
+                    t.delete().where(t.c.user_id == user_id, t.c.lesson_id == lesson_id, t.c.id != keep_id)
+                ).rowcount
+            groups_done += len(groups)
+    return groups_done, rows_deleted
+
+
+def create_indexes(bind):
+    created = []
+    for table in (ActivityLog.__table__, LessonCompletion.__table__):
+        for index in table.indexes:
+            index.create(bind, checkfirst=True)
+            created.append(index.name)
+    return created
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Deduplicate lesson completions and add activity indexes")
+    parser.add_argument("--dry-run", action="store_true", help="only report what would change (first batch)")
+    parser.add_argument("--batch", type=int, default=500, help="duplicate groups per transaction")
+    args = parser.parse_args(argv)
+
+    Base.metadata.create_all(engine, tables=[ActivityLog.__table__, LessonCompletion.__table__])
+    if args.dry_run:
+        groups, rows = deduplicate(engine, args.batch, dry_run=True)
+        print(f"Would merge {groups}+ duplicate (user, lesson) groups, deleting {rows}+ rows")
+        return
+
+    with engine.begin() as conn:
+        progress, completed = backfill(conn)
+    print(f"Backfilled progress on {progress} rows, completed_at on {completed} rows")
+    groups, rows = deduplicate(engine, args.batch)
+    print(f"Merged {groups} duplicate (user, lesson) groups, deleted {rows} rows")
+    print("Indexes ensured:", ", ".join(create_indexes(engine)))
+    if engine.dialect.name == "postgresql":
+        with engine.begin() as conn:
+            conn.execute(text("ANALYZE activity_logs"))
+            conn.execute(text("ANALYZE lesson_completions"))
+
+
+if __name__ == "__main__":
+    main()
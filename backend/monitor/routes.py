@@ -1,24 +1,24 @@
-import sys
+import csv
+import io
+import json
 import time
 import os
-from typing import Dict
 from types import SimpleNamespace
-from fastapi import APIRouter, Depends, HTTPException, WebSocket, WebSocketDisconnect, status
+from fastapi import APIRouter, Depends, HTTPException, Query, WebSocket, WebSocketDisconnect, status
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from sqlalchemy.orm import Session
 from datetime import datetime, timedelta
-from sqlalchemy import func, text
+from sqlalchemy import func, select, text
 from jose import jwt, JWTError
 
-# ensure modules package is importable
-sys.path.append(r"D:\WORK\Python\web\github_zone\vsl_web_new\backend\modules")
-from modules.database import SessionLocal
+from modules.activity_archive import query_activity
+from modules.database import engine, get_async_db, new_async_session
 from modules.monitor_models import ActivityLog, LessonCompletion
 from modules.create_table import User
-
-# Simple in-memory presence store: user_id -> last_seen_timestamp
-online_users: Dict[int, float] = {}
-user_status_overrides: Dict[int, str] = {}
+from modules.presence import presence
+from modules.principals import admins_table, check_admins_table, principal_cache
+from modules.rollups import DailyActiveUser, DailyEventCount, DailyLessonCompletion
 
 # JWT settings (keep in sync with auth/utils.py)
 SECRET_KEY = os.getenv("JWT_SECRET", "supersecretkey")
@@ -33,31 +33,51 @@ auth_scheme = HTTPBearer()
 router = APIRouter(prefix="", tags=["monitor"])
 
 
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
 
-def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(auth_scheme), db: Session = Depends(get_db)):
-    token = credentials.credentials
+def _decode_subject(token):
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        username: str = payload.get("sub")
-        if username is None:
-            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token")
     except JWTError:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token")
+    username = payload.get("sub")
+    if username is None:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token")
+    return username, payload.get("exp")
+
+
+async def _fetch(statement, params=None):
+    # principals are resolved on cache misses only, with a short-lived session of their own
+    db = new_async_session()
+    try:
+        return (await db.execute(statement, params)).first()
+    finally:
+        await db.close()
+
+
+async def _load_user(username):
+    row = await _fetch(select(User.id, User.username, User.email, User.is_admin).where(User.username == username))
+    if row is None:
+        return None
+    return SimpleNamespace(id=row.id, username=row.username, email=row.email, is_admin=row.is_admin)
 
-    user = db.query(User).filter(User.username == username).first()
+
+# Resolved principals are cached per token (modules/principals.py) until the token
+# expires or PRINCIPAL_CACHE_TTL passes, so polling does not hit the DB on every call.
+async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(auth_scheme)):
+    token = credentials.credentials
+    user = principal_cache.get("user", token)
+    if user is not None:
+        return user
+
+    username, exp = _decode_subject(token)
+    user = await _load_user(username)
     if not user:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="User not found")
+    principal_cache.put("user", token, username, user, exp)
     return user
 
 
-def get_current_admin(credentials: HTTPAuthorizationCredentials = Depends(auth_scheme), db: Session = Depends(get_db)):
+async def get_current_admin(credentials: HTTPAuthorizationCredentials = Depends(auth_scheme)):
     token = credentials.credentials if credentials else None
 
     if ADMIN_STATIC_TOKEN and token == ADMIN_STATIC_TOKEN:
@@ -66,57 +86,274 @@ def get_current_admin(credentials: HTTPAuthorizationCredentials = Depends(auth_s
         admin.username = "static-admin"
         return admin
 
-    try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        username: str = payload.get("sub")
-        if username is None:
-            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token")
-    except JWTError:
-        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token")
+    admin = principal_cache.get("admin", token)
+    if admin is None:
+        username, exp = _decode_subject(token)
+        admin = await _resolve_admin(username)
+        principal_cache.put("admin", token, username, admin, exp)
+
+    # valid JWT for an existing user who isn't an admin (admins are via ADMIN_USERS or the admins table)
+    if not admin.is_admin:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Admin privileges required")
+    return admin
+
+
+async def _resolve_admin(username):
     if username in ADMIN_USERS:
-        admin = SimpleNamespace()
-        admin.is_admin = 1
-        admin.username = username
-        return admin
+        return SimpleNamespace(is_admin=1, username=username, id=None)
 
-    try:
-        row = db.execute(text("SELECT * FROM admins WHERE username = :u OR email = :u LIMIT 1"), {"u": username}).fetchone()
+    if admins_table["exists"] is None:
+        await run_in_threadpool(check_admins_table, engine)
+    if admins_table["exists"]:
+        row = await _fetch(text("SELECT * FROM admins WHERE username = :u OR email = :u LIMIT 1"), {"u": username})
         if row:
-            admin = SimpleNamespace()
-            admin.is_admin = 1
-            # provide minimal identifying info
-            admin.username = row.get("username") or row.get("email") or username
-            admin.id = row.get("id") if "id" in row.keys() else None
-            return admin
-    except Exception:
-        # If the admins table does not exist or query fails, continue to check users table
-        pass
-
-    # Fall back to checking the users table for an authenticated user (but not granting admin by default)
-    user = db.query(User).filter(User.username == username).first()
+            mapping = row._mapping
+            return SimpleNamespace(
+                is_admin=1,
+                username=mapping.get("username") or mapping.get("email") or username,
+                id=mapping.get("id"),
+            )
+
+    # not an admin: still has to be a real user, otherwise it's a 401 rather than a 403
+    user = await _load_user(username)
     if not user:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="User not found")
+    return SimpleNamespace(is_admin=0, username=username, id=user.id)
+
+
+@router.post("/admin/principals/invalidate")
+async def admin_invalidate_principals(payload: dict = None, _admin=Depends(get_current_admin)):
+    """Forget cached principals for one username (e.g. after a role change), or all of them."""
+    username = (payload or {}).get("username")
+    if username:
+        principal_cache.invalidate_subject(username)
+    else:
+        principal_cache.clear()
+    return {"status": "ok", "cache": principal_cache.stats()}
+
+
+# Progress of the signed-in user: served from the (user_id, lesson_id) index
+@router.get("/progress/me")
+async def my_progress(user=Depends(get_current_user), db=Depends(get_async_db)):
+    rows = await db.execute(
+        select(LessonCompletion.lesson_id, LessonCompletion.progress, LessonCompletion.completed_at)
+        .where(LessonCompletion.user_id == user.id)
+        .order_by(LessonCompletion.lesson_id)
+    )
+    return [{"lesson_id": r.lesson_id, "progress": r.progress, "completed_at": r.completed_at} for r in rows.all()]
 
-    # If we reach here, the JWT is valid and the user exists but isn't an admin (admins are via ADMIN_USERS or admins table)
-    raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Admin privileges required")
 
+# Admin user listing: keyset pagination on users.id and only the listed columns,
+# so every page costs the same however many users there are.
+USER_COLUMNS = (User.id, User.username, User.email)
+EXPORT_CHUNK = 1000
 
 
+def _escape_like(value):
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def _users_query(after=None, q=None, username=None, email=None):
+    query = select(*USER_COLUMNS).order_by(User.id)
+    if after is not None:
+        query = query.where(User.id > after)
+    if username:
+        query = query.where(User.username == username)
+    if email:
+        query = query.where(User.email == email)
+    if q:
+        # prefix match so an index can serve it (on Postgres the text_pattern_ops ones in create_table.py)
+        pattern = _escape_like(q) + "%"
+        query = query.where((User.username.like(pattern, escape="\\")) | (User.email.like(pattern, escape="\\")))
+    return query
+
+
+def _user_row(row):
+    return {"id": row.id, "name": row.username, "email": row.email}
+
 
 @router.get("/admin/users")
-def admin_list_users(db: Session = Depends(get_db), _admin=Depends(get_current_admin)):
-    """Return list of users for admin dashboard."""
-    
-    users = db.query(User).all()
-    
+async def admin_list_users(
+    limit: int = Query(50, ge=1, le=500),
+    after: int = Query(None, description="id of the last user on the previous page"),
+    q: str = Query(None, description="username or email prefix"),
+    username: str = Query(None),
+    email: str = Query(None),
+    db=Depends(get_async_db),
+    _admin=Depends(get_current_admin),
+):
+    """One page of users for the admin dashboard; pass `next_cursor` back as `after`."""
+    rows = (await db.execute(_users_query(after, q, username, email).limit(limit + 1))).all()
+    items = [_user_row(r) for r in rows[:limit]]
+    next_cursor = items[-1]["id"] if len(rows) > limit else None
+    return {"items": items, "next_cursor": next_cursor}
+
+
+@router.get("/admin/users/export")
+async def admin_export_users(
+    format: str = Query("csv", pattern="^(csv|jsonl)$"),
+    q: str = Query(None),
+    _admin=Depends(get_current_admin),
+):
+    """Stream every matching user as CSV or JSON lines, reading EXPORT_CHUNK rows at a time."""
+
+    async def rows():
+        # the request-scoped session is closed before a streamed body is sent, so use our own
+        db = new_async_session()
+        try:
+            if format == "csv":
+                yield "id,name,email\n"
+            after = None
+            while True:
+                chunk = (await db.execute(_users_query(after, q).limit(EXPORT_CHUNK))).all()
+                if not chunk:
+                    break
+                if format == "csv":
+                    buf = io.StringIO()
+                    csv.writer(buf, lineterminator="\n").writerows((r.id, r.username, r.email) for r in chunk)
+                    yield buf.getvalue()
+                else:
+                    yield "".join(json.dumps(_user_row(r)) + "\n" for r in chunk)
+                after = chunk[-1].id
+        finally:
+            await db.close()
+
+    media_type = "text/csv" if format == "csv" else "application/x-ndjson"
+    headers = {"Content-Disposition": f'attachment; filename="users.{format}"'}
+    return StreamingResponse(rows(), media_type=media_type, headers=headers)
+
+
+# Admin analytics: read from the per-day rollups (modules/rollups.py), never the raw logs,
+# so cost depends on the requested window, not on how much history is stored.
+def _window(days):
+    today = datetime.utcnow().date()
+    return today - timedelta(days=days - 1), today
+
+
+# the queries of one handler share a single db.run_sync call (one threadpool hop with DB_ASYNC off)
+def _daily_totals(session, start):
+    active = session.execute(
+        select(DailyActiveUser.day, func.count()).where(DailyActiveUser.day >= start).group_by(DailyActiveUser.day)
+    )
+    events = session.execute(
+        select(DailyEventCount.day, func.sum(DailyEventCount.count)).where(DailyEventCount.day >= start).group_by(DailyEventCount.day)
+    )
+    completions = session.execute(
+        select(DailyLessonCompletion.day, func.sum(DailyLessonCompletion.count))
+        .where(DailyLessonCompletion.day >= start).group_by(DailyLessonCompletion.day)
+    )
+    return dict(active.all()), dict(events.all()), dict(completions.all())
+
+
+@router.get("/admin/stats/daily")
+async def admin_daily_stats(days: int = Query(30, ge=1, le=366), db=Depends(get_async_db), _admin=Depends(get_current_admin)):
+    """Active users, events and lesson completions per day for the last `days` days."""
+    start, end = _window(days)
+    active, events, completions = await db.run_sync(_daily_totals, start)
+
     result = []
-    for u in users:
+    for i in range(days):
+        day = start + timedelta(days=i)
         result.append({
-            "id": u.id,
-            "name": getattr(u, "username", None) or getattr(u, "name", ""),
-            "email": getattr(u, "email", ""),
-            "password": getattr(u, "hashed_password", ""),  # if you want to show hash
-        }) 
+            "day": day.isoformat(),
+            "active_users": int(active.get(day, 0)),
+            "events": int(events.get(day) or 0),
+            "completions": int(completions.get(day) or 0),
+        })
     return result
 
 
+@router.get("/admin/stats/events")
+async def admin_event_stats(days: int = Query(30, ge=1, le=366), db=Depends(get_async_db), _admin=Depends(get_current_admin)):
+    """Event counts per type per day."""
+    start, end = _window(days)
+    rows = await db.execute(
+        select(DailyEventCount.day, DailyEventCount.event_type, DailyEventCount.count)
+        .where(DailyEventCount.day >= start).order_by(DailyEventCount.day, DailyEventCount.event_type)
+    )
+    totals = {}
+    by_day = {}
+    for day, event_type, count in rows.all():
+        by_day.setdefault(day.isoformat(), {})[event_type] = count
+        totals[event_type] = totals.get(event_type, 0) + count
+    return {"from": start.isoformat(), "to": end.isoformat(), "totals": totals, "days": by_day}
+
+
+@router.get("/admin/stats/lessons")
+async def admin_lesson_stats(
+    days: int = Query(30, ge=1, le=366),
+    limit: int = Query(20, ge=1, le=500),
+    db=Depends(get_async_db),
+    _admin=Depends(get_current_admin),
+):
+    """Most completed lessons in the window, with their per-day completion counts."""
+    start, end = _window(days)
+    lessons = await db.run_sync(_top_lessons, start, limit)
+    return {"from": start.isoformat(), "to": end.isoformat(), "lessons": lessons}
+
+
+def _top_lessons(session, start, limit):
+    total = func.sum(DailyLessonCompletion.count).label("completions")
+    top = session.execute(
+        select(DailyLessonCompletion.lesson_id, total)
+        .where(DailyLessonCompletion.day >= start)
+        .group_by(DailyLessonCompletion.lesson_id)
+        .order_by(total.desc())
+        .limit(limit)
+    )
+    lessons = [{"lesson_id": lesson_id, "completions": int(n), "days": {}} for lesson_id, n in top.all()]
+    if lessons:
+        index = {l["lesson_id"]: l for l in lessons}
+        daily = session.execute(
+            select(DailyLessonCompletion.lesson_id, DailyLessonCompletion.day, DailyLessonCompletion.count)
+            .where(DailyLessonCompletion.day >= start, DailyLessonCompletion.lesson_id.in_(list(index)))
+        )
+        for lesson_id, day, count in daily.all():
+            index[lesson_id]["days"][day.isoformat()] = count
+    return lessons
+
+
+
+# Raw activity for a time range, including rows retention has moved to the Parquet archive
+@router.get("/admin/activity")
+async def admin_activity(
+    start: datetime = Query(..., alias="from"),
+    end: datetime = Query(..., alias="to"),
+    user_id: int = None,
+    event_type: str = None,
+    limit: int = Query(1000, ge=1, le=10000),
+    _admin=Depends(get_current_admin),
+):
+    if end <= start:
+        raise HTTPException(status_code=400, detail="'to' must be after 'from'")
+    rows = await run_in_threadpool(query_activity, start, end, user_id, event_type, limit=limit)
+    for row in rows:
+        row["created_at"] = row["created_at"].isoformat()
+    return {"items": rows, "count": len(rows)}
+
+# Presence: clients POST a heartbeat every ~PRESENCE_TTL/3 seconds while the app is open.
+# The store (modules/presence.py) may be SQLite or Redis, so keep its calls off the event loop.
+async def _presence_call(fn, *args):
+    if presence.blocking:
+        return await run_in_threadpool(fn, *args)
+    return fn(*args)
+
+
+@router.post("/presence/heartbeat")
+async def presence_heartbeat(payload: dict = None, user=Depends(get_current_user)):
+    status_text = (payload or {}).get("status")
+    await _presence_call(presence.heartbeat, user.id, status_text)
+    return {"status": "ok", "online": await _presence_call(presence.count), "ttl": presence.ttl}
+
+
+@router.post("/presence/leave")
+async def presence_leave(user=Depends(get_current_user)):
+    await _presence_call(presence.leave, user.id)
+    return {"status": "ok"}
+
+
+@router.get("/admin/online")
+async def admin_online_users(limit: int = Query(100, ge=1, le=1000), _admin=Depends(get_current_admin)):
+    count = await _presence_call(presence.count)
+    users = await _presence_call(presence.online, limit)
+    return {"count": count, "users": users}
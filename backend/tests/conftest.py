@@ -0,0 +1,18 @@
+# tests/conftest.py
+# Run from backend/: python -m pytest tests
+import os
+import sys
+import tempfile
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for path in (BACKEND_DIR, os.path.join(BACKEND_DIR, "auth")):
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+from yolo.stub import STUB_PATH  # noqa: E402
+
+# the app modules read their configuration at import time
+os.environ.setdefault("DB_URL", "sqlite:///" + os.path.join(tempfile.mkdtemp(prefix="vsl-tests-"), "test.db"))
+os.environ.setdefault("YOLO_MODEL_PATH", STUB_PATH)
+os.environ.setdefault("YOLO_REPLICAS", "0")
+os.environ.setdefault("HASH_WORKERS", "0")
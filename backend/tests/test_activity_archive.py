@@ -0,0 +1,155 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy import create_engine, func, select
+
+from modules.database import Base
+from modules import activity_archive, rollups
+from modules.monitor_models import ActivityLog, LessonCompletion
+
+
+@pytest.fixture
+def bind(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'archive.db'}")
+    Base.metadata.create_all(engine)
+    yield engine
+    engine.dispose()
+
+
+def _seed(bind, days=40):
+    now = datetime.now(timezone.utc)
+    rows = [{"user_id": i % 3, "event_type": "login" if i % 2 else "view_lesson", "detail": str(i),
+             "created_at": now - timedelta(days=i % days, hours=1)} for i in range(days * 4)]
+    with bind.begin() as conn:
+        conn.execute(ActivityLog.__table__.insert(), rows)
+        conn.execute(LessonCompletion.__table__.insert(),
+                     [{"user_id": 1, "lesson_id": 1, "progress": 100.0, "completed_at": now - timedelta(days=days)}])
+    return now
+
+
+def _event_total(bind):
+    with bind.connect() as conn:
+        return conn.execute(select(func.sum(rollups.DailyEventCount.count))).scalar()
+
+
+def test_rebuild_keeps_rollups_of_archived_days(bind, tmp_path):
+    _seed(bind)
+    rollups.rebuild(bind)
+    before = _event_total(bind)
+
+    result = activity_archive.run_retention(bind, days=10, archive_dir=str(tmp_path / "arch"))
+    assert result["archived"]
+    rollups.rebuild(bind)
+    assert _event_total(bind) == before
+
+
+def test_query_applies_limit_across_archive_and_hot_rows(bind, tmp_path):
+    now = _seed(bind)
+    archive_dir = str(tmp_path / "arch")
+    everything = activity_archive.query_activity(now - timedelta(days=60), now, bind=bind, archive_dir=archive_dir)
+    activity_archive.run_retention(bind, days=10, archive_dir=archive_dir)
+
+    merged = activity_archive.query_activity(now - timedelta(days=60), now, bind=bind, archive_dir=archive_dir)
+    assert [r["id"] for r in merged] == [r["id"] for r in everything]
+    first = activity_archive.query_activity(now - timedelta(days=60), now, bind=bind,
+                                            archive_dir=archive_dir, limit=7)
+    assert [r["id"] for r in first] == [r["id"] for r in everything[:7]]
+
+
+def test_retention_stops_when_a_day_exports_nothing(bind, tmp_path, monkeypatch):
+    _seed(bind)
+    monkeypatch.setattr(activity_archive, "export_rows", lambda *a, **kw: (None, 0, None))
+    result = activity_archive.run_retention(bind, days=10, archive_dir=str(tmp_path / "arch"))
+    assert result["archived"] == []
+
+
+def test_failed_export_leaves_no_tmp_file(bind, tmp_path, monkeypatch):
+    import pyarrow.parquet as pq
+
+    _seed(bind)
+
+    def fail(self, table, *args, **kwargs):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(pq.ParquetWriter, "write_table", fail)
+    archive_dir = tmp_path / "arch"
+    with pytest.raises(OSError):
+        activity_archive.run_retention(bind, days=10, archive_dir=str(archive_dir))
+    assert list(archive_dir.iterdir()) == []
+
+
+# Postgres partitions: no server here, so the partition helpers run against a recording bind
+class _Result:
+    def __init__(self, names):
+        self.names = names
+
+    def scalars(self):
+        return self
+
+    def all(self):
+        return self.names
+
+
+class _RecordingBind:
+    def __init__(self, names=()):
+        self.names = list(names)
+        self.statements = []
+
+    def connect(self):
+        return self
+
+    begin = connect
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, statement, params=None):
+        self.statements.append(str(statement))
+        return _Result(self.names)
+
+
+def test_expired_partitions_skip_default_and_current_months():
+    from datetime import date
+
+    names = ["activity_logs_y2025m01", "activity_logs_y2025m03", "activity_logs_default", "activity_logs_y2025m02"]
+    expired = activity_archive._expired_partitions(_RecordingBind(names), date(2025, 3, 1))
+    assert expired == [("activity_logs_y2025m01", date(2025, 1, 1)), ("activity_logs_y2025m02", date(2025, 2, 1))]
+
+
+def test_ensure_partitions_covers_since_to_months_ahead():
+    from datetime import date
+
+    bind = _RecordingBind()
+    this_month = datetime.now(timezone.utc).date().replace(day=1)
+    since = (this_month - timedelta(days=1)).replace(day=1)
+    created = activity_archive.ensure_partitions(bind, months_ahead=1, since=since)
+    assert len(created) == 3
+    assert created[1] == activity_archive._partition_name(this_month)
+    assert f"FOR VALUES FROM ('{since.isoformat()}') TO ('{this_month.isoformat()}')" in bind.statements[0]
+
+
+def test_retention_archives_the_default_partition_by_day(bind, tmp_path, monkeypatch):
+    # stand-in for activity_logs_default: same columns, holding rows no monthly partition took
+    from sqlalchemy import text
+
+    now = _seed(bind)
+    with bind.begin() as conn:
+        conn.execute(text("CREATE TABLE activity_logs_default AS SELECT * FROM activity_logs"))
+        conn.execute(text("DELETE FROM activity_logs"))
+    monkeypatch.setattr(activity_archive, "is_partitioned", lambda b: True)
+    monkeypatch.setattr(activity_archive, "ensure_partitions", lambda b: [])
+    monkeypatch.setattr(activity_archive, "_expired_partitions", lambda b, cutoff: [])
+
+    result = activity_archive.run_retention(bind, days=10, archive_dir=str(tmp_path / "arch"))
+    assert result["partitioned"] is True
+    archived = sum(entry["rows"] for entry in result["archived"])
+    assert archived >= 4 * 29
+    with bind.connect() as conn:
+        assert conn.execute(text("SELECT count(*) FROM activity_logs_default")).scalar() == 4 * 40 - archived
+        assert conn.execute(text("SELECT count(*) FROM activity_logs_default WHERE created_at < :c"),
+                            {"c": result["cutoff"]}).scalar() == 0
+    rows = activity_archive.query_activity(now - timedelta(days=50), now, bind=bind, archive_dir=str(tmp_path / "arch"))
+    assert len(rows) == archived
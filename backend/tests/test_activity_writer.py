@@ -0,0 +1,120 @@
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, func, select
+
+from modules.database import Base
+from modules.activity_writer import ActivityWriter
+from modules.monitor_models import ActivityLog
+import modules.rollups  # noqa: F401  rollup tables
+
+
+@pytest.fixture
+def bind(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'activity.db'}")
+    Base.metadata.create_all(engine)
+    yield engine
+    engine.dispose()
+
+
+def _count(bind):
+    with bind.connect() as conn:
+        return conn.execute(select(func.count()).select_from(ActivityLog)).scalar()
+
+
+def test_bad_event_only_drops_itself(bind, monkeypatch):
+    monkeypatch.setattr("modules.activity_writer.RETRY_DELAY_S", 0)
+    writer = ActivityWriter(bind=bind, batch_size=100, flush_ms=50)
+    for i in range(5):
+        assert writer.submit(i, "view_lesson", detail=f"lesson {i}")
+    # a value SQLite cannot bind, queued behind the good ones
+    assert writer.submit(99, "view_lesson", detail={"x": 1})
+    writer.close()
+
+    stats = writer.stats()
+    assert stats["written"] == 5
+    assert stats["failed"] == 1
+    assert _count(bind) == 5
+
+
+def test_log_endpoint_validates_and_coerces(monkeypatch):
+    from auth import routes as auth_routes
+
+    submitted = []
+    monkeypatch.setattr(auth_routes.activity_writer, "submit", lambda **kw: submitted.append(kw) or True)
+    app = FastAPI()
+    app.include_router(auth_routes.router, prefix="/auth")
+    client = TestClient(app)
+
+    ok = client.post("/auth/log", json={"user_id": "7", "event_type": "complete_lesson",
+                                        "lesson_id": 3, "detail": {"x": 1}})
+    assert ok.status_code == 200
+    assert submitted[-1]["user_id"] == 7
+    assert submitted[-1]["detail"] == '{"x": 1}'
+
+    assert client.post("/auth/log", json={"user_id": "abc", "event_type": "login"}).status_code == 400
+    assert client.post("/auth/log", json={"event_type": "login", "lesson_id": [1]}).status_code == 400
+    assert client.post("/auth/log", json={"detail": "no type"}).status_code == 400
+    assert len(submitted) == 1
+
+
+def test_legacy_completions_table_without_unique_index(tmp_path, monkeypatch):
+    from sqlalchemy import text
+    from modules import monitor_models
+    from modules.monitor_models import LessonCompletion
+
+    engine = create_engine(f"sqlite:///{tmp_path / 'legacy.db'}")
+    Base.metadata.create_all(engine)
+    with engine.begin() as conn:
+        conn.execute(text("DROP INDEX uq_lesson_completions_user_lesson"))
+    # startup never got to check the index
+    monkeypatch.setitem(monitor_models.completion_index, "unique", None)
+
+    writer = ActivityWriter(bind=engine, flush_ms=50)
+    writer.submit(1, "complete_lesson", lesson_id=2, progress=0.0)
+    writer.submit(1, "complete_lesson", lesson_id=2, progress=40.0)
+    writer.close()
+
+    assert writer.stats()["failed"] == 0
+    with engine.connect() as conn:
+        assert conn.execute(select(LessonCompletion.progress)).scalars().all() == [40.0]
+    assert monitor_models.completion_index["unique"] is False
+
+
+def test_log_endpoint_keeps_zero_progress(monkeypatch):
+    from auth import routes as auth_routes
+
+    submitted = []
+    monkeypatch.setattr(auth_routes.activity_writer, "submit", lambda **kw: submitted.append(kw) or True)
+    app = FastAPI()
+    app.include_router(auth_routes.router, prefix="/auth")
+    client = TestClient(app)
+
+    client.post("/auth/log", json={"user_id": 1, "event_type": "complete_lesson", "lesson_id": 2, "progress": 0})
+    client.post("/auth/log", json={"user_id": 1, "event_type": "complete_lesson", "lesson_id": 2})
+    assert [kw["progress"] for kw in submitted] == [0.0, 100.0]
+
+
+def test_repeat_completions_roll_up_like_rebuild(bind):
+    from datetime import datetime, timezone
+    from modules import rollups
+
+    def item(user_id, lesson_id, progress):
+        now = datetime.now(timezone.utc)
+        return ({"user_id": user_id, "event_type": "complete_lesson", "detail": None, "created_at": now},
+                {"user_id": user_id, "lesson_id": lesson_id, "progress": progress, "completed_at": now})
+
+    def lesson_counts():
+        with bind.connect() as conn:
+            return sorted(conn.execute(select(rollups.DailyLessonCompletion.lesson_id,
+                                              rollups.DailyLessonCompletion.count)).all())
+
+    writer = ActivityWriter(bind=bind)
+    # repeats inside one batch and across batches
+    writer._flush([item(1, 2, 50.0), item(1, 2, 100.0), item(2, 2, 100.0)])
+    writer._flush([item(1, 2, 100.0), item(1, 3, 100.0)])
+    live = lesson_counts()
+    assert live == [(2, 2), (3, 1)]
+
+    rollups.rebuild(bind)
+    assert lesson_counts() == live
@@ -0,0 +1,38 @@
+import asyncio
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import event
+
+
+def test_login_rehash_runs_no_query_on_the_event_loop(monkeypatch):
+    from auth import routes as auth_routes
+    from modules.database import Base, engine
+
+    Base.metadata.create_all(engine)
+    app = FastAPI()
+    app.include_router(auth_routes.router, prefix="/auth")
+    client = TestClient(app)
+    assert client.post("/auth/register", json={"username": "rehash", "email": "rehash@example.com",
+                                               "password": "secret123"}).status_code == 200
+
+    async def needs_rehash(password, hashed):
+        return True, hashed
+    monkeypatch.setattr(auth_routes.password_hasher, "verify_and_update", needs_rehash)
+
+    on_loop = []
+
+    def record(conn, cursor, statement, *args):
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        on_loop.append(statement)
+
+    event.listen(engine, "before_cursor_execute", record)
+    try:
+        response = client.post("/auth/login", json={"username": "rehash", "password": "secret123"})
+    finally:
+        event.remove(engine, "before_cursor_execute", record)
+    assert response.status_code == 200
+    assert on_loop == []
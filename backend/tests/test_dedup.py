@@ -0,0 +1,14 @@
+import numpy as np
+
+from yolo.dedup import FrameCache, fingerprint
+
+
+def test_resolution_change_is_never_a_duplicate():
+    cache = FrameCache(threshold=3.0, max_age_s=60)
+    small = np.full((240, 320, 3), 128, dtype=np.uint8)
+    large = np.full((480, 640, 3), 128, dtype=np.uint8)
+    cache.store("s", "default", fingerprint(small), [{"box": [0, 0, 10, 10]}])
+
+    assert cache.lookup("s", "default", fingerprint(small)) is not None
+    # same picture, same thumbnail, but the cached boxes are in 320x240 pixels
+    assert cache.lookup("s", "default", fingerprint(large)) is None
@@ -0,0 +1,29 @@
+import pytest
+
+from yolo import routes as yolo_routes
+from yolo.registry import ModelUnavailableError
+
+
+def test_failed_default_load_is_not_retried_within_backoff(monkeypatch):
+    calls = []
+
+    def broken(path):
+        calls.append(path)
+        raise OSError("weights missing")
+
+    monkeypatch.setattr(yolo_routes, "model", None)
+    monkeypatch.setattr(yolo_routes, "load_yolo", broken)
+    monkeypatch.setitem(yolo_routes._load_failure, "at", None)
+    monkeypatch.setattr(yolo_routes, "LOAD_RETRY_S", 60.0)
+
+    for _ in range(3):
+        with pytest.raises(ModelUnavailableError, match="weights missing"):
+            yolo_routes.get_model()
+    assert len(calls) == 1
+    assert yolo_routes.model_status()["status"] == "error"
+
+    # once the window has passed the next request tries again
+    monkeypatch.setattr(yolo_routes, "LOAD_RETRY_S", 0.0)
+    with pytest.raises(ModelUnavailableError):
+        yolo_routes.get_model()
+    assert len(calls) == 2
@@ -0,0 +1,44 @@
+from fastapi import APIRouter, FastAPI
+from fastapi.testclient import TestClient
+
+from modules.lazy_routes import LazyRouter, LazyRouters
+
+
+def _app(routers):
+    app = FastAPI()
+
+    @app.get("/health")
+    def health():
+        return {"status": "ok"}
+
+    app.add_middleware(LazyRouters, target=app, routers=routers)
+    return app
+
+
+def test_broken_router_answers_503_and_is_not_reimported(tmp_path, monkeypatch):
+    (tmp_path / "broken_routes.py").write_text("raise ImportError('no cv2 here')\n")
+    (tmp_path / "good_routes.py").write_text(
+        "from fastapi import APIRouter\n"
+        "router = APIRouter(prefix='/good')\n"
+        "@router.get('/ping')\n"
+        "def ping():\n"
+        "    return {'pong': True}\n"
+    )
+    monkeypatch.syspath_prepend(str(tmp_path))
+    broken = LazyRouter("/broken", "broken_routes")
+    good = LazyRouter("/good", "good_routes")
+    client = TestClient(_app([broken, good]))
+
+    docs = client.get("/openapi.json")
+    assert docs.status_code == 200
+    assert "/good/ping" in docs.json()["paths"]
+    assert "no cv2 here" in broken.error
+
+    imports = []
+    monkeypatch.setattr("importlib.import_module", lambda name: imports.append(name))
+    response = client.get("/broken/anything")
+    assert response.status_code == 503
+    assert "no cv2 here" in response.json()["error"]
+    assert imports == []
+    assert client.get("/good/ping").json() == {"pong": True}
+    assert client.get("/health").status_code == 200
@@ -0,0 +1,33 @@
+from fastapi import APIRouter, FastAPI
+from fastapi.testclient import TestClient
+
+from modules.metrics import MetricsMiddleware, render_metrics
+
+
+def test_route_label_includes_the_include_prefix():
+    router = APIRouter(prefix="/things")
+
+    @router.get("/{thing_id}")
+    def get_thing(thing_id: int):
+        return {"id": thing_id}
+
+    @router.post("/login")
+    def login():
+        return {}
+
+    app = FastAPI()
+    app.include_router(router, prefix="/metrics-test")
+    app.add_middleware(MetricsMiddleware)
+    client = TestClient(app)
+    client.get("/metrics-test/things/41")
+    client.get("/metrics-test/things/42")
+    client.post("/metrics-test/things/login")
+    client.get("/nowhere")
+
+    text = render_metrics()
+    assert isinstance(text, str)
+    assert 'route="/metrics-test/things/{thing_id}"' in text
+    assert 'route="/metrics-test/things/login"' in text
+    assert 'route="/things/{thing_id}"' not in text
+    assert "things/41" not in text
+    assert 'route="unmatched"' in text
@@ -0,0 +1,26 @@
+from types import SimpleNamespace
+
+import numpy as np
+
+from yolo.pacing import STABLE_FRAMES, Stability, suggest_interval_ms
+
+
+def _det(*classes):
+    return SimpleNamespace(cls=np.array(classes, dtype=np.float32))
+
+
+def test_empty_frames_do_not_back_off():
+    stability = Stability()
+    for _ in range(STABLE_FRAMES * 2):
+        streak = stability.observe(_det())
+    assert streak == 0
+    assert stability.observe(_det(), cached=True) == 0
+    assert suggest_interval_ms(0, 8, 10.0, streak) == suggest_interval_ms(0, 8, 10.0, 0)
+
+
+def test_unchanged_detections_build_a_streak():
+    stability = Stability()
+    for _ in range(3):
+        streak = stability.observe(_det(4.0))
+    assert streak == 2
+    assert stability.observe(_det(5.0)) == 0
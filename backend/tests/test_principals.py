@@ -0,0 +1,15 @@
+from sqlalchemy import create_engine, text
+
+from modules import principals
+
+
+def test_failed_admins_table_check_is_retried(tmp_path, monkeypatch):
+    monkeypatch.setitem(principals.admins_table, "exists", None)
+    down = create_engine("sqlite:////nonexistent-dir/db.sqlite")
+    assert principals.check_admins_table(down) is None
+    assert principals.admins_table["exists"] is None
+
+    up = create_engine(f"sqlite:///{tmp_path / 'admins.db'}")
+    with up.begin() as conn:
+        conn.execute(text("CREATE TABLE admins (id INTEGER PRIMARY KEY, username TEXT)"))
+    assert principals.check_admins_table(up) is True
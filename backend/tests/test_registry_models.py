@@ -0,0 +1,91 @@
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from modules.database import Base, SessionLocal, engine
+from modules.yolo_db import ModelInfo
+from yolo import routes as yolo_routes
+from yolo.registry import model_cache
+
+
+def test_unloadable_registry_model_answers_503(tmp_path, monkeypatch):
+    Base.metadata.create_all(engine, tables=[ModelInfo.__table__])
+    weights = tmp_path / "broken.pt"
+    weights.write_bytes(b"not a model")
+    db = SessionLocal()
+    db.add(ModelInfo(name="broken", version="1.0", file_path=str(weights)))
+    db.commit()
+    db.close()
+
+    def corrupt(path):
+        raise ValueError(f"cannot parse {path}")
+
+    monkeypatch.setattr(model_cache, "loader", corrupt)
+    app = FastAPI()
+    app.include_router(yolo_routes.router)
+    client = TestClient(app)
+
+    response = client.post("/yolo/predict?model=broken", content=b"\xff\xd8", headers={"Content-Type": "image/jpeg"})
+    assert response.status_code == 503
+    assert "broken" in response.json()["error"]
+    assert client.post("/yolo/predict?model=missing", content=b"").status_code == 404
+
+    with client.websocket_connect("/yolo/stream?model=broken") as ws:
+        assert "could not be loaded" in ws.receive_json()["error"]
+
+
+def test_failed_upload_commit_removes_the_stored_file(tmp_path, monkeypatch):
+    from sqlalchemy.orm import Session
+
+    from auth import models as model_routes
+
+    Base.metadata.create_all(engine, tables=[ModelInfo.__table__])
+    monkeypatch.setattr(model_routes, "UPLOAD_DIR", str(tmp_path))
+
+    def fail(self):
+        raise RuntimeError("database went away")
+
+    monkeypatch.setattr(Session, "commit", fail)
+    app = FastAPI()
+    app.include_router(model_routes.router)
+    client = TestClient(app, raise_server_exceptions=False)
+
+    response = client.post("/models/upload", data={"name": "orphan"}, files={"file": ("orphan.pt", b"weights")})
+    assert response.status_code == 500
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_invalidate_during_a_load_does_not_cache_stale_weights():
+    import threading
+
+    from yolo.registry import ModelCache
+
+    started, release = threading.Event(), threading.Event()
+
+    def slow_loader(path):
+        if path == "old.pt":
+            started.set()
+            release.wait(5)
+        return object()
+
+    cache = ModelCache(loader=slow_loader, warmup=None)
+    loader = threading.Thread(target=cache.get, args=(("m", "1"), "old.pt"), kwargs={"current": True})
+    loader.start()
+    assert started.wait(5)
+    cache.invalidate("m")
+    release.set()
+    loader.join(5)
+
+    assert cache.find("m") is None
+    assert cache.stats()["models"] == []
+    cache.get(("m", "2"), "new.pt", current=True)
+    assert cache.find("m") == (("m", "2"), "new.pt")
+
+
+def test_find_returns_the_version_the_registry_resolved():
+    from yolo.registry import ModelCache
+
+    cache = ModelCache(loader=lambda path: object(), warmup=None)
+    cache.get(("m", "2"), "new.pt", current=True)
+    # an explicit load of another version does not change what `find` serves
+    cache.get(("m", "1"), "old.pt")
+    assert cache.find("m") == (("m", "2"), "new.pt")
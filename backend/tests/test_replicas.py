@@ -0,0 +1,34 @@
+import asyncio
+import time
+
+import numpy as np
+import pytest
+
+from yolo.registry import ModelUnavailableError
+from yolo.replicas import ReplicaPool
+from yolo.stub import STUB_PATH
+
+
+def test_job_on_dead_replica_fails_instead_of_hanging(monkeypatch):
+    # slow stub batches so the worker can be killed mid-job; the spawned child inherits the env
+    monkeypatch.setenv("YOLO_STUB_BATCH_MS", "5000")
+    pool = ReplicaPool(STUB_PATH, 1, max_batch=1, frame_bytes=64 * 64 * 3)
+    pool.start()
+    try:
+        assert pool.wait_ready(timeout=60)
+
+        async def run():
+            job = asyncio.ensure_future(pool.predict_batch([np.zeros((64, 64, 3), dtype=np.uint8)]))
+            await asyncio.sleep(0.5)
+            pool._workers[0].process.kill()
+            started = time.monotonic()
+            with pytest.raises(ModelUnavailableError):
+                await job
+            return time.monotonic() - started
+
+        assert asyncio.run(run()) < 10
+        worker = pool.stats()["workers"][0]
+        assert worker["in_flight"] == 0 and not worker["alive"]
+        assert pool.readiness()["status"] == "error"
+    finally:
+        pool.close()
@@ -0,0 +1,66 @@
+import time
+
+from fastapi.testclient import TestClient
+
+
+def test_ready_reports_a_failed_inference_import(monkeypatch):
+    import main
+
+    app = main.create_app()
+    yolo = app.state.lazy_routers[0]
+    monkeypatch.setattr(yolo, "module_name", "yolo.does_not_exist")
+    with TestClient(app) as client:
+        deadline = time.monotonic() + 10
+        body = client.get("/ready").json()
+        while body["model"]["status"] in ("pending", "loading") and time.monotonic() < deadline:
+            time.sleep(0.05)
+            body = client.get("/ready").json()
+        assert body["ready"] is False
+        assert body["model"]["status"] == "error"
+        assert "yolo.does_not_exist" in body["model"]["error"]
+        assert client.get("/yolo/stats").status_code == 503
+
+
+def test_create_schema_leaves_unique_index_on_duplicates_to_migrate(tmp_path):
+    from sqlalchemy import create_engine, inspect, text
+
+    import manage
+    from modules.database import Base
+
+    engine = create_engine(f"sqlite:///{tmp_path / 'schema.db'}")
+    Base.metadata.create_all(engine)
+    with engine.begin() as conn:
+        conn.execute(text("DROP INDEX uq_lesson_completions_user_lesson"))
+        conn.execute(text("INSERT INTO lesson_completions (user_id, lesson_id, progress) VALUES (1, 2, 10), (1, 2, 20)"))
+
+    assert manage.create_schema(engine) == []
+    names = {ix["name"] for ix in inspect(engine).get_indexes("lesson_completions")}
+    assert "uq_lesson_completions_user_lesson" not in names
+    engine.dispose()
+
+
+def test_ready_reports_a_missing_schema(tmp_path, monkeypatch):
+    from sqlalchemy import create_engine
+
+    import main
+
+    monkeypatch.setattr(main, "engine", create_engine(f"sqlite:///{tmp_path / 'empty.db'}"))
+    monkeypatch.setattr(main, "db_state", {"status": "pending", "error": None})
+    main.init_database()
+    assert main.db_state["status"] == "schema_missing"
+
+    client = TestClient(main.create_app())
+    response = client.get("/ready")
+    assert response.status_code == 503
+    assert response.json()["database"]["status"] == "schema_missing"
+
+
+def test_app_is_built_on_first_lookup(monkeypatch):
+    import main
+
+    built = []
+    monkeypatch.delitem(vars(main), "app", raising=False)
+    monkeypatch.setattr(main, "create_app", lambda: built.append(object()) or built[-1])
+    assert not built
+    assert main.app is main.app
+    assert len(built) == 1
@@ -0,0 +1,144 @@
+# backend/yolo/batcher.py
+# Dynamic micro-batching: concurrent /yolo/predict calls are collected into one
+# batched forward pass, which is much cheaper per image than N single calls on CPU.
+import asyncio
+import os
+import time
+
+from modules.metrics import BATCH_SIZE, REJECTED, STAGE_LATENCY
+from yolo.executor import OverloadedError
+
+# Tunables (env): largest batch, how long the first request may wait for company,
+# and how many frames may be waiting before new ones are rejected.
+MAX_BATCH = int(os.getenv("YOLO_MAX_BATCH", "8"))
+MAX_WAIT_MS = float(os.getenv("YOLO_MAX_WAIT_MS", "10"))
+QUEUE_SIZE = int(os.getenv("YOLO_QUEUE_SIZE", "64"))
+
+
+class QueueFullError(OverloadedError):
+    """Raised by `BatchScheduler.submit` when the pending queue is at capacity."""
+
+
+class BatchScheduler:
+    """Collects submitted images into batches and runs `predict_batch` on them.
+
+    `predict_batch(images)` takes a list of images and returns one result per
+    image, in order. A blocking callable runs on `executor` (a `BoundedExecutor`),
+    or the loop's default executor when none is given; a coroutine function is
+    awaited directly. Up to `concurrency` batches may be in flight at once.
+    """
+
+    def __init__(self, predict_batch, max_batch=MAX_BATCH, max_wait_ms=MAX_WAIT_MS, queue_size=QUEUE_SIZE,
+                 executor=None, concurrency=1):
+        self.predict_batch = predict_batch
+        self.executor = executor
+        self.concurrency = max(1, int(concurrency))
+        self.max_batch = max(1, int(max_batch))
+        self.max_wait = max(0.0, float(max_wait_ms)) / 1000.0
+        self.queue_size = max(1, int(queue_size))
+        self._queue = None
+        self._task = None
+        # counters reported by stats()
+        self.batches = 0
+        self.images = 0
+        self.rejected = 0
+        self.last_batch_size = 0
+        self.last_batch_ms = 0.0
+
+    def _ensure_started(self):
+        if self._task is None or self._task.done():
+            self._queue = asyncio.Queue(maxsize=self.queue_size)
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    def queue_depth(self):
+        return self._queue.qsize() if self._queue is not None else 0
+
+    async def submit(self, image):
+        """Queue one image and wait for its result."""
+        self._ensure_started()
+        future = asyncio.get_running_loop().create_future()
+        try:
+            self._queue.put_nowait((image, future, time.perf_counter()))
+        except asyncio.QueueFull:
+            self.rejected += 1
+            REJECTED.inc(reason="scheduler_queue")
+            raise QueueFullError("Inference queue is full")
+        return await future
+
+    async def _collect(self):
+        batch = [await self._queue.get()]
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.max_wait
+        while len(batch) < self.max_batch:
+            # take whatever is already waiting before sleeping on the queue
+            if not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+                continue
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        now = time.perf_counter()
+        for _, _, enqueued in batch:
+            STAGE_LATENCY.observe(now - enqueued, stage="queue_wait")
+        # callers that went away (client disconnect) don't need a forward pass
+        return [(img, fut) for img, fut, _ in batch if not fut.done()]
+
+    async def _infer(self, images):
+        if asyncio.iscoroutinefunction(self.predict_batch):
+            return await self.predict_batch(images)
+        if self.executor is not None:
+            return await self.executor.run(self.predict_batch, images)
+        return await asyncio.get_running_loop().run_in_executor(None, self.predict_batch, images)
+
+    async def _run(self):
+        slots = asyncio.Semaphore(self.concurrency)
+        while True:
+            await slots.acquire()
+            batch = await self._collect()
+            if not batch:
+                slots.release()
+                continue
+            if self.concurrency == 1:
+                await self._dispatch(batch, slots)
+            else:
+                asyncio.get_running_loop().create_task(self._dispatch(batch, slots))
+
+    async def _dispatch(self, batch, slots):
+        started = time.perf_counter()
+        try:
+            outputs = await self._infer([img for img, _ in batch])
+        except Exception as e:
+            for _, fut in batch:
+                if not fut.done():
+                    fut.set_exception(e)
+            return
+        finally:
+            self.last_batch_ms = (time.perf_counter() - started) * 1000.0
+            slots.release()
+
+        BATCH_SIZE.observe(len(batch))
+        self.batches += 1
+        self.images += len(batch)
+        self.last_batch_size = len(batch)
+        for (_, fut), out in zip(batch, outputs):
+            if not fut.done():
+                fut.set_result(out)
+
+    def stats(self):
+        return {
+            "max_batch": self.max_batch,
+            "max_wait_ms": self.max_wait * 1000.0,
+            "concurrency": self.concurrency,
+            "queue_size": self.queue_size,
+            "queue_depth": self.queue_depth(),
+            "batches": self.batches,
+            "images": self.images,
+            "avg_batch_size": round(self.images / self.batches, 2) if self.batches else 0.0,
+            "last_batch_size": self.last_batch_size,
+            "last_batch_ms": round(self.last_batch_ms, 2),
+            "rejected": self.rejected,
+        }
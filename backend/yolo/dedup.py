@@ -0,0 +1,102 @@
+# backend/yolo/dedup.py
+# Near-duplicate frame skipping: while a learner holds a sign still, consecutive
+# webcam frames barely change, so the last detections of the session are reused.
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import cv2
+import numpy as np
+
+# Mean absolute difference (0-255 grayscale) between thumbnails below which a frame
+# counts as a duplicate of the last processed one; 0 disables skipping.
+DEDUP_THRESHOLD = float(os.getenv("YOLO_DEDUP_THRESHOLD", "3.0"))
+# Thumbnail edge length used for the fingerprint
+DEDUP_SIZE = int(os.getenv("YOLO_DEDUP_SIZE", "32"))
+# Run a real inference at least this often even on a perfectly still frame
+DEDUP_MAX_AGE_S = float(os.getenv("YOLO_DEDUP_MAX_AGE", "2.0"))
+SESSION_TTL_S = float(os.getenv("YOLO_SESSION_TTL", "300"))
+MAX_SESSIONS = int(os.getenv("YOLO_MAX_SESSIONS", "10000"))
+
+
+def fingerprint(img, size=DEDUP_SIZE):
+    """(frame height/width, grayscale thumbnail): the thumbnail alone hides a resolution change."""
+    thumb = cv2.resize(img, (size, size), interpolation=cv2.INTER_AREA)
+    if thumb.ndim == 3:
+        thumb = cv2.cvtColor(thumb, cv2.COLOR_BGR2GRAY)
+    return img.shape[:2], thumb.astype(np.int16)
+
+
+def frame_distance(a, b):
+    # cached boxes are in the old frame's pixels; never reuse them for another size
+    if a[0] != b[0] or a[1].shape != b[1].shape:
+        return float("inf")
+    return float(np.abs(a[1] - b[1]).mean())
+
+
+class FrameCache:
+    """Per-session fingerprint and detections of the last processed frame."""
+
+    def __init__(self, threshold=DEDUP_THRESHOLD, max_age_s=DEDUP_MAX_AGE_S,
+                 ttl_s=SESSION_TTL_S, max_sessions=MAX_SESSIONS):
+        self.threshold = threshold
+        self.max_age_s = max_age_s
+        self.ttl_s = ttl_s
+        self.max_sessions = max(1, int(max_sessions))
+        self._lock = threading.Lock()
+        self._sessions = OrderedDict()  # session -> (model_key, fingerprint, detections, processed_at)
+        self.frames = 0
+        self.skipped = 0
+
+    @property
+    def enabled(self):
+        return self.threshold > 0
+
+    def lookup(self, session, model_key, fp):
+        """Cached detections if `fp` is a near-duplicate of the session's last processed frame."""
+        now = time.monotonic()
+        with self._lock:
+            self.frames += 1
+            entry = self._sessions.get(session)
+            if entry is None:
+                return None
+            self._sessions.move_to_end(session)
+            key, last_fp, detections, processed_at = entry
+            if key != model_key or now - processed_at > self.max_age_s:
+                return None
+            if frame_distance(fp, last_fp) >= self.threshold:
+                return None
+            self.skipped += 1
+            return detections
+
+    def store(self, session, model_key, fp, detections):
+        now = time.monotonic()
+        with self._lock:
+            self._sessions[session] = (model_key, fp, detections, now)
+            self._sessions.move_to_end(session)
+            # sessions are in LRU order: drop idle and overflow ones from the front
+            while self._sessions:
+                oldest = next(iter(self._sessions))
+                if len(self._sessions) > self.max_sessions or now - self._sessions[oldest][3] > self.ttl_s:
+                    del self._sessions[oldest]
+                else:
+                    break
+
+    def forget(self, session):
+        with self._lock:
+            self._sessions.pop(session, None)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "threshold": self.threshold,
+                "sessions": len(self._sessions),
+                "frames": self.frames,
+                "skipped": self.skipped,
+                "skip_rate": round(self.skipped / self.frames, 4) if self.frames else 0.0,
+            }
+
+
+frame_cache = FrameCache()
@@ -0,0 +1,136 @@
+# backend/yolo/engines.py
+# Selectable inference engines for registry/default weights:
+#   torch      - ultralytics PyTorch eager (default)
+#   onnx       - weights exported once to ONNX and run with ONNX Runtime
+#   onnx-int8  - the ONNX export quantized to INT8 (dynamic, or static with calibration frames)
+# ONNX models are loaded through ultralytics as well, so Results (and therefore the
+# API's output format) are identical across engines.
+import glob
+import hashlib
+import os
+import threading
+
+import cv2
+import numpy as np
+
+ENGINES = ("torch", "onnx", "onnx-int8")
+ENGINE = os.getenv("YOLO_ENGINE", "torch")
+ONNX_CACHE_DIR = os.getenv("YOLO_ONNX_CACHE", os.path.join(os.path.dirname(os.path.abspath(__file__)), "model", "onnx"))
+ONNX_IMGSZ = int(os.getenv("YOLO_ONNX_IMGSZ", "640"))
+# "dynamic" needs nothing else; "static" calibrates activations on YOLO_CALIBRATION_DIR frames
+QUANT_MODE = os.getenv("YOLO_QUANT_MODE", "dynamic")
+CALIBRATION_DIR = os.getenv("YOLO_CALIBRATION_DIR", "")
+CALIBRATION_FRAMES = int(os.getenv("YOLO_CALIBRATION_FRAMES", "64"))
+
+_export_lock = threading.Lock()
+
+
+def _weights_digest(weights_path, imgsz):
+    st = os.stat(weights_path)
+    key = f"{os.path.abspath(weights_path)}:{st.st_size}:{st.st_mtime_ns}:{imgsz}"
+    return hashlib.sha1(key.encode()).hexdigest()[:12]
+
+
+def artifact_path(weights_path, engine, imgsz=ONNX_IMGSZ, quant_mode=QUANT_MODE):
+    """Cache location of the exported artifact; changes whenever the weights file does."""
+    stem = os.path.splitext(os.path.basename(weights_path))[0]
+    suffix = f"-int8-{quant_mode}" if engine == "onnx-int8" else ""
+    return os.path.join(ONNX_CACHE_DIR, f"{stem}-{_weights_digest(weights_path, imgsz)}-{imgsz}{suffix}.onnx")
+
+
+def export_onnx(weights_path, imgsz=ONNX_IMGSZ):
+    """Export `weights_path` to ONNX once; later calls return the cached file."""
+    target = artifact_path(weights_path, "onnx", imgsz)
+    if os.path.exists(target):
+        return target
+    with _export_lock:
+        if os.path.exists(target):
+            return target
+        from ultralytics import YOLO
+        os.makedirs(ONNX_CACHE_DIR, exist_ok=True)
+        # dynamic axes: batched predict and the smaller ROI imgsz both work on one export
+        exported = YOLO(weights_path).export(format="onnx", imgsz=imgsz, dynamic=True)
+        os.replace(exported, target)
+    return target
+
+
+def _letterbox(img, size):
+    h, w = img.shape[:2]
+    scale = min(size / h, size / w)
+    nh, nw = int(round(h * scale)), int(round(w * scale))
+    canvas = np.full((size, size, 3), 114, dtype=np.uint8)
+    top, left = (size - nh) // 2, (size - nw) // 2
+    canvas[top:top + nh, left:left + nw] = cv2.resize(img, (nw, nh), interpolation=cv2.INTER_LINEAR)
+    return canvas
+
+
+def _calibration_reader(onnx_path, calibration_dir, imgsz, limit=CALIBRATION_FRAMES):
+    import onnxruntime as ort
+    from onnxruntime.quantization import CalibrationDataReader
+
+    input_name = ort.InferenceSession(onnx_path, providers=["CPUExecutionProvider"]).get_inputs()[0].name
+    paths = sorted(glob.glob(os.path.join(calibration_dir, "*.jpg")) + glob.glob(os.path.join(calibration_dir, "*.png")))
+    if not paths:
+        raise ValueError(f"No calibration frames found in {calibration_dir}")
+
+    class FrameReader(CalibrationDataReader):
+        def __init__(self):
+            self._paths = iter(paths[:limit])
+
+        def get_next(self):
+            for path in self._paths:
+                img = cv2.imread(path)
+                if img is None:
+                    continue
+                # same preprocessing as ultralytics: letterbox, BGR->RGB, CHW, 0..1
+                x = _letterbox(img, imgsz)[:, :, ::-1].transpose(2, 0, 1)
+                x = np.ascontiguousarray(x, dtype=np.float32)[None] / 255.0
+                return {input_name: x}
+            return None
+
+    return FrameReader()
+
+
+def quantize_onnx(onnx_path, target, mode=QUANT_MODE, calibration_dir=CALIBRATION_DIR, imgsz=ONNX_IMGSZ):
+    from onnxruntime.quantization import QuantFormat, QuantType, quantize_dynamic, quantize_static
+
+    tmp = target + ".tmp"
+    if mode == "static":
+        if not calibration_dir:
+            raise ValueError("Static INT8 quantization needs YOLO_CALIBRATION_DIR")
+        quantize_static(
+            onnx_path, tmp, _calibration_reader(onnx_path, calibration_dir, imgsz),
+            quant_format=QuantFormat.QDQ, activation_type=QuantType.QUInt8, weight_type=QuantType.QInt8,
+        )
+    elif mode == "dynamic":
+        quantize_dynamic(onnx_path, tmp, weight_type=QuantType.QUInt8)
+    else:
+        raise ValueError(f"Unknown quantization mode '{mode}'")
+    os.replace(tmp, target)
+    return target
+
+
+def prepare_artifact(weights_path, engine=ENGINE, imgsz=ONNX_IMGSZ):
+    """Path the engine should load: the weights themselves, or a cached ONNX export."""
+    if engine not in ENGINES:
+        raise ValueError(f"Unknown inference engine '{engine}' (expected one of {', '.join(ENGINES)})")
+    if engine == "torch" or weights_path.endswith(".onnx"):
+        return weights_path
+    onnx_path = export_onnx(weights_path, imgsz)
+    if engine == "onnx":
+        return onnx_path
+    target = artifact_path(weights_path, engine, imgsz)
+    if not os.path.exists(target):
+        with _export_lock:
+            if not os.path.exists(target):
+                quantize_onnx(onnx_path, target, imgsz=imgsz)
+    return target
+
+
+def load_engine(weights_path, engine=ENGINE):
+    from ultralytics import YOLO
+
+    path = prepare_artifact(weights_path, engine)
+    if path.endswith(".onnx"):
+        return YOLO(path, task="detect")
+    return YOLO(path)
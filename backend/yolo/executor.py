@@ -0,0 +1,80 @@
+# backend/yolo/executor.py
+# Dedicated, bounded worker pool for frame decode and inference so that CPU-heavy
+# work never runs on the event loop and never queues without limit.
+import asyncio
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from modules.metrics import POOL_PENDING, REJECTED
+
+INFER_WORKERS = int(os.getenv("YOLO_INFER_WORKERS", "2"))
+INFER_QUEUE = int(os.getenv("YOLO_INFER_QUEUE", "32"))
+RETRY_AFTER_S = int(os.getenv("YOLO_RETRY_AFTER", "1"))
+
+
+class OverloadedError(RuntimeError):
+    """Raised when work is refused because the pool or queue is at capacity."""
+
+    def __init__(self, message="Inference server is busy", retry_after=RETRY_AFTER_S):
+        super().__init__(message)
+        self.retry_after = max(1, int(retry_after))
+
+
+class BoundedExecutor:
+    """A thread pool that admits at most `max_workers + queue_size` pending jobs.
+
+    `try_run` refuses work past that limit with `OverloadedError`; `run` always
+    submits and is meant for jobs that were already admitted elsewhere
+    (e.g. batches formed by the scheduler from its own bounded queue).
+    """
+
+    def __init__(self, max_workers=INFER_WORKERS, queue_size=INFER_QUEUE, name="yolo-infer"):
+        self.max_workers = max(1, int(max_workers))
+        self.queue_size = max(0, int(queue_size))
+        self.capacity = self.max_workers + self.queue_size
+        self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix=name)
+        self._lock = threading.Lock()
+        self._admitted = 0
+        self.rejected = 0
+
+    def _release(self, _future):
+        with self._lock:
+            self._admitted -= 1
+
+    async def try_run(self, fn, *args):
+        with self._lock:
+            if self._admitted >= self.capacity:
+                self.rejected += 1
+                REJECTED.inc(reason="worker_pool")
+                raise OverloadedError()
+            self._admitted += 1
+        try:
+            future = self._pool.submit(fn, *args)
+        except BaseException:
+            self._release(None)
+            raise
+        future.add_done_callback(self._release)
+        return await asyncio.wrap_future(future)
+
+    async def run(self, fn, *args):
+        return await asyncio.wrap_future(self._pool.submit(fn, *args))
+
+    def pending(self):
+        with self._lock:
+            return self._admitted
+
+    def stats(self):
+        return {
+            "workers": self.max_workers,
+            "queue_size": self.queue_size,
+            "pending": self.pending(),
+            "rejected": self.rejected,
+        }
+
+    def shutdown(self):
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+
+inference_pool = BoundedExecutor()
+POOL_PENDING.set_function(inference_pool.pending)
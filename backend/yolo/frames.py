@@ -0,0 +1,80 @@
+# backend/yolo/frames.py
+# Frame ingest for the YOLO routes: turn whatever the client sent into a BGR image.
+import base64
+import cv2
+import numpy as np
+from fastapi import Request
+
+from modules.metrics import STAGE_LATENCY
+
+# Content types that carry an encoded image directly in the request body
+RAW_IMAGE_TYPES = ("image/", "application/octet-stream")
+
+
+class FrameError(ValueError):
+    """Raised when a request does not contain a decodable image."""
+
+
+def decode_image(buf) -> np.ndarray:
+    """Decode JPEG/PNG bytes (bytes, bytearray or memoryview) without copying them first."""
+    if not buf:
+        raise FrameError("No image data received")
+    with STAGE_LATENCY.time(stage="imdecode"):
+        img = cv2.imdecode(np.frombuffer(buf, np.uint8), cv2.IMREAD_COLOR)
+    if img is None:
+        raise FrameError("Could not decode image")
+    return img
+
+
+def decode_data_url(data_url: str) -> np.ndarray:
+    # Older clients send `data:image/jpeg;base64,...`; plain base64 is accepted too
+    payload = data_url.split(",", 1)[1] if "," in data_url else data_url
+    try:
+        with STAGE_LATENCY.time(stage="base64_decode"):
+            img_bytes = base64.b64decode(payload)
+    except (ValueError, TypeError):
+        raise FrameError("Invalid base64 image data")
+    return decode_image(img_bytes)
+
+
+async def read_frame_bytes(request: Request):
+    """Return the encoded image bytes (or a legacy data URL string) from the request body.
+
+    Supported bodies:
+      - raw `image/jpeg`, `image/png`, `application/octet-stream`
+      - `multipart/form-data` with a `file` (or `image`) part
+      - JSON `{"image": "data:image/jpeg;base64,..."}` (legacy)
+    """
+    content_type = request.headers.get("content-type", "").lower()
+
+    if content_type.startswith(RAW_IMAGE_TYPES):
+        return await request.body()
+
+    if content_type.startswith("multipart/form-data"):
+        form = await request.form()
+        upload = form.get("file") or form.get("image")
+        if upload is None:
+            raise FrameError("No image data received")
+        if isinstance(upload, str):
+            return upload
+        return await upload.read()
+
+    try:
+        data = await request.json()
+    except ValueError:
+        raise FrameError("Unsupported request body")
+    img_base64 = data.get("image") if isinstance(data, dict) else None
+    if not img_base64:
+        raise FrameError("No image data received")
+    return img_base64
+
+
+def decode_frame(raw) -> np.ndarray:
+    """Decode what `read_frame_bytes` returned."""
+    if isinstance(raw, str):
+        return decode_data_url(raw)
+    return decode_image(raw)
+
+
+async def read_frame(request: Request) -> np.ndarray:
+    return decode_frame(await read_frame_bytes(request))
@@ -0,0 +1,89 @@
+# backend/yolo/pacing.py
+# Server-driven frame pacing: every response carries a suggested interval before the
+# client's next frame, based on server load, recent latency and how stable the sign is.
+import os
+import threading
+import time
+from collections import OrderedDict
+
+MIN_INTERVAL_MS = int(os.getenv("YOLO_PACING_MIN_MS", "33"))
+MAX_INTERVAL_MS = int(os.getenv("YOLO_PACING_MAX_MS", "1000"))
+# Consecutive frames with the same classes before the sign counts as fully steady
+STABLE_FRAMES = int(os.getenv("YOLO_PACING_STABLE_FRAMES", "10"))
+# Slow-down factors at full queue and for a fully steady sign
+LOAD_FACTOR = float(os.getenv("YOLO_PACING_LOAD_FACTOR", "6.0"))
+STABLE_FACTOR = float(os.getenv("YOLO_PACING_STABLE_FACTOR", "3.0"))
+MAX_SESSIONS = int(os.getenv("YOLO_MAX_SESSIONS", "10000"))
+
+
+class LatencyTracker:
+    """Exponentially weighted moving average of inference latency (ms)."""
+
+    def __init__(self, alpha=0.2):
+        self.alpha = alpha
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, ms):
+        with self._lock:
+            self.value = ms if self.value == 0.0 else self.alpha * ms + (1.0 - self.alpha) * self.value
+
+
+class Stability:
+    """Streak of consecutive frames whose (non-empty) detected classes did not change.
+
+    An empty frame resets the streak: nobody signing yet is no reason to slow down.
+    """
+
+    __slots__ = ("classes", "streak", "seen_at")
+
+    def __init__(self):
+        self.classes = None
+        self.streak = 0
+        self.seen_at = time.monotonic()
+
+    def observe(self, det, cached=False):
+        self.seen_at = time.monotonic()
+        classes = frozenset(det.cls.tolist())
+        if not classes:
+            self.streak = 0
+        elif cached or classes == self.classes:
+            self.streak += 1
+        else:
+            self.streak = 0
+        self.classes = classes
+        return self.streak
+
+
+class SessionStability:
+    """Bounded LRU of per-session stability, for HTTP clients that send a session id."""
+
+    def __init__(self, max_sessions=MAX_SESSIONS):
+        self.max_sessions = max(1, int(max_sessions))
+        self._lock = threading.Lock()
+        self._sessions = OrderedDict()
+
+    def observe(self, session, det, cached=False):
+        with self._lock:
+            state = self._sessions.get(session)
+            if state is None:
+                state = self._sessions[session] = Stability()
+            self._sessions.move_to_end(session)
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+            return state.observe(det, cached)
+
+
+def suggest_interval_ms(queue_depth, queue_capacity, latency_ms, stable_streak=0):
+    """Milliseconds the client should wait before sending its next frame."""
+    # never ask for frames faster than we currently answer them
+    interval = max(float(MIN_INTERVAL_MS), latency_ms)
+    load = min(1.0, queue_depth / queue_capacity) if queue_capacity else 0.0
+    interval *= 1.0 + (LOAD_FACTOR - 1.0) * load * load
+    steady = min(1.0, stable_streak / STABLE_FRAMES) if STABLE_FRAMES > 0 else 0.0
+    interval *= 1.0 + (STABLE_FACTOR - 1.0) * steady
+    return int(min(MAX_INTERVAL_MS, max(MIN_INTERVAL_MS, interval)))
+
+
+inference_latency = LatencyTracker()
+session_stability = SessionStability()
@@ -0,0 +1,131 @@
+# backend/yolo/parity.py
+# Accuracy/latency parity between inference engines on a set of recorded frames.
+#
+#   cd backend
+#   python -m yolo.parity --weights yolo/model/v9_n_yolo11.pt --frames ../recordings --engines torch,onnx,onnx-int8
+#
+# The first engine is the reference; every other engine's detections are matched
+# to it per frame (same class, greedy by IoU) and the report lists recall/precision
+# against the reference, mean IoU and confidence drift, plus per-frame latency.
+import argparse
+import glob
+import json
+import os
+import time
+
+import cv2
+import numpy as np
+
+from yolo.engines import ENGINES, load_engine
+from yolo.postprocess import extract_detections
+
+
+def box_iou(a, b):
+    """Pairwise IoU of two (N, 4) / (M, 4) xyxy arrays."""
+    a = a.astype(np.float32)
+    b = b.astype(np.float32)
+    tl = np.maximum(a[:, None, :2], b[None, :, :2])
+    br = np.minimum(a[:, None, 2:], b[None, :, 2:])
+    inter = np.clip(br - tl, 0, None).prod(axis=2)
+    area_a = (a[:, 2:] - a[:, :2]).prod(axis=1)
+    area_b = (b[:, 2:] - b[:, :2]).prod(axis=1)
+    return inter / np.maximum(area_a[:, None] + area_b[None, :] - inter, 1e-9)
+
+
+def match_detections(ref, other, iou_threshold=0.5):
+    """Greedy same-class matching; returns [(ref_index, other_index, iou), ...]."""
+    if len(ref.cls) == 0 or len(other.cls) == 0:
+        return []
+    iou = box_iou(ref.xyxy, other.xyxy)
+    iou[ref.cls[:, None] != other.cls[None, :]] = 0.0
+    matches = []
+    for flat in np.argsort(-iou, axis=None):
+        i, j = np.unravel_index(flat, iou.shape)
+        if iou[i, j] < iou_threshold:
+            break
+        matches.append((int(i), int(j), float(iou[i, j])))
+        iou[i, :] = 0.0
+        iou[:, j] = 0.0
+    return matches
+
+
+def run_engine(model, frames, imgsz, conf):
+    outputs, latencies = [], []
+    model(frames[0], imgsz=imgsz, conf=conf, verbose=False)  # warm-up
+    for img in frames:
+        started = time.perf_counter()
+        result = model(img, imgsz=imgsz, conf=conf, verbose=False)[0]
+        latencies.append((time.perf_counter() - started) * 1000.0)
+        outputs.append(extract_detections(result, model.names))
+    lat = np.array(latencies)
+    return outputs, {
+        "mean_ms": round(float(lat.mean()), 2),
+        "p50_ms": round(float(np.percentile(lat, 50)), 2),
+        "p95_ms": round(float(np.percentile(lat, 95)), 2),
+    }
+
+
+def compare(ref_outputs, outputs, iou_threshold):
+    ref_total = sum(len(d.cls) for d in ref_outputs)
+    total = sum(len(d.cls) for d in outputs)
+    ious, conf_diffs = [], []
+    for ref, other in zip(ref_outputs, outputs):
+        for i, j, iou in match_detections(ref, other, iou_threshold):
+            ious.append(iou)
+            conf_diffs.append(abs(float(ref.conf[i]) - float(other.conf[j])))
+    matched = len(ious)
+    return {
+        "detections": total,
+        "matched": matched,
+        "recall_vs_reference": round(matched / ref_total, 4) if ref_total else 1.0,
+        "precision_vs_reference": round(matched / total, 4) if total else 1.0,
+        "mean_iou": round(float(np.mean(ious)), 4) if ious else None,
+        "mean_conf_diff": round(float(np.mean(conf_diffs)), 4) if conf_diffs else None,
+        "max_conf_diff": round(float(np.max(conf_diffs)), 4) if conf_diffs else None,
+    }
+
+
+def load_frames(frames_dir, limit):
+    paths = sorted(glob.glob(os.path.join(frames_dir, "*.jpg")) + glob.glob(os.path.join(frames_dir, "*.png")))
+    frames = [img for img in (cv2.imread(p) for p in paths[:limit]) if img is not None]
+    if not frames:
+        raise SystemExit(f"No readable frames in {frames_dir}")
+    return frames
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare detections and latency across inference engines")
+    parser.add_argument("--weights", required=True)
+    parser.add_argument("--frames", required=True, help="directory of .jpg/.png frames")
+    parser.add_argument("--engines", default=",".join(ENGINES), help="comma-separated; the first is the reference")
+    parser.add_argument("--imgsz", type=int, default=640)
+    parser.add_argument("--conf", type=float, default=0.25)
+    parser.add_argument("--iou", type=float, default=0.5, help="IoU needed to count two boxes as the same detection")
+    parser.add_argument("--limit", type=int, default=200)
+    parser.add_argument("--output", help="also write the JSON report to this file")
+    args = parser.parse_args(argv)
+
+    engines = [e.strip() for e in args.engines.split(",") if e.strip()]
+    frames = load_frames(args.frames, args.limit)
+    report = {"weights": args.weights, "frames": len(frames), "reference": engines[0], "engines": {}}
+
+    ref_outputs = None
+    for engine in engines:
+        outputs, latency = run_engine(load_engine(args.weights, engine), frames, args.imgsz, args.conf)
+        entry = {"latency": latency}
+        if ref_outputs is None:
+            ref_outputs = outputs
+            entry["detections"] = sum(len(d.cls) for d in outputs)
+        else:
+            entry.update(compare(ref_outputs, outputs, args.iou))
+        report["engines"][engine] = entry
+
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text)
+
+
+if __name__ == "__main__":
+    main()
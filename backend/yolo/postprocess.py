@@ -0,0 +1,70 @@
+# backend/yolo/postprocess.py
+# Turn ultralytics Results into the JSON detections returned by the API.
+# The boxes tensor is copied to NumPy once per image (one device sync) and the
+# response is built from whole arrays instead of per-box tensor accesses.
+import numpy as np
+
+FORMATS = ("rows", "columnar")
+
+
+class Detections:
+    """Detections for one image as parallel arrays (cheap to pickle between processes)."""
+
+    __slots__ = ("xyxy", "cls", "conf", "names")
+
+    def __init__(self, xyxy, cls, conf, names):
+        self.xyxy = xyxy  # int32 [N, 4]
+        self.cls = cls    # int64 [N]
+        self.conf = conf  # float32 [N]
+        self.names = names
+
+    def __len__(self):
+        return len(self.cls)
+
+
+def extract_detections(result, names):
+    data = result.boxes.data
+    arr = data.cpu().numpy() if hasattr(data, "cpu") else np.asarray(data)
+    if arr.size == 0:
+        return Detections(np.zeros((0, 4), np.int32), np.zeros(0, np.int64), np.zeros(0, np.float32), names)
+    # columns: x1, y1, x2, y2, [track id,] conf, cls
+    return Detections(
+        arr[:, :4].astype(np.int32),
+        arr[:, -1].astype(np.int64),
+        arr[:, -2].astype(np.float32),
+        names,
+    )
+
+
+def detections_to_rows(det):
+    names = det.names
+    return [
+        {"class": names[c], "confidence": s, "bbox": b}
+        for c, s, b in zip(det.cls.tolist(), det.conf.tolist(), det.xyxy.tolist())
+    ]
+
+
+def detections_to_columns(det):
+    # class names are sent once; `classes` indexes into `names`
+    class_ids, inverse = np.unique(det.cls, return_inverse=True)
+    return {
+        "names": [det.names[c] for c in class_ids.tolist()],
+        "classes": inverse.reshape(-1).tolist(),
+        "scores": np.round(det.conf.astype(np.float64), 4).tolist(),
+        "boxes": det.xyxy.tolist(),
+    }
+
+
+def render_detections(det, fmt="rows"):
+    """Response fields for `det`: {"detections": [...]} or the columnar arrays."""
+    if fmt == "columnar":
+        return {"format": "columnar", **detections_to_columns(det)}
+    return {"detections": detections_to_rows(det)}
+
+
+def offset_detections(det, dx, dy):
+    """Shift boxes from crop coordinates back into the full frame."""
+    if not len(det) or (dx == 0 and dy == 0):
+        return det
+    shift = np.array([dx, dy, dx, dy], dtype=np.int32)
+    return Detections(det.xyxy + shift, det.cls, det.conf, det.names)
@@ -0,0 +1,161 @@
+# backend/yolo/registry.py
+# Process-wide cache of loaded registry models (ModelInfo rows), keyed by (name, version).
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+
+import numpy as np
+
+from yolo.stub import STUB_PATH
+
+# LRU bounds: at most YOLO_CACHE_SIZE models and, if set, YOLO_CACHE_MB of weights
+CACHE_SIZE = int(os.getenv("YOLO_CACHE_SIZE", "4"))
+CACHE_MB = float(os.getenv("YOLO_CACHE_MB", "0"))
+WARMUP_RUNS = int(os.getenv("YOLO_WARMUP_RUNS", "1"))
+WARMUP_SIZE = int(os.getenv("YOLO_WARMUP_SIZE", "640"))
+
+
+class ModelUnavailableError(RuntimeError):
+    """Raised when a model cannot be loaded or no replica is able to serve it."""
+
+
+def load_yolo(path, engine=None):
+    if path == STUB_PATH:
+        from yolo.stub import StubDetector
+        return StubDetector()
+    # torch / onnx / onnx-int8, see yolo/engines.py (YOLO_ENGINE)
+    from yolo.engines import ENGINE, load_engine
+    return load_engine(path, engine or ENGINE)
+
+
+def warm_up(model, runs=WARMUP_RUNS, size=WARMUP_SIZE):
+    # the first forward passes pay for lazy init (fuse, allocator, kernels); do it before real traffic
+    dummy = np.zeros((size, size, 3), dtype=np.uint8)
+    for _ in range(max(0, runs)):
+        model(dummy, verbose=False)
+
+
+def model_nbytes(model, path=None):
+    try:
+        return sum(p.numel() * p.element_size() for p in model.model.parameters())
+    except Exception:
+        return os.path.getsize(path) if path and os.path.exists(path) else 0
+
+
+class ModelCache:
+    """LRU cache of loaded models with single-flight loading.
+
+    Concurrent `get` calls for a model that is not loaded yet share one load;
+    everyone else waits for it instead of reading the weights again. `invalidate`
+    bumps the name's generation, so a load that started before it is returned to
+    its callers but not cached.
+    """
+
+    def __init__(self, max_models=CACHE_SIZE, max_mb=CACHE_MB, loader=load_yolo, warmup=warm_up):
+        self.max_models = max(1, int(max_models))
+        self.max_bytes = int(max_mb * 1024 * 1024) if max_mb else 0
+        self.loader = loader
+        self.warmup = warmup
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # key -> (model, nbytes, path)
+        self._loading = {}  # key -> Future
+        self._generation = {}  # name -> bumped by invalidate
+        self._current = {}  # name -> key the registry (DB) resolved it to
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, path, current=False):
+        """Load (or reuse) model `key`; `current=True` marks it as the version `find` returns for its name."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                if current:
+                    self._current[key[0]] = key
+                self.hits += 1
+                return entry[0]
+            future = self._loading.get(key)
+            owner = future is None
+            if owner:
+                future = Future()
+                self._loading[key] = future
+                self.misses += 1
+            generation = self._generation.get(key[0], 0)
+
+        if not owner:
+            return future.result()
+
+        try:
+            model = self.loader(path)
+            if self.warmup is not None:
+                self.warmup(model)
+            nbytes = model_nbytes(model, path)
+        except BaseException as e:
+            with self._lock:
+                if self._loading.get(key) is future:
+                    del self._loading[key]
+            future.set_exception(e)
+            raise
+
+        with self._lock:
+            if self._loading.get(key) is future:
+                del self._loading[key]
+            # invalidated while loading: the weights may already be stale, don't keep them
+            if self._generation.get(key[0], 0) == generation:
+                self._entries[key] = (model, nbytes, path)
+                if current:
+                    self._current[key[0]] = key
+                self._evict()
+        future.set_result(model)
+        return model
+
+    def invalidate(self, name):
+        """Drop every cached version of `name`; loads already running for it are not cached."""
+        with self._lock:
+            self._generation[name] = self._generation.get(name, 0) + 1
+            self._current.pop(name, None)
+            for key in [k for k in self._entries if k[0] == name]:
+                del self._entries[key]
+            # later callers start a fresh load instead of joining the stale one
+            for key in [k for k in self._loading if k[0] == name]:
+                del self._loading[key]
+
+    def _evict(self):
+        # keep the most recently used model even if it alone exceeds the memory budget
+        while len(self._entries) > 1 and (
+            len(self._entries) > self.max_models
+            or (self.max_bytes and self._total_bytes() > self.max_bytes)
+        ):
+            key, _ = self._entries.popitem(last=False)
+            if self._current.get(key[0]) == key:
+                del self._current[key[0]]
+            self.evictions += 1
+
+    def _total_bytes(self):
+        return sum(nbytes for _, nbytes, _ in self._entries.values())
+
+    def find(self, name):
+        """(key, path) of the loaded version of `name` the registry last resolved it to, if any."""
+        with self._lock:
+            key = self._current.get(name)
+            if key is not None and key in self._entries:
+                return key, self._entries[key][2]
+        return None
+
+    def stats(self):
+        with self._lock:
+            return {
+                "models": [{"name": k[0], "version": k[1], "bytes": nbytes} for k, (_, nbytes, _) in self._entries.items()],
+                "loading": [{"name": k[0], "version": k[1]} for k in self._loading],
+                "max_models": self.max_models,
+                "max_bytes": self.max_bytes,
+                "total_bytes": self._total_bytes(),
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+
+model_cache = ModelCache()
@@ -0,0 +1,307 @@
+# backend/yolo/replicas.py
+# Pool of inference worker processes, each holding its own YOLO replica.
+# Decoded frames are handed over through shared memory instead of being pickled,
+# and every batch goes to the least-loaded worker.
+import asyncio
+import itertools
+import multiprocessing as mp
+import os
+import queue
+import threading
+import time
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from yolo.registry import ModelUnavailableError
+
+# YOLO_REPLICAS: number of worker processes; "auto" derives it from the core count,
+# 0 keeps inference in the API process.
+REPLICAS = os.getenv("YOLO_REPLICAS", "auto")
+TORCH_THREADS = int(os.getenv("YOLO_TORCH_THREADS", "2"))
+# Largest decoded frame that fits a shared-memory slot (default 1280x720 BGR);
+# bigger frames are still served but get pickled through the queue.
+FRAME_BYTES = int(os.getenv("YOLO_SHM_FRAME_BYTES", str(1280 * 720 * 3)))
+# Batches each worker may have in flight (one shared-memory region per batch)
+BATCHES_PER_WORKER = 2
+# Longest a request waits for its batch; a job on a replica that died is failed by the
+# listener's liveness sweep (every YOLO_REPLICA_SWEEP_S) well before that.
+JOB_TIMEOUT_S = float(os.getenv("YOLO_REPLICA_TIMEOUT", "30"))
+SWEEP_S = float(os.getenv("YOLO_REPLICA_SWEEP_S", "1.0"))
+
+
+def replica_count(setting=REPLICAS, torch_threads=TORCH_THREADS):
+    if str(setting).strip().lower() in ("", "auto"):
+        return max(1, (os.cpu_count() or 1) // max(1, torch_threads))
+    return max(0, int(setting))
+
+
+def _worker_main(index, model_path, shm_name, torch_threads, requests, results):
+    from yolo.postprocess import extract_detections
+    from yolo.registry import load_yolo, warm_up
+
+    try:
+        import torch
+        torch.set_num_threads(torch_threads)
+    except ImportError:
+        # only the stub detector runs without torch
+        pass
+    try:
+        model = load_yolo(model_path)
+        warm_up(model)
+    except Exception as e:
+        results.put(("ready", index, False, repr(e)))
+        return
+    shm = shared_memory.SharedMemory(name=shm_name)
+    results.put(("ready", index, True, None))
+    try:
+        while True:
+            job = requests.get()
+            if job is None:
+                break
+            job_id, frames, imgsz = job
+            images = []
+            for frame in frames:
+                if isinstance(frame, np.ndarray):
+                    images.append(frame)
+                else:
+                    offset, shape, dtype = frame
+                    images.append(np.ndarray(shape, dtype=dtype, buffer=shm.buf, offset=offset))
+            try:
+                out = model(images, verbose=False, **({"imgsz": imgsz} if imgsz else {}))
+                payload = [extract_detections(r, model.names) for r in out]
+                results.put((job_id, index, True, payload))
+            except Exception as e:
+                results.put((job_id, index, False, repr(e)))
+            del images
+    finally:
+        shm.close()
+
+
+class _Worker:
+    def __init__(self, index, region_bytes):
+        self.index = index
+        self.region_bytes = region_bytes
+        self.shm = shared_memory.SharedMemory(create=True, size=region_bytes * BATCHES_PER_WORKER)
+        self.requests = None
+        self.process = None
+        self.free_regions = list(range(BATCHES_PER_WORKER))
+        self.in_flight = 0
+        self.ready = False
+        self.error = None
+
+
+class ReplicaPool:
+    """N worker processes with one model replica each.
+
+    `predict_batch` is a coroutine so the event loop never blocks on a worker;
+    use it directly as the `BatchScheduler` predictor with
+    `concurrency=pool.max_concurrent_batches`.
+    """
+
+    def __init__(self, model_path, workers, torch_threads=TORCH_THREADS, max_batch=8, frame_bytes=FRAME_BYTES):
+        self.model_path = model_path
+        self.num_workers = max(1, int(workers))
+        self.torch_threads = max(1, int(torch_threads))
+        self.max_batch = max(1, int(max_batch))
+        self.frame_bytes = int(frame_bytes)
+        self.max_concurrent_batches = self.num_workers * BATCHES_PER_WORKER
+        self._ctx = mp.get_context("spawn")
+        self._lock = threading.Lock()
+        self._ready_changed = threading.Condition()
+        self._ids = itertools.count()
+        self._pending = {}
+        self._workers = []
+        self._results = None
+        self._listener = None
+        self.started = False
+        self.pickled_frames = 0
+
+    def start(self):
+        with self._lock:
+            if self.started:
+                return
+            self._results = self._ctx.Queue()
+            for i in range(self.num_workers):
+                worker = _Worker(i, self.frame_bytes * self.max_batch)
+                worker.requests = self._ctx.Queue()
+                worker.process = self._ctx.Process(
+                    target=_worker_main,
+                    args=(i, self.model_path, worker.shm.name, self.torch_threads, worker.requests, self._results),
+                    name=f"yolo-replica-{i}",
+                    daemon=True,
+                )
+                worker.process.start()
+                self._workers.append(worker)
+            self._listener = threading.Thread(target=self._listen, name="yolo-replica-results", daemon=True)
+            self._listener.start()
+            self.started = True
+
+    def _listen(self):
+        next_sweep = time.monotonic() + SWEEP_S
+        while True:
+            if time.monotonic() >= next_sweep:
+                self._sweep_dead_workers()
+                next_sweep = time.monotonic() + SWEEP_S
+            try:
+                job_id, index, ok, payload = self._results.get(timeout=SWEEP_S)
+            except queue.Empty:
+                continue
+            except (EOFError, OSError, ValueError):
+                break
+            if job_id is None:
+                break
+            if job_id == "ready":
+                worker = self._workers[index]
+                worker.ready, worker.error = ok, payload
+                with self._ready_changed:
+                    self._ready_changed.notify_all()
+                continue
+            with self._lock:
+                entry = self._pending.pop(job_id, None)
+                if entry is None:
+                    continue
+                loop, future, worker, region, count = entry
+                worker.in_flight -= count
+                if region is not None:
+                    worker.free_regions.append(region)
+            if ok:
+                loop.call_soon_threadsafe(_set_result, future, payload)
+            else:
+                loop.call_soon_threadsafe(_set_exception, future, RuntimeError(f"Replica {index} failed: {payload}"))
+
+    def _sweep_dead_workers(self):
+        """Fail the jobs of workers that exited (OOM, crash in the engine) and give back their slots."""
+        failed = []
+        with self._lock:
+            dead = {w.index: w for w in self._workers if w.process is not None and not w.process.is_alive()}
+            if not dead:
+                return
+            for job_id, (loop, future, worker, region, count) in list(self._pending.items()):
+                if worker.index in dead:
+                    del self._pending[job_id]
+                    failed.append((loop, future, worker.index))
+            for worker in dead.values():
+                worker.in_flight = 0
+                worker.free_regions = list(range(BATCHES_PER_WORKER))
+                if worker.ready or worker.error is None:
+                    worker.ready = False
+                    worker.error = f"exited with code {worker.process.exitcode}"
+                    print(f"Inference replica {worker.index} {worker.error}")
+        for loop, future, index in failed:
+            loop.call_soon_threadsafe(_set_exception, future, ModelUnavailableError(f"Replica {index} exited"))
+        with self._ready_changed:
+            self._ready_changed.notify_all()
+
+    def _pick_worker(self, count):
+        # least-loaded live worker, preferring one with a free shared-memory region
+        live = [w for w in self._workers if w.process.is_alive()]
+        if not live:
+            raise ModelUnavailableError("No inference replicas are running")
+        with_region = [w for w in live if w.free_regions]
+        worker = min(with_region or live, key=lambda w: w.in_flight)
+        region = worker.free_regions.pop() if worker.free_regions else None
+        worker.in_flight += count
+        return worker, region
+
+    async def predict_batch(self, images, imgsz=None):
+        if not self.started:
+            self.start()
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        job_id = next(self._ids)
+        with self._lock:
+            worker, region = self._pick_worker(len(images))
+            self._pending[job_id] = (loop, future, worker, region, len(images))
+
+        frames = []
+        offset = region * worker.region_bytes if region is not None else 0
+        for i, img in enumerate(images):
+            img = np.ascontiguousarray(img)
+            if region is not None and i < self.max_batch and img.nbytes <= self.frame_bytes:
+                dst = np.ndarray(img.shape, dtype=img.dtype, buffer=worker.shm.buf, offset=offset)
+                dst[...] = img
+                frames.append((offset, img.shape, img.dtype.str))
+                offset += self.frame_bytes
+            else:
+                self.pickled_frames += 1
+                frames.append(img)
+        worker.requests.put((job_id, frames, imgsz))
+        try:
+            # shield: on timeout the listener still reclaims the slot when the worker answers or dies
+            return await asyncio.wait_for(asyncio.shield(future), JOB_TIMEOUT_S)
+        except asyncio.TimeoutError:
+            raise ModelUnavailableError(f"Replica {worker.index} did not answer within {JOB_TIMEOUT_S:g}s")
+
+    def wait_ready(self, timeout=None):
+        """Block until every worker has loaded its replica (or failed); True if any is ready."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._ready_changed:
+            while any(w.process.is_alive() and not w.ready and w.error is None for w in self._workers):
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    break
+                self._ready_changed.wait(timeout=1.0 if remaining is None else min(1.0, remaining))
+        return any(w.ready for w in self._workers)
+
+    def readiness(self):
+        ready = sum(1 for w in self._workers if w.ready)
+        errors = [w.error for w in self._workers if w.error]
+        if ready:
+            status = "ready"
+        elif not self.started:
+            status = "not_loaded"
+        elif len(errors) == len(self._workers):
+            status = "error"
+        else:
+            status = "loading"
+        return {"status": status, "ready_workers": ready, "workers": self.num_workers, "errors": errors}
+
+    def stats(self):
+        with self._lock:
+            workers = [{
+                "index": w.index,
+                "alive": w.process.is_alive() if w.process else False,
+                "ready": w.ready,
+                "error": w.error,
+                "in_flight": w.in_flight,
+            } for w in self._workers]
+        return {
+            "replicas": self.num_workers,
+            "torch_threads": self.torch_threads,
+            "frame_bytes": self.frame_bytes,
+            "pickled_frames": self.pickled_frames,
+            "workers": workers,
+        }
+
+    def close(self):
+        with self._lock:
+            if not self.started:
+                return
+            self.started = False
+            pending, self._pending = self._pending, {}
+        for worker in self._workers:
+            try:
+                worker.requests.put(None)
+            except (OSError, ValueError):
+                pass
+        for worker in self._workers:
+            worker.process.join(timeout=5)
+            if worker.process.is_alive():
+                worker.process.terminate()
+            worker.shm.close()
+            worker.shm.unlink()
+        self._results.put((None, None, None, None))
+        for loop, future, *_ in pending.values():
+            loop.call_soon_threadsafe(_set_exception, future, RuntimeError("Replica pool closed"))
+        self._workers = []
+
+
+def _set_result(future, value):
+    if not future.done():
+        future.set_result(value)
+
+
+def _set_exception(future, exc):
+    if not future.done():
+        future.set_exception(exc)
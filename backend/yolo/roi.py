@@ -0,0 +1,62 @@
+# backend/yolo/roi.py
+# Region-of-interest cascade for streaming sessions: once the signing hand is found,
+# later frames are cropped around it and inferred at a smaller imgsz.
+import os
+
+import numpy as np
+
+ROI_ENABLED = os.getenv("YOLO_ROI", "1") not in ("0", "false", "False", "")
+# Detections below this confidence don't anchor an ROI (and trigger a full-frame pass)
+ROI_MIN_CONF = float(os.getenv("YOLO_ROI_MIN_CONF", "0.5"))
+# Crop side = longest side of the last box * ROI_EXPAND (at least ROI_MIN_SIDE px)
+ROI_EXPAND = float(os.getenv("YOLO_ROI_EXPAND", "2.0"))
+ROI_MIN_SIDE = int(os.getenv("YOLO_ROI_MIN_SIDE", "160"))
+ROI_IMGSZ = int(os.getenv("YOLO_ROI_IMGSZ", "320"))
+# Full-frame inference at least every N frames, to pick up hands that moved away
+ROI_REFRESH_FRAMES = int(os.getenv("YOLO_ROI_REFRESH", "15"))
+
+roi_stats = {"roi_frames": 0, "full_frames": 0, "fallbacks": 0}
+
+
+class RoiTracker:
+    """Per-session ROI state: where the hand was last seen with good confidence."""
+
+    def __init__(self, min_conf=ROI_MIN_CONF, expand=ROI_EXPAND, min_side=ROI_MIN_SIDE, refresh=ROI_REFRESH_FRAMES):
+        self.min_conf = min_conf
+        self.expand = expand
+        self.min_side = min_side
+        self.refresh = max(1, int(refresh))
+        self.box = None
+        self.since_full = 0
+
+    def plan(self, shape):
+        """Crop (x0, y0, x1, y1) for the next frame, or None for a full-frame pass."""
+        if self.box is None or self.since_full >= self.refresh:
+            return None
+        height, width = shape[:2]
+        x1, y1, x2, y2 = self.box
+        side = max(x2 - x1, y2 - y1) * self.expand
+        side = int(min(max(side, self.min_side), width, height))
+        cx, cy = (x1 + x2) / 2.0, (y1 + y2) / 2.0
+        x0 = int(np.clip(cx - side / 2.0, 0, width - side))
+        y0 = int(np.clip(cy - side / 2.0, 0, height - side))
+        if side >= min(width, height):
+            return None
+        return x0, y0, x0 + side, y0 + side
+
+    def confident(self, det):
+        return len(det) > 0 and float(det.conf.max()) >= self.min_conf
+
+    def update(self, det, crop):
+        """Record the detections (in full-frame coordinates) of a frame inferred with `crop`."""
+        if crop is None:
+            self.since_full = 0
+            roi_stats["full_frames"] += 1
+        else:
+            self.since_full += 1
+            roi_stats["roi_frames"] += 1
+        if self.confident(det):
+            best = int(det.conf.argmax())
+            self.box = tuple(det.xyxy[best].tolist())
+        else:
+            self.box = None
@@ -1,34 +1,395 @@
 # backend/yolo/routes.py
-from fastapi import APIRouter, Request
+import asyncio
+import json
+import os
+import threading
+import time
+import uuid
+from functools import partial
+from typing import Optional
+
+import numpy as np
+
+from fastapi import APIRouter, Header, Query, Request, WebSocket, WebSocketDisconnect
+from fastapi.concurrency import run_in_threadpool
 from fastapi.responses import JSONResponse
-from ultralytics import YOLO
-import cv2, numpy as np, base64
+
+from modules.database import SessionLocal
+from modules.metrics import QUEUE_DEPTH, STAGE_LATENCY
+from modules.yolo_db import ModelInfo
+
+from yolo.batcher import MAX_BATCH, BatchScheduler
+from yolo.dedup import fingerprint, frame_cache
+from yolo.engines import ENGINE, prepare_artifact
+from yolo.executor import OverloadedError, inference_pool
+from yolo.frames import FrameError, decode_frame, read_frame_bytes
+from yolo.pacing import Stability, inference_latency, session_stability, suggest_interval_ms
+from yolo.postprocess import FORMATS, extract_detections, offset_detections, render_detections
+from yolo.registry import ModelUnavailableError, load_yolo, model_cache, warm_up
+from yolo.replicas import ReplicaPool, replica_count
+from yolo.roi import ROI_ENABLED, ROI_IMGSZ, RoiTracker, roi_stats
+from yolo.stream import LatestFrame
+from yolo.stub import STUB_PATH
 
 router = APIRouter(prefix="/yolo", tags=["YOLO"])
-model = YOLO(r"D:\WORK\Python\web\github_zone\vsl_web_new\backend\yolo\model\v9_n_yolo11.pt")
+MODEL_PATH = os.getenv("YOLO_MODEL_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "model", "v9_n_yolo11.pt"))
+
+# With YOLO_REPLICAS > 0 (the default is derived from the core count) inference runs
+# in worker processes; otherwise the model lives in this process.
+REPLICAS = replica_count()
+replica_pool = ReplicaPool(MODEL_PATH, REPLICAS, max_batch=MAX_BATCH) if REPLICAS else None
+
+# The default model is loaded on first use (or by warm_up_default_model at startup),
+# never at import, so a slow or missing weights file cannot take the app down.
+model = None
+model_state = {"status": "not_loaded", "error": None, "load_ms": None}
+_model_lock = threading.Lock()
+# after a failed load, requests get 503 for this long instead of each retrying the load
+LOAD_RETRY_S = float(os.getenv("YOLO_LOAD_RETRY_S", "30"))
+_load_failure = {"at": None}
+
+
+def _recent_failure():
+    failed_at = _load_failure["at"]
+    if failed_at is not None and time.monotonic() - failed_at < LOAD_RETRY_S:
+        raise ModelUnavailableError(f"Model not available: {model_state['error']}")
+
+
+def get_model():
+    global model
+    if model is not None:
+        return model
+    _recent_failure()
+    with _model_lock:
+        if model is None:
+            # requests queued behind a load that just failed do not retry it
+            _recent_failure()
+            started = time.perf_counter()
+            model_state.update(status="loading", error=None)
+            try:
+                loaded = load_yolo(MODEL_PATH)
+                warm_up(loaded)
+            except Exception as e:
+                model_state.update(status="error", error=str(e))
+                _load_failure["at"] = time.monotonic()
+                raise ModelUnavailableError(f"Model not available: {e}")
+            _load_failure["at"] = None
+            model = loaded
+            model_state.update(status="ready", load_ms=round((time.perf_counter() - started) * 1000.0, 1))
+    return model
+
+
+def warm_up_default_model():
+    """Load and warm up the default model (or start the replicas); meant for a startup background task."""
+    if replica_pool is not None:
+        if MODEL_PATH != STUB_PATH:
+            # export/quantize once here rather than racing in every worker
+            try:
+                prepare_artifact(MODEL_PATH, ENGINE)
+            except Exception as e:
+                print(f"Could not prepare {ENGINE} engine for {MODEL_PATH}: {e}")
+        replica_pool.start()
+        return replica_pool.wait_ready()
+    try:
+        get_model()
+    except ModelUnavailableError:
+        return False
+    return True
+
+
+def model_status():
+    if replica_pool is not None:
+        return {"replicas": True, "engine": ENGINE, **replica_pool.readiness()}
+    return {"replicas": False, "engine": ENGINE, "path": MODEL_PATH, **model_state}
+
+
+def _imgsz_kwargs(imgsz):
+    return {"imgsz": imgsz} if imgsz else {}
+
+
+def predict_batch(images, imgsz=None):
+    # one forward pass for the whole batch; ultralytics letterboxes mixed frame sizes
+    default_model = get_model()
+    with STAGE_LATENCY.time(stage="forward"):
+        results = default_model(images, verbose=False, **_imgsz_kwargs(imgsz))
+    with STAGE_LATENCY.time(stage="postprocess"):
+        return [extract_detections(r, default_model.names) for r in results]
+
+
+def _default_scheduler(imgsz=None):
+    if replica_pool is not None:
+        return BatchScheduler(partial(replica_pool.predict_batch, imgsz=imgsz),
+                              concurrency=replica_pool.max_concurrent_batches)
+    return BatchScheduler(partial(predict_batch, imgsz=imgsz), executor=inference_pool)
+
+
+scheduler = _default_scheduler()
+# smaller-imgsz scheduler for ROI crops (frames of one batch must share an imgsz)
+roi_scheduler = _default_scheduler(ROI_IMGSZ)
+QUEUE_DEPTH.set_function(scheduler.queue_depth, scheduler="default")
+QUEUE_DEPTH.set_function(roi_scheduler.queue_depth, scheduler="roi")
+
+
+# Registry models (ModelInfo rows) run in this process from the shared model cache,
+# with one scheduler per (name, version, imgsz): key -> (file_path, scheduler)
+registry_schedulers = {}
+
+
+def _registry_predictor(key, path, imgsz=None):
+    def run(images):
+        # a cache hit is a dict lookup; an evicted model is transparently reloaded
+        registry_model = _load_registry_model(key, path)
+        with STAGE_LATENCY.time(stage="forward"):
+            results = registry_model(images, verbose=False, **_imgsz_kwargs(imgsz))
+        with STAGE_LATENCY.time(stage="postprocess"):
+            return [extract_detections(r, registry_model.names) for r in results]
+    return run
+
+
+def _load_registry_model(key, path, current=False):
+    try:
+        return model_cache.get(key, path, current=current)
+    except Exception as e:
+        # corrupt or missing weights: 503 like the default model, not a 500
+        raise ModelUnavailableError(f"Model '{key[0]}' could not be loaded: {e}")
+
+
+def _resolve_registry_model(name):
+    found = model_cache.find(name)
+    if found is not None:
+        return found
+    db = SessionLocal()
+    try:
+        # newest row wins if an old table has no unique constraint on name
+        entry = db.query(ModelInfo).filter(ModelInfo.name == name).order_by(ModelInfo.id.desc()).first()
+    finally:
+        db.close()
+    if entry is None:
+        raise LookupError(f"Model '{name}' not found")
+    key = (entry.name, entry.version)
+    _load_registry_model(key, entry.file_path, current=True)
+    return key, entry.file_path
+
+
+async def get_scheduler(name: Optional[str] = None, imgsz=None):
+    """Scheduler for the default model, or for registry model `name` (loaded on first use)."""
+    if not name:
+        return roi_scheduler if imgsz == ROI_IMGSZ else scheduler
+    key, path = await run_in_threadpool(_resolve_registry_model, name)
+    entry = registry_schedulers.get((*key, imgsz))
+    if entry is None or entry[0] != path:
+        entry = (path, BatchScheduler(_registry_predictor(key, path, imgsz), executor=inference_pool))
+        registry_schedulers[(*key, imgsz)] = entry
+        QUEUE_DEPTH.set_function(entry[1].queue_depth, scheduler=f"{key[0]}:{key[1]}" + (f"@{imgsz}" if imgsz else ""))
+    return entry[1]
+
+
+def shutdown():
+    if replica_pool is not None:
+        replica_pool.close()
+    inference_pool.shutdown()
+
+
+def _decode_with_fingerprint(raw):
+    img = decode_frame(raw)
+    return img, fingerprint(img)
+
+
+async def _infer_roi(sched, roi_sched, roi, img):
+    crop = roi.plan(img.shape)
+    if crop is not None:
+        x0, y0, x1, y1 = crop
+        detections = offset_detections(await roi_sched.submit(np.ascontiguousarray(img[y0:y1, x0:x1])), x0, y0)
+        if roi.confident(detections):
+            roi.update(detections, crop)
+            return detections
+        # lost the hand (or confidence dropped): redo this frame on the full image
+        roi_stats["fallbacks"] += 1
+    detections = await sched.submit(img)
+    roi.update(detections, None)
+    return detections
+
+
+async def infer_frame(sched, raw, session=None, model_key=None, roi=None, roi_sched=None):
+    """Decode `raw` and run it through `sched`; returns (detections, cached).
+
+    With a session id, a frame that is a near-duplicate of the session's last
+    processed frame reuses that frame's detections instead of a forward pass.
+    With an ROI tracker, the frame may be cropped around the last hand and run
+    through `roi_sched` at a smaller imgsz.
+    """
+    fp = None
+    if session and frame_cache.enabled:
+        img, fp = await inference_pool.try_run(_decode_with_fingerprint, raw)
+        cached = frame_cache.lookup(session, model_key, fp)
+        if cached is not None:
+            return cached, True
+    else:
+        # decode and inference both run on the bounded pool, never on the event loop
+        img = await inference_pool.try_run(decode_frame, raw)
+
+    started = time.perf_counter()
+    if roi is not None and roi_sched is not None:
+        detections = await _infer_roi(sched, roi_sched, roi, img)
+    else:
+        detections = await sched.submit(img)
+    elapsed = time.perf_counter() - started
+    inference_latency.observe(elapsed * 1000.0)
+    STAGE_LATENCY.observe(elapsed, stage="inference")
+    if fp is not None:
+        frame_cache.store(session, model_key, fp, detections)
+    return detections, False
+
+
+def next_frame_ms(sched, stable_streak=0):
+    """Suggested delay before the client's next frame (see yolo/pacing.py)."""
+    depth = sched.queue_depth() + inference_pool.pending()
+    capacity = sched.queue_size + inference_pool.capacity
+    return suggest_interval_ms(depth, capacity, inference_latency.value, stable_streak)
+
+
+def overloaded_response(e: OverloadedError):
+    return JSONResponse({"error": str(e)}, status_code=503, headers={"Retry-After": str(e.retry_after)})
+
 
 @router.post("/predict")
-async def predict(request: Request):
-    data = await request.json()
-    img_base64 = data.get("image")
-    if not img_base64:
-        return JSONResponse({"error": "No image data received"}, status_code=400)
-
-    img_bytes = base64.b64decode(img_base64.split(",")[1])
-    nparr = np.frombuffer(img_bytes, np.uint8)
-    img = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
-
-    results = model(img, verbose=False)
-    boxes = results[0].boxes
-
-    detections = []
-    for box in boxes:
-        xyxy = box.xyxy[0].cpu().numpy().tolist()
-        x1, y1, x2, y2 = map(int, xyxy)
-        detections.append({
-            "class": model.names[int(box.cls)],
-            "confidence": float(box.conf),
-            "bbox": [x1, y1, x2, y2]
-        })
-
-    return {"detections": detections}
+async def predict(
+    request: Request,
+    model_name: Optional[str] = Query(None, alias="model"),
+    fmt: str = Query("rows", alias="format"),
+    session: Optional[str] = Query(None),
+    x_session_id: Optional[str] = Header(None),
+):
+    # Accepts raw image/jpeg bodies, multipart uploads and the legacy JSON data URL.
+    # ?model=<name> selects a registry model instead of the default one;
+    # ?format=columnar returns parallel classes/scores/boxes arrays;
+    # a session id (X-Session-Id header or ?session=) enables near-duplicate frame skipping.
+    if fmt not in FORMATS:
+        return JSONResponse({"error": f"Unknown format '{fmt}'"}, status_code=400)
+    try:
+        sched = await get_scheduler(model_name)
+    except LookupError as e:
+        return JSONResponse({"error": str(e)}, status_code=404)
+    except ModelUnavailableError as e:
+        return JSONResponse({"error": str(e)}, status_code=503)
+
+    try:
+        with STAGE_LATENCY.time(stage="read_body"):
+            raw = await read_frame_bytes(request)
+        session = session or x_session_id
+        detections, cached = await infer_frame(sched, raw, session, model_name)
+    except FrameError as e:
+        return JSONResponse({"error": str(e)}, status_code=400)
+    except OverloadedError as e:
+        return overloaded_response(e)
+    except ModelUnavailableError as e:
+        return JSONResponse({"error": str(e)}, status_code=503)
+
+    streak = session_stability.observe(session, detections, cached) if session else 0
+    hint = next_frame_ms(sched, streak)
+    with STAGE_LATENCY.time(stage="render"):
+        body = {**render_detections(detections, fmt), "cached": cached, "next_frame_ms": hint}
+    # plain lists/dicts only, so skip FastAPI's jsonable_encoder pass
+    with STAGE_LATENCY.time(stage="encode"):
+        return JSONResponse(body, headers={"X-Next-Frame-Ms": str(hint)})
+
+
+async def _receive_frames(websocket: WebSocket, slot: LatestFrame):
+    # Binary messages are encoded frames; text messages may carry the legacy {"image": dataURL} form
+    try:
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                break
+            if message.get("bytes") is not None:
+                slot.put(message["bytes"])
+            elif message.get("text"):
+                try:
+                    data = json.loads(message["text"])
+                except ValueError:
+                    continue
+                if isinstance(data, dict) and data.get("image"):
+                    slot.put(data["image"])
+    finally:
+        slot.close()
+
+
+@router.websocket("/stream")
+async def stream(
+    websocket: WebSocket,
+    model_name: Optional[str] = Query(None, alias="model"),
+    fmt: str = Query("rows", alias="format"),
+    roi: bool = Query(ROI_ENABLED),
+):
+    """Continuous inference over one connection: push frames, receive detections.
+
+    Only the newest pending frame is kept, so stale frames are dropped instead of queued.
+    With ?roi=1 (default from YOLO_ROI) frames are cropped around the last detected hand.
+    """
+    await websocket.accept()
+    if fmt not in FORMATS:
+        fmt = "rows"
+    try:
+        sched = await get_scheduler(model_name)
+        roi_sched = await get_scheduler(model_name, ROI_IMGSZ) if roi else None
+    except (LookupError, ModelUnavailableError) as e:
+        await websocket.send_json({"error": str(e)})
+        await websocket.close()
+        return
+    slot = LatestFrame()
+    receiver = asyncio.create_task(_receive_frames(websocket, slot))
+    session = uuid.uuid4().hex
+    tracker = RoiTracker() if roi else None
+    stability = Stability()
+    processed = 0
+    try:
+        while True:
+            raw = await slot.get()
+            if raw is None:
+                break
+            try:
+                detections, cached = await infer_frame(sched, raw, session, model_name, tracker, roi_sched)
+            except FrameError as e:
+                await websocket.send_json({"error": str(e)})
+                continue
+            except OverloadedError as e:
+                await websocket.send_json({
+                    "error": str(e),
+                    "retry_after": e.retry_after,
+                    "next_frame_ms": e.retry_after * 1000,
+                })
+                continue
+            except ModelUnavailableError as e:
+                await websocket.send_json({"error": str(e)})
+                continue
+            processed += 1
+            await websocket.send_json({
+                **render_detections(detections, fmt),
+                "cached": cached,
+                "next_frame_ms": next_frame_ms(sched, stability.observe(detections, cached)),
+                "frame": slot.received,
+                "processed": processed,
+                "dropped": slot.dropped,
+            })
+    except WebSocketDisconnect:
+        pass
+    finally:
+        receiver.cancel()
+        frame_cache.forget(session)
+
+
+@router.get("/stats")
+def stats():
+    return {
+        "scheduler": scheduler.stats(),
+        "pool": inference_pool.stats(),
+        "replicas": replica_pool.stats() if replica_pool is not None else None,
+        "roi_scheduler": roi_scheduler.stats(),
+        "roi": dict(roi_stats),
+        "registry": {
+            f"{name}:{version}" + (f"@{imgsz}" if imgsz else ""): sched.stats()
+            for (name, version, imgsz), (_, sched) in registry_schedulers.items()
+        },
+        "cache": model_cache.stats(),
+        "dedup": frame_cache.stats(),
+    }
@@ -0,0 +1,39 @@
+# backend/yolo/stream.py
+# Per-connection state for the /yolo/stream WebSocket.
+import asyncio
+
+
+class LatestFrame:
+    """Single-slot mailbox: a new frame replaces any frame not yet picked up.
+
+    A slow client (or a slow server) therefore never builds a backlog; frames
+    that were overwritten before inference are counted in `dropped`.
+    """
+
+    def __init__(self):
+        self._frame = None
+        self._event = asyncio.Event()
+        self.closed = False
+        self.received = 0
+        self.dropped = 0
+
+    def put(self, frame):
+        if self._frame is not None:
+            self.dropped += 1
+        self._frame = frame
+        self.received += 1
+        self._event.set()
+
+    def close(self):
+        self.closed = True
+        self._event.set()
+
+    async def get(self):
+        """Wait for the newest frame; returns None once the connection is closed."""
+        while self._frame is None:
+            if self.closed:
+                return None
+            self._event.clear()
+            await self._event.wait()
+        frame, self._frame = self._frame, None
+        return frame
@@ -0,0 +1,36 @@
+# backend/yolo/stub.py
+# Stand-in detector for offline benchmarks and tests: set YOLO_MODEL_PATH=stub.
+# It returns one fixed box per image after a configurable simulated cost.
+import os
+import time
+
+import numpy as np
+
+STUB_PATH = "stub"
+# simulated forward pass cost: fixed per batch + per image (ms)
+STUB_BATCH_MS = float(os.getenv("YOLO_STUB_BATCH_MS", "5"))
+STUB_IMAGE_MS = float(os.getenv("YOLO_STUB_IMAGE_MS", "2"))
+
+
+class _Boxes:
+    def __init__(self, data):
+        self.data = data
+
+
+class _Result:
+    def __init__(self, img):
+        height, width = img.shape[:2]
+        box = [width * 0.25, height * 0.25, width * 0.75, height * 0.75, 0.9, 0.0]
+        self.boxes = _Boxes(np.array([box], dtype=np.float32))
+        self.orig_shape = (height, width)
+
+
+class StubDetector:
+    names = {0: "stub"}
+
+    def __call__(self, images, **kwargs):
+        batch = images if isinstance(images, list) else [images]
+        time.sleep((STUB_BATCH_MS + STUB_IMAGE_MS * len(batch)) / 1000.0)
+        return [_Result(img) for img in batch]
+
+    predict = __call__
@@ -0,0 +1,90 @@
+"""Argon2 microbenchmark for sizing the password hashing pool.
+
+Measures hashes/sec and verifies/sec on one core for each cost setting, then
+with N worker processes, and prints how many workers (HASH_WORKERS) a target
+login rate needs.
+
+    python bench/hash_bench.py --time-cost 2,3 --memory-cost 19456,65536 --parallelism 1,4 --target-rps 50
+"""
+import argparse
+import itertools
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+
+def make_context(time_cost, memory_cost, parallelism):
+    from passlib.context import CryptContext
+    return CryptContext(schemes=["argon2"], argon2__rounds=time_cost,
+                        argon2__memory_cost=memory_cost, argon2__parallelism=parallelism)
+
+
+def _measure(args):
+    """Run `op` repeatedly for `duration` seconds in this process; returns operations done."""
+    time_cost, memory_cost, parallelism, op, duration = args
+    ctx = make_context(time_cost, memory_cost, parallelism)
+    stored = ctx.hash("bench-password")
+    done = 0
+    deadline = time.perf_counter() + duration
+    while time.perf_counter() < deadline:
+        if op == "hash":
+            ctx.hash("bench-password")
+        else:
+            ctx.verify("bench-password", stored)
+        done += 1
+    return done
+
+
+def run(time_cost, memory_cost, parallelism, duration, processes):
+    result = {"time_cost": time_cost, "memory_cost_kib": memory_cost, "parallelism": parallelism}
+    for op in ("hash", "verify"):
+        started = time.perf_counter()
+        single = _measure((time_cost, memory_cost, parallelism, op, duration))
+        per_core = single / (time.perf_counter() - started)
+        result[f"{op}_per_sec_1_core"] = round(per_core, 2)
+        result[f"{op}_ms"] = round(1000.0 / per_core, 2) if per_core else None
+        if processes > 1:
+            with ProcessPoolExecutor(max_workers=processes) as pool:
+                started = time.perf_counter()
+                counts = list(pool.map(_measure, [(time_cost, memory_cost, parallelism, op, duration)] * processes))
+                elapsed = time.perf_counter() - started
+            result[f"{op}_per_sec_{processes}_procs"] = round(sum(counts) / elapsed, 2)
+    return result
+
+
+def _ints(text):
+    return [int(x) for x in text.split(",") if x.strip()]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Argon2 hashes/sec per core for HASH_WORKERS sizing")
+    parser.add_argument("--time-cost", default=os.getenv("ARGON2_TIME_COST", "3"), help="comma-separated")
+    parser.add_argument("--memory-cost", default=os.getenv("ARGON2_MEMORY_COST", "65536"), help="KiB, comma-separated")
+    parser.add_argument("--parallelism", default=os.getenv("ARGON2_PARALLELISM", "4"), help="comma-separated")
+    parser.add_argument("--duration", type=float, default=3.0, help="seconds per measurement")
+    parser.add_argument("--processes", type=int, default=os.cpu_count() or 1, help="also measure with N processes")
+    parser.add_argument("--target-rps", type=float, default=0.0, help="logins/sec the pool should sustain")
+    parser.add_argument("--output", help="also write the JSON report to this file")
+    args = parser.parse_args(argv)
+
+    results = []
+    for t, m, p in itertools.product(_ints(args.time_cost), _ints(args.memory_cost), _ints(args.parallelism)):
+        result = run(t, m, p, args.duration, args.processes)
+        if args.target_rps and result["verify_per_sec_1_core"]:
+            # logins are verifies; one worker process per core at most
+            needed = -(-args.target_rps // result["verify_per_sec_1_core"])
+            result["workers_for_target"] = int(needed)
+            result["fits_on_this_host"] = needed <= (os.cpu_count() or 1)
+        results.append(result)
+
+    report = {"cpu_count": os.cpu_count(), "target_rps": args.target_rps, "results": results}
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text)
+
+
+if __name__ == "__main__":
+    main()
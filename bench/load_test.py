@@ -0,0 +1,301 @@
+"""HTTP load generator for the backend API.
+
+Replays a directory of recorded JPEG frames against /yolo/predict and drives
+/auth/login and /auth/log at a fixed concurrency and (optionally) a target
+request rate, then prints throughput, p50/p95/p99 latency and error rates as JSON.
+
+Against a running server:
+    python bench/load_test.py --url http://127.0.0.1:8000 --frames recordings/ --concurrency 16 --duration 30
+
+Fully offline (in-process server on SQLite with the stub detector):
+    python bench/load_test.py --local --concurrency 16 --duration 10 --output bench.json
+"""
+import argparse
+import base64
+import glob
+import http.client
+import itertools
+import json
+import os
+import socket
+import sys
+import tempfile
+import threading
+import time
+from urllib.parse import urlsplit
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "backend")
+ENDPOINTS = ("predict", "login", "log")
+
+
+def load_frames(frames_dir, limit=None):
+    paths = sorted(glob.glob(os.path.join(frames_dir, "*.jpg")) + glob.glob(os.path.join(frames_dir, "*.jpeg")))
+    if not paths:
+        raise SystemExit(f"No .jpg frames found in {frames_dir}")
+    frames = []
+    for path in paths[:limit]:
+        with open(path, "rb") as f:
+            frames.append(f.read())
+    return frames
+
+
+def synthetic_frames(count=8, width=640, height=480):
+    import cv2
+    import numpy as np
+    rng = np.random.default_rng(0)
+    frames = []
+    for _ in range(count):
+        img = rng.integers(0, 255, (height, width, 3), dtype=np.uint8)
+        frames.append(cv2.imencode(".jpg", img)[1].tobytes())
+    return frames
+
+
+def percentile(sorted_values, q):
+    if not sorted_values:
+        return None
+    k = (len(sorted_values) - 1) * q
+    lo = int(k)
+    hi = min(lo + 1, len(sorted_values) - 1)
+    return sorted_values[lo] + (sorted_values[hi] - sorted_values[lo]) * (k - lo)
+
+
+class Recorder:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latencies = []
+        self.statuses = {}
+        self.errors = 0
+
+    def record(self, latency_ms, status):
+        with self._lock:
+            self.latencies.append(latency_ms)
+            self.statuses[str(status)] = self.statuses.get(str(status), 0) + 1
+            if not (isinstance(status, int) and 200 <= status < 300):
+                self.errors += 1
+
+    def summary(self, elapsed_s):
+        lat = sorted(self.latencies)
+        total = len(lat)
+        return {
+            "requests": total,
+            "errors": self.errors,
+            "error_rate": round(self.errors / total, 4) if total else 0.0,
+            "elapsed_s": round(elapsed_s, 3),
+            "throughput_rps": round(total / elapsed_s, 2) if elapsed_s > 0 else 0.0,
+            "latency_ms": {
+                "mean": round(sum(lat) / total, 2) if total else None,
+                "p50": _round(percentile(lat, 0.50)),
+                "p95": _round(percentile(lat, 0.95)),
+                "p99": _round(percentile(lat, 0.99)),
+                "max": _round(lat[-1] if lat else None),
+            },
+            "status_codes": self.statuses,
+        }
+
+
+def _round(value):
+    return round(value, 2) if value is not None else None
+
+
+def make_request_factory(endpoint, args, frames):
+    """Return a function i -> (method, path, body, headers) for request number i."""
+    if endpoint == "predict":
+        query = f"?format={args.response_format}" if args.response_format != "rows" else ""
+        if args.encoding == "json":
+            bodies = [json.dumps({"image": "data:image/jpeg;base64," + base64.b64encode(f).decode()}).encode()
+                      for f in frames]
+            content_type = "application/json"
+        else:
+            bodies = frames
+            content_type = "image/jpeg"
+
+        def predict(i):
+            headers = {"Content-Type": content_type}
+            if args.sessions:
+                headers["X-Session-Id"] = f"bench-{i % args.sessions}"
+            return "POST", "/yolo/predict" + query, bodies[i % len(bodies)], headers
+        return predict
+
+    if endpoint == "login":
+        body = json.dumps({"username": args.username, "password": args.password}).encode()
+
+        def login(i):
+            return "POST", "/auth/login", body, {"Content-Type": "application/json"}
+        return login
+
+    if endpoint == "log":
+        def log(i):
+            event = {"user_id": 1, "event_type": "view_lesson", "lesson_id": i % 20 + 1, "detail": "bench"}
+            if i % 10 == 0:
+                event["event_type"] = "complete_lesson"
+            return "POST", "/auth/log", json.dumps(event).encode(), {"Content-Type": "application/json"}
+        return log
+
+    raise SystemExit(f"Unknown endpoint {endpoint}")
+
+
+def run_endpoint(base_url, endpoint, args, frames):
+    parts = urlsplit(base_url)
+    make_request = make_request_factory(endpoint, args, frames)
+    recorder = Recorder()
+    counter = itertools.count()
+    counter_lock = threading.Lock()
+    started = time.perf_counter()
+    deadline = started + args.duration if args.duration else None
+    interval = 1.0 / args.rate if args.rate else 0.0
+
+    def worker():
+        conn = None
+        while True:
+            with counter_lock:
+                i = next(counter)
+            if args.requests and i >= args.requests:
+                break
+            # open-loop pacing: request i is due at started + i / rate, and latency is
+            # measured from that due time so a slow server can't hide queueing delay
+            due = started + i * interval
+            now = time.perf_counter()
+            if deadline and max(now, due) >= deadline:
+                break
+            if due > now:
+                time.sleep(due - now)
+            t0 = due if interval else time.perf_counter()
+            method, path, body, headers = make_request(i)
+            status = "error"
+            try:
+                if conn is None:
+                    conn = http.client.HTTPConnection(parts.hostname, parts.port or 80, timeout=args.timeout)
+                conn.request(method, path, body=body, headers=headers)
+                response = conn.getresponse()
+                response.read()
+                status = response.status
+                if response.getheader("Connection", "").lower() == "close":
+                    conn.close()
+                    conn = None
+            except (OSError, http.client.HTTPException):
+                if conn is not None:
+                    conn.close()
+                conn = None
+            recorder.record((time.perf_counter() - t0) * 1000.0, status)
+        if conn is not None:
+            conn.close()
+
+    threads = [threading.Thread(target=worker, daemon=True) for _ in range(args.concurrency)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return recorder.summary(time.perf_counter() - started)
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_local_server(args):
+    """Run the app in-process on SQLite with the stub detector; returns (base_url, server)."""
+    workdir = tempfile.mkdtemp(prefix="vsl-bench-")
+    os.environ.setdefault("DB_URL", f"sqlite:///{os.path.join(workdir, 'bench.db')}")
+    if BACKEND_DIR not in sys.path:
+        sys.path.insert(0, BACKEND_DIR)
+    from yolo.stub import STUB_PATH
+    os.environ.setdefault("YOLO_MODEL_PATH", STUB_PATH)
+    os.environ.setdefault("YOLO_REPLICAS", "0")
+    os.chdir(workdir)
+
+    import uvicorn
+    import main
+    import manage
+
+    manage.create_schema()
+    port = _free_port()
+    config = uvicorn.Config(main.create_app(), host="127.0.0.1", port=port, log_level="warning")
+    server = uvicorn.Server(config)
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    base_url = f"http://127.0.0.1:{port}"
+    deadline = time.time() + 60
+    while time.time() < deadline:
+        try:
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=2)
+            conn.request("GET", "/ready")
+            response = conn.getresponse()
+            response.read()
+            conn.close()
+            if response.status == 200:
+                return base_url, server
+        except OSError:
+            pass
+        time.sleep(0.2)
+    raise SystemExit("Local server did not become ready")
+
+
+def ensure_bench_user(base_url, args):
+    parts = urlsplit(base_url)
+    conn = http.client.HTTPConnection(parts.hostname, parts.port or 80, timeout=args.timeout)
+    body = json.dumps({"username": args.username, "email": f"{args.username}@example.com", "password": args.password})
+    conn.request("POST", "/auth/register", body=body, headers={"Content-Type": "application/json"})
+    conn.getresponse().read()
+    conn.close()
+
+
+def main_cli(argv=None):
+    parser = argparse.ArgumentParser(description="Load test /yolo/predict, /auth/login and /auth/log")
+    parser.add_argument("--url", default="http://127.0.0.1:8000", help="base URL of a running server")
+    parser.add_argument("--local", action="store_true", help="start an in-process server (SQLite + stub detector)")
+    parser.add_argument("--frames", help="directory of recorded .jpg frames (synthetic frames if omitted)")
+    parser.add_argument("--endpoints", default="predict,login,log", help="comma-separated: " + ",".join(ENDPOINTS))
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--rate", type=float, default=0.0, help="target requests/sec per endpoint (0 = closed loop)")
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds per endpoint")
+    parser.add_argument("--requests", type=int, default=0, help="stop after N requests per endpoint")
+    parser.add_argument("--timeout", type=float, default=30.0)
+    parser.add_argument("--encoding", choices=("jpeg", "json"), default="jpeg", help="frame upload encoding")
+    parser.add_argument("--response-format", choices=("rows", "columnar"), default="rows")
+    parser.add_argument("--sessions", type=int, default=0, help="spread frames over N X-Session-Id values")
+    parser.add_argument("--username", default="bench_user")
+    parser.add_argument("--password", default="bench_password")
+    parser.add_argument("--output", help="also write the JSON report to this file")
+    args = parser.parse_args(argv)
+
+    endpoints = [e.strip() for e in args.endpoints.split(",") if e.strip()]
+    frames = load_frames(args.frames) if args.frames else synthetic_frames()
+
+    server = None
+    base_url = args.url
+    if args.local:
+        base_url, server = start_local_server(args)
+    if "login" in endpoints:
+        ensure_bench_user(base_url, args)
+
+    report = {
+        "config": {
+            "url": base_url,
+            "local": args.local,
+            "concurrency": args.concurrency,
+            "rate": args.rate,
+            "duration": args.duration,
+            "requests": args.requests,
+            "frames": len(frames),
+            "encoding": args.encoding,
+            "response_format": args.response_format,
+        },
+        "results": {},
+    }
+    for endpoint in endpoints:
+        report["results"][endpoint] = run_endpoint(base_url, endpoint, args, frames)
+
+    if server is not None:
+        server.should_exit = True
+
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text)
+
+
+if __name__ == "__main__":
+    main_cli()
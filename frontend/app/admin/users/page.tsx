@@ -5,38 +5,34 @@ import { Card } from "@/components/ui/card"
 import { Input } from "@/components/ui/input"
 import { Button } from "@/components/ui/button"
 import { Badge } from "@/components/ui/badge"
-import { adminGetUsers } from "@/lib/api"   // <-- IMPORTANT
+import { adminGetUsers, type AdminUser } from "@/lib/api"   // <-- IMPORTANT
 
-interface User {
-  id: number
-  name: string
-  email: string
-  hashed_password: string
-}
+const PAGE_SIZE = 50
 
 export default function UsersPage() {
-  const [users, setUsers] = useState<User[]>([])
+  const [users, setUsers] = useState<AdminUser[]>([])
   const [searchTerm, setSearchTerm] = useState("")
+  const [nextCursor, setNextCursor] = useState<number | null>(null)
+  const [loading, setLoading] = useState(false)
 
-  // Load REAL users from backend
-  useEffect(() => {
-    async function load() {
-      try {
-        const data = await adminGetUsers()
-        setUsers(data)
-      } catch (error) {
-        console.error(error)
-      }
+  // Load REAL users from backend, one page at a time; search runs on the server (prefix match)
+  async function load(after: number | null, q: string) {
+    setLoading(true)
+    try {
+      const page = await adminGetUsers({ q, after, limit: PAGE_SIZE })
+      setUsers((prev) => (after == null ? page.items : [...prev, ...page.items]))
+      setNextCursor(page.next_cursor)
+    } catch (error) {
+      console.error(error)
+    } finally {
+      setLoading(false)
     }
-    load()
-  }, [])
+  }
 
-  const filteredUsers = users.filter((user) => {
-    const matchesSearch =
-      user.email.toLowerCase().includes(searchTerm.toLowerCase()) ||
-      user.name.toLowerCase().includes(searchTerm.toLowerCase())
-    return matchesSearch
-  })
+  useEffect(() => {
+    const timer = setTimeout(() => load(null, searchTerm.trim()), 300)
+    return () => clearTimeout(timer)
+  }, [searchTerm])
 
   return (
     <div className="space-y-8">
@@ -49,7 +45,7 @@ export default function UsersPage() {
       {/* Search */}
       <Card className="p-6 border-primary/30">
         <Input
-          placeholder="Search by email or name..."
+          placeholder="Search by email or name prefix..."
           value={searchTerm}
           onChange={(e) => setSearchTerm(e.target.value)}
           className="bg-card border-border"
@@ -64,29 +60,33 @@ export default function UsersPage() {
               <th className="text-left py-3 px-4 font-semibold text-primary">ID</th>
               <th className="text-left py-3 px-4 font-semibold text-primary">Name</th>
               <th className="text-left py-3 px-4 font-semibold text-primary">Email</th>
-              <th className="text-left py-3 px-4 font-semibold text-primary">Password (hashed)</th>
             </tr>
           </thead>
 
           <tbody>
-            {filteredUsers.map((user) => (
+            {users.map((user) => (
               <tr key={user.id} className="border-b border-border/50 hover:bg-card/50">
                 <td className="py-3 px-4 text-muted-foreground">{user.id}</td>
                 <td className="py-3 px-4 text-foreground">{user.name}</td>
                 <td className="py-3 px-4 text-muted-foreground">{user.email}</td>
-                <td className="py-3 px-4 text-muted-foreground font-mono">
-                  {user.hashed_password}
-                </td>
               </tr>
             ))}
           </tbody>
         </table>
 
-        {filteredUsers.length === 0 && (
+        {users.length === 0 && !loading && (
           <div className="text-center py-8 text-muted-foreground">
             No users found.
           </div>
         )}
+
+        {nextCursor != null && (
+          <div className="text-center pt-6">
+            <Button variant="outline" disabled={loading} onClick={() => load(nextCursor, searchTerm.trim())}>
+              {loading ? "Loading..." : "Load more"}
+            </Button>
+          </div>
+        )}
       </Card>
     </div>
   )
@@ -24,12 +24,21 @@ export default function CameraFeed({
   const [loading, setLoading] = useState(false)
   const [error, setError] = useState<string | null>(null)
   const animationFrameRef = useRef<number>()
+  const timeoutRef = useRef<ReturnType<typeof setTimeout>>()
+  // Thời điểm sớm nhất được gửi frame tiếp theo (server gợi ý qua next_frame_ms)
+  const nextFrameAtRef = useRef(0)
+
+  const wsRef = useRef<WebSocket | null>(null)
+  // Id phiên để backend bỏ qua các frame gần như giống hệt frame trước
+  const sessionIdRef = useRef<string>(Math.random().toString(36).slice(2) + Date.now().toString(36))
 
   const BACKEND_URL = "http://127.0.0.1:8000/yolo/predict"
+  const STREAM_URL = "ws://127.0.0.1:8000/yolo/stream"
 
   useEffect(() => {
     if (!isActive) {
       if (animationFrameRef.current) cancelAnimationFrame(animationFrameRef.current)
+      if (timeoutRef.current) clearTimeout(timeoutRef.current)
       if (canvasRef.current) {
         const ctx = canvasRef.current.getContext("2d")
         if (ctx) ctx.clearRect(0, 0, canvasRef.current.width, canvasRef.current.height)
@@ -61,94 +70,157 @@ export default function CameraFeed({
       }
     }
 
-    const startDetection = () => {
+    // 1️⃣ Canvas ẩn dùng để chụp frame gửi backend (JPEG nhị phân, không base64)
+    const captureFrame = async (): Promise<Blob | null> => {
+      const video = videoRef.current
+      if (!video) return null
+      const captureCanvas = document.createElement("canvas")
+      captureCanvas.width = video.videoWidth
+      captureCanvas.height = video.videoHeight
+      const captureCtx = captureCanvas.getContext("2d")
+      if (!captureCtx) return null
+
+      captureCtx.drawImage(video, 0, 0, captureCanvas.width, captureCanvas.height)
+      return new Promise<Blob | null>((resolve) => captureCanvas.toBlob(resolve, "image/jpeg"))
+    }
+
+    const handleDetections = (detections: any[]) => {
+      const video = videoRef.current
+      if (!video) return
+
+      // 2️⃣ Vẽ bounding box lên canvas overlay
+      if (canvasRef.current) {
+        const canvas = canvasRef.current
+        const ctx = canvas.getContext("2d")
+        if (ctx) {
+          canvas.width = video.videoWidth
+          canvas.height = video.videoHeight
+
+          // xóa khung cũ
+          ctx.clearRect(0, 0, canvas.width, canvas.height)
+
+          ctx.lineWidth = 2
+          ctx.font = "16px Arial"
+          ctx.textBaseline = "top"
+
+          detections.forEach((d: any) => {
+            const [x1, y1, x2, y2] = d.bbox
+            const width = x2 - x1
+            const height = y2 - y1
+
+            const isMatch = targetLesson && d.class.toLowerCase() === targetLesson.toLowerCase()
+            ctx.strokeStyle = isMatch ? "#00FF00" : "#FF6B35"
+            ctx.lineWidth = isMatch ? 3 : 2
+            ctx.fillStyle = isMatch ? "rgba(0,255,0,0.2)" : "rgba(0,0,0,0)"
+            ctx.strokeRect(x1, y1, width, height)
+            ctx.fillRect(x1, y1, width, height)
+
+            ctx.fillStyle = isMatch ? "#00FF00" : "#FFF"
+            ctx.fillText(`${d.class} ${(d.confidence * 100).toFixed(1)}%`, x1 + 5, y1 + 5)
+          })
+        }
+      }
+
+      // Gửi dữ liệu ra ngoài cho PracticePage dùng
+      onDetections(detections)
+      onStatsUpdate({
+        totalDetections: detections.length,
+        accuracy:
+          detections.length > 0
+            ? (
+                (detections.reduce((sum: number, d: any) => sum + d.confidence, 0) / detections.length) *
+                100
+              ).toFixed(1)
+            : 0,
+      })
+    }
+
+    // Dự phòng: mỗi frame một request HTTP
+    const startHttpDetection = () => {
       const detectFrame = async () => {
         if (!videoRef.current || !isActive) return
 
-        const video = videoRef.current
+        let delay = 0
+        const frame = await captureFrame()
+        if (frame) {
+          try {
+            const response = await fetch(BACKEND_URL, {
+              method: "POST",
+              headers: { "Content-Type": "image/jpeg", "X-Session-Id": sessionIdRef.current },
+              body: frame,
+            })
 
-        // 1️⃣ Canvas ẩn dùng để chụp frame gửi backend
-        const captureCanvas = document.createElement("canvas")
-        captureCanvas.width = video.videoWidth
-        captureCanvas.height = video.videoHeight
-        const captureCtx = captureCanvas.getContext("2d")
-        if (!captureCtx) return
+            // Server quá tải -> chờ theo Retry-After
+            if (response.status === 503) delay = Number(response.headers.get("Retry-After") || 1) * 1000
+            if (!response.ok) throw new Error("YOLO request failed")
 
-        captureCtx.drawImage(video, 0, 0, captureCanvas.width, captureCanvas.height)
-        const frame = captureCanvas.toDataURL("image/jpeg")
+            const data = await response.json()
+            delay = data.next_frame_ms || 0
+            handleDetections(data.detections || [])
+          } catch (err) {
+            console.error("YOLO detection error:", err)
+          }
+        }
 
-        try {
-          const response = await fetch(BACKEND_URL, {
-            method: "POST",
-            headers: { "Content-Type": "application/json" },
-            body: JSON.stringify({ image: frame }),
-          })
+        // lặp lại sau khoảng thời gian server gợi ý
+        timeoutRef.current = setTimeout(() => {
+          animationFrameRef.current = requestAnimationFrame(detectFrame)
+        }, delay)
+      }
+
+      detectFrame()
+    }
+
+    // Một kết nối WebSocket cho cả phiên: gửi frame nhị phân, nhận detections.
+    // Server chỉ giữ frame mới nhất, nên chỉ gửi tiếp khi socket không còn dữ liệu tồn
+    // và đã hết khoảng chờ next_frame_ms mà server gợi ý.
+    const startDetection = () => {
+      let opened = false
+      const ws = new WebSocket(STREAM_URL)
+      ws.binaryType = "arraybuffer"
+      wsRef.current = ws
 
-          if (!response.ok) throw new Error("YOLO request failed")
-
-          const data = await response.json()
-          const detections = data.detections || []
-
-          // 2️⃣ Vẽ bounding box lên canvas overlay
-          if (canvasRef.current) {
-            const canvas = canvasRef.current
-            const ctx = canvas.getContext("2d")
-            if (ctx) {
-              canvas.width = video.videoWidth
-              canvas.height = video.videoHeight
-
-              // xóa khung cũ
-              ctx.clearRect(0, 0, canvas.width, canvas.height)
-
-              ctx.lineWidth = 2
-              ctx.font = "16px Arial"
-              ctx.textBaseline = "top"
-
-              detections.forEach((d: any) => {
-                const [x1, y1, x2, y2] = d.bbox
-                const width = x2 - x1
-                const height = y2 - y1
-
-                const isMatch = targetLesson && d.class.toLowerCase() === targetLesson.toLowerCase()
-                ctx.strokeStyle = isMatch ? "#00FF00" : "#FF6B35"
-                ctx.lineWidth = isMatch ? 3 : 2
-                ctx.fillStyle = isMatch ? "rgba(0,255,0,0.2)" : "rgba(0,0,0,0)"
-                ctx.strokeRect(x1, y1, width, height)
-                ctx.fillRect(x1, y1, width, height)
-
-                ctx.fillStyle = isMatch ? "#00FF00" : "#FFF"
-                ctx.fillText(`${d.class} ${(d.confidence * 100).toFixed(1)}%`, x1 + 5, y1 + 5)
-              })
-            }
+      ws.onopen = () => {
+        opened = true
+        const sendFrame = async () => {
+          if (!videoRef.current || !isActive || ws.readyState !== WebSocket.OPEN) return
+          if (ws.bufferedAmount === 0 && performance.now() >= nextFrameAtRef.current) {
+            const frame = await captureFrame()
+            if (frame && ws.readyState === WebSocket.OPEN) ws.send(frame)
           }
+          animationFrameRef.current = requestAnimationFrame(sendFrame)
+        }
+        sendFrame()
+      }
 
-          // Gửi dữ liệu ra ngoài cho PracticePage dùng
-          onDetections(detections)
-          onStatsUpdate({
-            totalDetections: detections.length,
-            accuracy:
-              detections.length > 0
-                ? (
-                    (detections.reduce((sum: number, d: any) => sum + d.confidence, 0) / detections.length) *
-                    100
-                  ).toFixed(1)
-                : 0,
-          })
+      ws.onmessage = (event) => {
+        try {
+          const data = JSON.parse(event.data)
+          nextFrameAtRef.current = performance.now() + (data.next_frame_ms || 0)
+          if (data.error) return
+          handleDetections(data.detections || [])
         } catch (err) {
-          console.error("YOLO detection error:", err)
+          console.error("YOLO stream error:", err)
         }
-
-        // lặp lại
-        animationFrameRef.current = requestAnimationFrame(detectFrame)
       }
 
-      detectFrame()
+      ws.onclose = () => {
+        if (wsRef.current === ws) wsRef.current = null
+        // WebSocket không khả dụng -> quay về HTTP
+        if (!opened && isActive) startHttpDetection()
+      }
     }
 
     initCamera()
 
     return () => {
       if (animationFrameRef.current) cancelAnimationFrame(animationFrameRef.current)
+      if (timeoutRef.current) clearTimeout(timeoutRef.current)
+      if (wsRef.current) {
+        wsRef.current.onclose = null
+        wsRef.current.close()
+        wsRef.current = null
+      }
       if (videoRef.current?.srcObject) {
         const tracks = (videoRef.current.srcObject as MediaStream).getTracks()
         tracks.forEach((track) => track.stop())
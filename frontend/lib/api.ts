@@ -97,13 +97,24 @@ export async function adminLogin(identifier: string, password: string) {
 }
 
 // ---------------------------
-// Fetch All Users (Admin protected)
+// Fetch Users, one page at a time (Admin protected)
+// Pass the previous page's next_cursor as `after` to get the next page.
 // ---------------------------
-export async function adminGetUsers() {
+export type AdminUser = { id: number; name: string; email: string }
+export type AdminUsersPage = { items: AdminUser[]; next_cursor: number | null }
+
+export async function adminGetUsers(
+  params: { q?: string; after?: number | null; limit?: number } = {}
+): Promise<AdminUsersPage> {
   const token = getAdminToken();
   if (!token) throw new Error("Admin not authenticated");
 
-  const res = await fetch(`${API_URL}/admin/users`, {
+  const query = new URLSearchParams();
+  if (params.q) query.set("q", params.q);
+  if (params.after != null) query.set("after", String(params.after));
+  if (params.limit) query.set("limit", String(params.limit));
+
+  const res = await fetch(`${API_URL}/admin/users?${query.toString()}`, {
     method: "GET",
     headers: {
       "Authorization": `Bearer ${token}`,
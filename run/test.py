@@ -1,7 +1,12 @@
+import os
+import sys
+import time
 import streamlit as st
 import cv2
 import torch
-from ultralytics import YOLO
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "backend"))
+from yolo.engines import ENGINES, load_engine
 
 st.set_page_config(page_title="YOLOv11 Real-time", layout="wide")
 
@@ -10,6 +15,7 @@ st.sidebar.title("YOLOv11 Real-time Inference")
 model_path = st.sidebar.text_input("Model path", r"D:\WORK\Python\CV\Webapp_vsl\model\v9_l_yolo11.pt")
 imgsz = st.sidebar.slider("Image size", 320, 640, 480, step=80)
 conf = st.sidebar.slider("Confidence threshold", 0.1, 1.0, 0.5, 0.05)
+engine = st.sidebar.selectbox("Engine", ENGINES, help="onnx / onnx-int8 export the weights once and run on ONNX Runtime (CPU)")
 run_button = st.sidebar.button("▶ Start Camera")
 
 # Main UI
@@ -18,10 +24,16 @@ frame_window = st.image([])
 
 if run_button:
     # Load YOLO model
-    device = "cuda" if torch.cuda.is_available() else "cpu"
-    model = YOLO(model_path)
-    model.to(device)
-    model.fuse()
+    if engine == "torch":
+        device = "cuda" if torch.cuda.is_available() else "cpu"
+    else:
+        device = "cpu"
+    with st.spinner(f"Loading {engine} engine..."):
+        model = load_engine(model_path, engine)
+    if engine == "torch":
+        model.to(device)
+        model.fuse()
+    fps_text = st.sidebar.empty()
 
     cap = cv2.VideoCapture(0)
     cap.set(cv2.CAP_PROP_FRAME_WIDTH, 640)
@@ -35,7 +47,9 @@ if run_button:
             st.warning("Camera feed not found.")
             break
 
+        started = time.perf_counter()
         results = model.predict(frame, imgsz=imgsz, conf=conf, device=device, verbose=False)
+        fps_text.write(f"{engine}: {(time.perf_counter() - started) * 1000:.1f} ms / frame")
         annotated = results[0].plot()
 
         frame_window.image(annotated, channels="BGR", use_column_width=True)